@@ -0,0 +1,140 @@
+"""In-process stand-in for the MQTT broker used by the host `umqtt` stand-in
+
+Brokers are created on first use, keyed by server name. Set `online = False`
+to refuse connections and drop the attached clients, or `responsive = False`
+to keep connections open but stop answering, like a half-open TCP link.
+
+Clients connecting with clean_session=False get a session keyed by client id
+that outlives the connection: its subscriptions are restored on reconnect,
+and QoS 1 messages published while the client is away are queued and
+delivered when it comes back.
+"""
+
+brokers = {}
+# the address each broker name resolves to, see usocket.getaddrinfo
+addresses = {}
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter match with + and # wildcards, both as bytes"""
+    pattern_levels = pattern.split(b"/")
+    topic_levels = topic.split(b"/")
+    for i, level in enumerate(pattern_levels):
+        if level == b"#":
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != b"+" and level != topic_levels[i]:
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class Session:
+    def __init__(self):
+        self.subscriptions = []
+        self.queued = []
+        self.client = None
+
+
+class Broker:
+    def __init__(self, name):
+        self.name = name
+        self.online = True
+        self.responsive = True
+        self.clients = []
+        self.published = []
+        # messages handed to subscribers, the fan-out of everything published
+        self.deliveries = 0
+        self.sessions = {}
+
+    def attach(self, client, clean_session=True):
+        """connect a client, True if a stored session was resumed"""
+        if not self.online:
+            raise OSError(111, "ECONNREFUSED")
+        session = self.sessions.pop(client.client_id, None)
+        present = session is not None and not clean_session
+        if clean_session:
+            session = None
+        elif session is None:
+            session = Session()
+        if session is not None:
+            self.sessions[client.client_id] = session
+            if session.client is not None:
+                self.detach(session.client)
+            session.client = client
+            client.subscriptions = session.subscriptions
+            for topic, msg in session.queued:
+                client.deliver(topic, msg)
+            session.queued = []
+        if client not in self.clients:
+            self.clients.append(client)
+        return present
+
+    def detach(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+        session = self.sessions.get(client.client_id)
+        if session is not None and session.client is client:
+            session.client = None
+
+    def set_online(self, online):
+        self.online = online
+        if not online:
+            for client in list(self.clients):
+                client.sock = None
+                self.detach(client)
+
+    def pingreq(self, client):
+        if self.responsive:
+            client.sock.feed(b"\xd0\x00")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if not self.online:
+            raise OSError(104, "ECONNRESET")
+        self.published.append((topic, msg))
+        if not self.responsive:
+            return
+        for client in self.clients:
+            for pattern in client.subscriptions:
+                if topic_matches(pattern, topic):
+                    client.deliver(topic, msg)
+                    self.deliveries += 1
+                    break
+        if qos < 1:
+            return
+        for session in self.sessions.values():
+            if session.client is not None:
+                continue
+            for pattern in session.subscriptions:
+                if topic_matches(pattern, topic):
+                    session.queued.append((topic, msg))
+                    break
+
+
+def address(name):
+    """the made up IPv4 address name resolves to"""
+    ip = addresses.get(name)
+    if ip is None:
+        ip = addresses[name] = "10.0.0.{0}".format(len(addresses) + 1)
+    return ip
+
+
+def get(name):
+    """the broker called name, or reachable at the address name resolved to"""
+    if name.replace(".", "").isdigit():
+        for known, ip in addresses.items():
+            if ip == name:
+                name = known
+                break
+        else:
+            # an address no name resolved to in this process, a stale cache
+            raise OSError(113, "EHOSTUNREACH")
+    broker = brokers.get(name)
+    if broker is None:
+        broker = brokers[name] = Broker(name)
+    return broker
+
+
+def reset():
+    brokers.clear()
+    addresses.clear()
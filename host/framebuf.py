@@ -0,0 +1,103 @@
+"""Host stand-in for the MicroPython `framebuf` module
+
+Only the monochrome formats the device uses are implemented. `text()` draws a
+deterministic 8x8 pattern per character rather than the real font, which is
+enough for dirty tracking and screen diffs.
+"""
+
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+
+def _glyph(char):
+    """column bytes for a character cell, blank for a space"""
+    code = ord(char)
+    if code == 32:
+        return bytes(8)
+    return bytes(
+        (((code * (col + 3)) ^ (code >> 1)) & 0x7E) if col < 7 else 0
+        for col in range(8)
+    )
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (MONO_VLSB, MONO_HLSB, MONO_HMSB):
+            raise ValueError("unsupported format")
+        self.buffer = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride or width
+
+    def _locate(self, x, y):
+        if self.format == MONO_VLSB:
+            return (y >> 3) * self.stride + x, 1 << (y & 7)
+        index = (y * ((self.stride + 7) // 8)) + (x >> 3)
+        if self.format == MONO_HLSB:
+            return index, 0x80 >> (x & 7)
+        return index, 1 << (x & 7)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index, mask = self._locate(x, y)
+        if c is None:
+            return 1 if self.buffer[index] & mask else 0
+        if c:
+            self.buffer[index] |= mask
+        else:
+            self.buffer[index] &= ~mask & 0xFF
+
+    def fill(self, c):
+        value = 0xFF if c else 0
+        for i in range(len(self.buffer)):
+            self.buffer[i] = value
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(y, 0), min(y + h, self.height)):
+            for xx in range(max(x, 0), min(x + w, self.width)):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def text(self, s, x, y, c=1):
+        for i, char in enumerate(s):
+            for col, bits in enumerate(_glyph(char)):
+                for row in range(8):
+                    if bits & (1 << row):
+                        self.pixel(x + i * 8 + col, y + row, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
+
+    def scroll(self, xstep, ystep):
+        pixels = [
+            [self.pixel(x, y) for x in range(self.width)] for y in range(self.height)
+        ]
+        for y in range(self.height):
+            for x in range(self.width):
+                sx = x - xstep
+                sy = y - ystep
+                if 0 <= sx < self.width and 0 <= sy < self.height:
+                    self.pixel(x, y, pixels[sy][sx])
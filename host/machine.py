@@ -0,0 +1,139 @@
+"""Host stand-in for the MicroPython `machine` module
+
+Pins sharing an id share one level, so every Pin(22) the device code creates
+sees the same button. Drive inputs with `Pin.drive(id, level)`, which fires
+any IRQ handler registered for that edge. Timers fire on the asyncio loop in
+`Timer.loop` when one is set, otherwise only when `fire()` is called.
+"""
+
+import micropython  # noqa: F401 installs time.ticks_* on the host
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    levels = {}
+    handlers = {}
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        if value is not None:
+            Pin.levels[id] = 1 if value else 0
+        elif id not in Pin.levels:
+            Pin.levels[id] = 1 if pull == Pin.PULL_UP else 0
+
+    def __repr__(self):
+        return "Pin({0})".format(self.id)
+
+    def value(self, level=None):
+        if level is None:
+            return Pin.levels[self.id]
+        Pin.drive(self.id, level)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        Pin.handlers[self.id] = (self, handler, trigger)
+
+    @staticmethod
+    def drive(id, level):
+        level = 1 if level else 0
+        previous = Pin.levels.get(id, 0)
+        Pin.levels[id] = level
+        if level == previous or id not in Pin.handlers:
+            return
+        pin, handler, trigger = Pin.handlers[id]
+        edge = Pin.IRQ_RISING if level else Pin.IRQ_FALLING
+        if handler is not None and trigger & edge:
+            handler(pin)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    # asyncio loop whose clock runs the timers
+    loop = None
+
+    def __init__(self, id=-1, **kwargs):
+        self.callback = None
+        self.mode = Timer.PERIODIC
+        self.freq = 0
+        self.handle = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=-1, period=-1, callback=None):
+        self.deinit()
+        self.mode = mode
+        self.freq = freq if freq > 0 else (1000 / period if period > 0 else 0)
+        self.callback = callback
+        self.schedule()
+
+    def deinit(self):
+        self.callback = None
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def schedule(self):
+        if Timer.loop is not None and self.callback is not None and self.freq:
+            self.handle = Timer.loop.call_later(1 / self.freq, self.expire)
+
+    def expire(self):
+        self.handle = None
+        self.fire()
+        if self.mode == Timer.PERIODIC:
+            self.schedule()
+
+    def fire(self):
+        callback = self.callback
+        if self.mode == Timer.ONE_SHOT:
+            self.callback = None
+        if callback is not None:
+            callback(self)
+
+
+class I2C:
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.id = id
+        self.freq = freq
+
+    def scan(self):
+        return [0x3C]
+
+    def writeto(self, addr, buf, stop=True):
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        return sum(len(buf) for buf in vector)
+
+
+# the simulator gives each device its own id
+UNIQUE_ID = b"\xe6\x61\x41\x04\x03\x28\x2a\x01"
+
+
+def unique_id():
+    return UNIQUE_ID
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def idle():
+    pass
+
+
+def reset():
+    raise SystemExit("machine.reset()")
@@ -0,0 +1,75 @@
+"""Host stand-in for the MicroPython `micropython` module
+
+Importing it also adds the MicroPython-only ticks/sleep helpers to CPython's
+`time` module so device code can call them unchanged.
+"""
+
+import time as _time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+# nanosecond clock behind the ticks functions, see set_clock
+_clock_ns = _time.monotonic_ns
+_start_ns = _clock_ns()
+
+
+def const(value):
+    return value
+
+
+def native(fn):
+    return fn
+
+
+viper = native
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(fn, arg):
+    fn(arg)
+    return True
+
+
+def mem_info(verbose=False):
+    pass
+
+
+def set_clock(clock_ns):
+    """drive the ticks functions from another clock, the simulator's virtual one"""
+    global _clock_ns, _start_ns
+    _clock_ns = clock_ns
+    _start_ns = clock_ns()
+
+
+def _elapsed_ns():
+    return _clock_ns() - _start_ns
+
+
+def ticks_ms():
+    return (_elapsed_ns() // 1000000) & TICKS_MAX
+
+
+def ticks_us():
+    return (_elapsed_ns() // 1000) & TICKS_MAX
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+for _name in ("ticks_ms", "ticks_us", "ticks_add", "ticks_diff", "sleep_ms"):
+    if not hasattr(_time, _name):
+        setattr(_time, _name, globals()[_name])
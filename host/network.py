@@ -0,0 +1,72 @@
+"""Host stand-in for the MicroPython `network` module
+
+The WLAN joins instantly unless `fail` is set, and `drop()` simulates losing
+the access point. Setting the class delays makes joining take time on the
+ticks clock instead: `scan_ms` to find the access point unless connect() is
+given its bssid, `join_ms` to associate, and `dhcp_ms` for the lease unless a
+static ifconfig was set.
+"""
+
+import time
+
+import micropython  # noqa: F401 installs time.ticks_* on the host
+
+STA_IF = 0
+AP_IF = 1
+
+BSSID = b"\x02\x00\x00\x00\x00\x01"
+DHCP_CONFIG = ("10.0.1.23", "255.255.255.0", "10.0.1.1", "10.0.1.1")
+
+
+class WLAN:
+    fail = False
+    scan_ms = 0
+    join_ms = 0
+    dhcp_ms = 0
+
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = False
+        self._connected = False
+        self.ssid = None
+        self.static = None
+        self.ready_at = 0
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+
+    def connect(self, ssid=None, key=None, bssid=None, **kwargs):
+        self.ssid = ssid
+        self._connected = self._active and not WLAN.fail
+        delay = WLAN.join_ms
+        if bssid is None:
+            delay += WLAN.scan_ms
+        if self.static is None:
+            delay += WLAN.dhcp_ms
+        self.ready_at = time.ticks_add(time.ticks_ms(), delay)
+
+    def disconnect(self):
+        self._connected = False
+
+    def drop(self):
+        self._connected = False
+
+    def isconnected(self):
+        return (
+            self._connected and time.ticks_diff(time.ticks_ms(), self.ready_at) >= 0
+        )
+
+    def status(self, param=None):
+        return 3 if self.isconnected() else 0
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self.static or DHCP_CONFIG
+        self.static = None if config == "dhcp" else tuple(config)
+
+    def config(self, *args, **kwargs):
+        if args == ("bssid",):
+            return BSSID if self.isconnected() else None
+        return None
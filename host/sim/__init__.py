@@ -0,0 +1,9 @@
+"""Simulate whole controllers on the host, many of them in one process
+
+Run with host/ and the repository root on the path:
+
+    PYTHONPATH=host:. python -m sim --devices 8 --updates 50
+"""
+
+from sim.clock import VirtualLoop, run
+from sim.device import Device
@@ -0,0 +1,107 @@
+"""Broadcast game updates to a pod of simulated devices and time the renders
+
+Every device boots, skips the config prompt and connects to the in-process
+broker. A stand-in backend then publishes api/game/mtg/p/update snapshots
+listing every device as a player. For each device and update the time from
+publish to the first frame flushed after the device handled it is reported
+twice: on the loop clock, which is the scheduling delay the device itself
+would see (MQTT polling and frame pacing), and on the host clock, which adds
+the CPU time every device in the pod spent before it got its turn.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+import broker
+from sim.clock import run
+from sim.device import Device, flash_dir
+from sim.stats import summary
+
+UPDATE_TOPIC = b"api/game/mtg/p/update"
+
+
+def game_update(devices, version):
+    players = [
+        {
+            "uid": device.client_id,
+            "playerName": device.config["username"],
+            "playerHealth": 40 - (version + device.index) % 40,
+        }
+        for device in devices
+    ]
+    return json.dumps(
+        {
+            "version": version,
+            "gameOver": False,
+            "lobby": [],
+            "players": players,
+            "currentPlayer": players[version % len(players)],
+            "winner": None,
+        }
+    ).encode()
+
+
+async def simulate(count, updates, interval_ms, server="sim.local"):
+    loop = asyncio.get_running_loop()
+    broker.reset()
+    devices = [Device(i, server) for i in range(count)]
+    booted = await asyncio.gather(*(device.boot() for device in devices))
+    if not all(booted):
+        raise SystemExit("{0} devices did not connect".format(booted.count(False)))
+    backend = broker.get(server)
+    deliveries = backend.deliveries
+    published = []
+    for version in range(updates):
+        payload = game_update(devices, version)
+        published.append((UPDATE_TOPIC, loop.time(), time.perf_counter()))
+        backend.publish(UPDATE_TOPIC, payload)
+        await asyncio.sleep(interval_ms / 1000)
+    await asyncio.sleep(1)
+
+    device_ms = []
+    host_ms = []
+    missed = 0
+    for device in devices:
+        device_lat, host_lat, device_missed = device.latencies(published)
+        device_ms += device_lat
+        host_ms += host_lat
+        missed += device_missed
+    return {
+        "devices": count,
+        "updates": updates,
+        "payloadBytes": len(game_update(devices, 0)),
+        "fanOut": (backend.deliveries - deliveries) / updates,
+        "missed": missed,
+        "deviceMs": summary(device_ms),
+        "hostMs": summary(host_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m sim", description=__doc__)
+    parser.add_argument("--devices", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--updates", type=int, default=20)
+    parser.add_argument("--interval-ms", type=int, default=500)
+    parser.add_argument(
+        "--real-time", action="store_true", help="run on the wall clock"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show what the devices print"
+    )
+    args = parser.parse_args()
+    for count in args.devices:
+        with flash_dir(), open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(None if args.verbose else devnull):
+                result = run(
+                    simulate(count, args.updates, args.interval_ms),
+                    not args.real_time,
+                )
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
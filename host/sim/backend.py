@@ -0,0 +1,95 @@
+"""Stand-in for the MTG game service behind the broker
+
+It takes the api/game/mtg/r/* requests the controllers publish, keeps the
+game state and broadcasts it on api/game/mtg/p/update as a full snapshot, or
+on api/game/mtg/p/delta as a versioned patch of the players that changed.
+Every broadcast is timestamped so renders can be matched against it.
+"""
+
+import asyncio
+import json
+import time
+
+import broker
+
+STARTING_HEALTH = 40
+
+
+class MTGBackend:
+    def __init__(self, server, deltas=False):
+        self.broker = broker.get(server)
+        self.deltas = deltas
+        # enough of a client for the broker to deliver to
+        self.client_id = "mtg-backend"
+        self.subscriptions = [b"api/game/mtg/r/#"]
+        self.broker.clients.append(self)
+        self.version = 0
+        self.players = []
+        self.current = 0
+        self.changed = set()
+        self.pending = False
+        self.requests = 0
+        # (topic, loop seconds, perf_counter) per broadcast
+        self.published = []
+
+    def player(self, uid):
+        for player in self.players:
+            if player["uid"] == uid:
+                return player
+        return None
+
+    def deliver(self, topic, msg):
+        self.requests += 1
+        action = topic.rsplit(b"/", 1)[1]
+        if action == b"join":
+            uid = msg.decode()
+            if self.player(uid) is None:
+                self.players.append(
+                    {"uid": uid, "playerName": uid, "playerHealth": STARTING_HEALTH}
+                )
+                self.changed.add(uid)
+        elif action == b"modifyPlayerHealth":
+            request = json.loads(msg)
+            player = self.player(request["uid"])
+            if player is not None:
+                player["playerHealth"] += request["amount"]
+                self.changed.add(player["uid"])
+        elif action == b"nextTurn" and self.players:
+            self.current = (self.current + 1) % len(self.players)
+        elif action == b"clearGame":
+            self.players = []
+            self.current = 0
+        elif action != b"snapshot":
+            return
+        if not self.pending:
+            # publish after the request that triggered it has returned
+            self.pending = True
+            asyncio.get_running_loop().call_soon(self.broadcast, action == b"snapshot")
+
+    def current_player(self):
+        return self.players[self.current] if self.players else None
+
+    def broadcast(self, snapshot=False):
+        self.pending = False
+        self.version += 1
+        if self.deltas and not snapshot:
+            topic = b"api/game/mtg/p/delta"
+            state = {
+                "version": self.version,
+                "players": [p for p in self.players if p["uid"] in self.changed],
+                "currentPlayer": self.current_player(),
+            }
+        else:
+            topic = b"api/game/mtg/p/update"
+            state = {
+                "version": self.version,
+                "gameOver": False,
+                "lobby": [],
+                "players": self.players,
+                "currentPlayer": self.current_player(),
+                "winner": None,
+            }
+        self.changed = set()
+        loop = asyncio.get_running_loop()
+        self.published.append((topic, loop.time(), time.perf_counter()))
+        self.broker.publish(topic, json.dumps(state).encode())
@@ -0,0 +1,57 @@
+"""Virtual time for the simulator
+
+VirtualLoop is an asyncio event loop whose clock only moves while every task
+is waiting: instead of sleeping until the next scheduled callback it jumps
+the clock there. The micropython ticks functions and machine.Timer follow
+the same clock, so a minute of device time with nothing to do costs no real
+time and runs are repeatable.
+"""
+
+import asyncio
+import selectors
+
+import micropython
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        ready = super().select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # nothing scheduled, only another thread can wake the loop
+            return super().select(None)
+        self.loop.now += timeout
+        return []
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        self.now = 0.0
+        super().__init__(VirtualSelector(self))
+        micropython.set_clock(self.clock_ns)
+
+    def time(self):
+        return self.now
+
+    def clock_ns(self):
+        return int(self.now * 1e9)
+
+
+def run(main, virtual=True):
+    """run a coroutine to completion, then cancel whatever it left running"""
+    loop = VirtualLoop() if virtual else asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,196 @@
+"""One simulated controller running the unmodified device code
+
+Every Device imports its own copy of `machine` and `mothership`, so pins,
+encoder, outbox and the logged in user are per device, while the broker,
+WLAN and display stand-ins are shared. Inputs are scripted with press() and
+turn(), and every message received and frame flushed is timestamped on both
+the loop clock and the host's perf_counter. The host time spent handling
+messages and flushing frames is summed in busy_s.
+
+The devices keep their caches (netcache.json, userdir.txt, line store
+indexes) in the working directory. Run a pod inside flash_dir() so it
+neither reads what an earlier run left behind nor writes into the tree.
+"""
+
+import asyncio
+import contextlib
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import linestore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# CLK/DT states visited after the rest state (both high) for one detent
+CLOCKWISE = (1, 0, 2, 3)
+COUNTER_CLOCKWISE = (2, 0, 1, 3)
+
+
+@contextlib.contextmanager
+def flash_dir():
+    """a fresh working directory holding only the icon asset, like new flash"""
+    workdir = tempfile.mkdtemp()
+    shutil.copy(os.path.join(ROOT, "sprites.bin"), workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        # stores are shared by path across devices and outlive the pod
+        for store in linestore.stores.values():
+            store.close()
+        linestore.stores.clear()
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+def load(unique_id):
+    """fresh machine and mothership modules for one device"""
+    saved = {name: sys.modules.pop(name, None) for name in ("machine", "mothership")}
+    try:
+        machine = importlib.import_module("machine")
+        machine.UNIQUE_ID = unique_id
+        machine.Pin.levels = {}
+        machine.Pin.handlers = {}
+        mothership = importlib.import_module("mothership")
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    return machine, mothership
+
+
+class Device:
+    def __init__(self, index, server="sim.local", username=None):
+        self.index = index
+        self.machine, self.mothership = load(b"sim" + index.to_bytes(5, "big"))
+        self.config = {
+            "username": username or "sim{0}".format(index),
+            "ssid": "sim",
+            "password": "sim",
+            "mqtt_server": server,
+            "mqtt_pass": "",
+            "fps": "20",
+        }
+        self.runtime = None
+        # (topic, loop seconds, perf_counter) per message handled
+        self.received = []
+        # (loop seconds, perf_counter) per frame flushed to the panel
+        self.frames = []
+        self.busy_s = 0.0
+
+    @property
+    def client_id(self):
+        return self.mothership.client_id
+
+    def connected(self):
+        return self.runtime is not None and self.runtime.connection.client is not None
+
+    def screen(self):
+        return self.runtime.oled.oled.screen()
+
+    async def run(self):
+        """boot the device like main() does, on the running loop"""
+        loop = asyncio.get_running_loop()
+        self.machine.Timer.loop = loop
+        self.mothership.setupEncoder()
+        runtime = self.runtime = self.mothership.Runtime(self.config)
+
+        check_msg = runtime.mqtt_handler.check_msg
+        show = runtime.oled.show
+
+        def traced_check_msg(topic, msg):
+            start = time.perf_counter()
+            self.received.append((topic, loop.time(), start))
+            check_msg(topic, msg)
+            self.busy_s += time.perf_counter() - start
+
+        def traced_show():
+            start = time.perf_counter()
+            show()
+            end = time.perf_counter()
+            self.frames.append((loop.time(), end))
+            self.busy_s += end - start
+
+        runtime.mqtt_handler.check_msg = traced_check_msg
+        runtime.oled.show = traced_show
+        await runtime.run()
+
+    async def press(self, button, hold_ms=60):
+        """press and release "left", "right" or "select" """
+        pin = getattr(self.mothership, button + "_button").id
+        self.machine.Pin.drive(pin, 0)
+        await asyncio.sleep(hold_ms / 1000)
+        self.machine.Pin.drive(pin, 1)
+
+    async def turn(self, detents, period_ms=40):
+        """turn the encoder, positive detents clockwise"""
+        clk = self.mothership.pin_clk
+        dt = self.mothership.pin_dt
+        state = 3
+        for _ in range(abs(detents)):
+            for next_state in CLOCKWISE if detents > 0 else COUNTER_CLOCKWISE:
+                changed = state ^ next_state
+                pin = clk if changed & 2 else dt
+                self.machine.Pin.drive(pin, next_state & changed)
+                state = next_state
+                await asyncio.sleep(period_ms / 4000)
+
+    async def play(self, script):
+        """run (at_ms, action, *args) steps, at_ms counted from the call"""
+        start = asyncio.get_running_loop().time()
+        for at_ms, action, *args in script:
+            wait = start + at_ms / 1000 - asyncio.get_running_loop().time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await getattr(self, action)(*args)
+
+    async def boot(self, timeout_s=30):
+        """start the device, skip the config prompt and wait for the broker"""
+        asyncio.create_task(self.run())
+        await asyncio.sleep(0.2)
+        await self.press("select")
+        for _ in range(int(timeout_s * 10)):
+            if self.connected():
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    def render_after(self, stamp):
+        """first frame flushed at or after a loop time"""
+        for frame in self.frames:
+            if frame[0] >= stamp:
+                return frame
+        return None
+
+    def latencies(self, published):
+        """publish-to-render ms on the loop and host clocks, and the count missed
+
+        published holds (topic, loop seconds, perf_counter) per broadcast made
+        after this device subscribed, each is matched to the next message
+        handled on that topic.
+        """
+        device_ms = []
+        host_ms = []
+        missed = 0
+        received = {}
+        for topic, stamp, _ in self.received:
+            received.setdefault(topic, []).append(stamp)
+        seen = {}
+        for topic, sent_at, sent_perf in published:
+            index = seen.get(topic, 0)
+            seen[topic] = index + 1
+            stamps = received.get(topic, ())
+            frame = self.render_after(stamps[index]) if index < len(stamps) else None
+            if frame is None:
+                missed += 1
+                continue
+            device_ms.append((frame[0] - sent_at) * 1000)
+            host_ms.append((frame[1] - sent_perf) * 1000)
+        return device_ms, host_ms, missed
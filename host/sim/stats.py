@@ -0,0 +1,17 @@
+"""Percentile summaries for simulator reports"""
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[max((len(samples) * pct + 99) // 100 - 1, 0)]
+
+
+def summary(samples):
+    if not samples:
+        return {}
+    return {
+        "p50": round(percentile(samples, 50), 2),
+        "p90": round(percentile(samples, 90), 2),
+        "p99": round(percentile(samples, 99), 2),
+        "max": round(max(samples), 2),
+    }
@@ -0,0 +1,132 @@
+"""Host stand-in for micropython-ssd1306 with an in-memory panel
+
+Commands and data written through `write_cmd`/`write_data` are decoded into
+`ram`, the controller's 128x64 display memory, so partial refreshes can be
+checked against the frame buffer. The panel shows `height` rows of it from the
+display start line, as hardware scrolling does. `bytes_written` counts every
+byte sent over the bus.
+"""
+
+import framebuf
+
+SET_MEM_ADDR = 0x20
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+SET_NORM_INV = 0xA6
+SET_DISP_START_LINE = 0x40
+# display RAM is 8 pages whatever the panel height
+RAM_PAGES = 8
+
+# number of argument bytes following each multi byte command
+_COMMAND_ARGS = {
+    0x20: 1,
+    0x21: 2,
+    0x22: 2,
+    0x81: 1,
+    0x8D: 1,
+    0xA8: 1,
+    0xD3: 1,
+    0xD5: 1,
+    0xD9: 1,
+    0xDA: 1,
+    0xDB: 1,
+}
+
+
+class SSD1306_I2C(framebuf.FrameBuffer):
+    def __init__(self, width, height, i2c, addr=0x3C, external_vcc=False):
+        self.width = width
+        self.height = height
+        self.pages = height // 8
+        self.i2c = i2c
+        self.addr = addr
+        self.buffer = bytearray(self.pages * width)
+        super().__init__(self.buffer, width, height, framebuf.MONO_VLSB)
+        self.ram = bytearray(RAM_PAGES * 128)
+        self.start_line = 0
+        self.inverted = False
+        self.powered = True
+        self.bytes_written = 0
+        self.col_window = [0, 127]
+        self.page_window = [0, self.pages - 1]
+        self.col = 0
+        self.page = 0
+        self._command = []
+        self.show()
+
+    def write_cmd(self, cmd):
+        self.bytes_written += 2
+        if self._command:
+            self._command.append(cmd)
+        else:
+            self._command = [cmd]
+        if len(self._command) <= _COMMAND_ARGS.get(self._command[0], 0):
+            return
+        command = self._command
+        self._command = []
+        self._apply(command)
+
+    def _apply(self, command):
+        op = command[0]
+        if op == SET_COL_ADDR:
+            self.col_window = [command[1], command[2]]
+            self.col = command[1]
+        elif op == SET_PAGE_ADDR:
+            self.page_window = [command[1], command[2]]
+            self.page = command[1]
+        elif op & 0xC0 == SET_DISP_START_LINE:
+            self.start_line = op & 0x3F
+        elif op & 0xFE == SET_NORM_INV:
+            self.inverted = bool(op & 1)
+        elif op & 0xFE == 0xAE:
+            self.powered = bool(op & 1)
+
+    def write_data(self, buf):
+        self.bytes_written += len(buf) + 1
+        for byte in buf:
+            self.ram[self.page * 128 + self.col] = byte
+            self.col += 1
+            if self.col > self.col_window[1]:
+                self.col = self.col_window[0]
+                self.page += 1
+                if self.page > self.page_window[1]:
+                    self.page = self.page_window[0]
+
+    def show(self):
+        x0 = 0
+        x1 = self.width - 1
+        if self.width != 128:
+            col_offset = (128 - self.width) // 2
+            x0 += col_offset
+            x1 += col_offset
+        for cmd in (SET_COL_ADDR, x0, x1, SET_PAGE_ADDR, 0, self.pages - 1):
+            self.write_cmd(cmd)
+        self.write_data(self.buffer)
+
+    def poweroff(self):
+        self.write_cmd(0xAE)
+
+    def poweron(self):
+        self.write_cmd(0xAF)
+
+    def contrast(self, contrast):
+        self.write_cmd(0x81)
+        self.write_cmd(contrast)
+
+    def invert(self, invert):
+        self.write_cmd(SET_NORM_INV | (invert & 1))
+
+    def screen(self):
+        """the panel contents as text, '#' for a lit pixel"""
+        offset = (128 - self.width) // 2 if self.width != 128 else 0
+        rows = []
+        for y in range(self.height):
+            row = (y + self.start_line) % (RAM_PAGES * 8)
+            mask = 1 << (row & 7)
+            base = (row >> 3) * 128 + offset
+            rows.append(
+                "".join(
+                    "#" if self.ram[base + x] & mask else "." for x in range(self.width)
+                )
+            )
+        return "\n".join(rows)
@@ -0,0 +1,3 @@
+"""Host stand-in for the MicroPython `ubinascii` module"""
+
+from binascii import *  # noqa: F401,F403
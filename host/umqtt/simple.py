@@ -0,0 +1,199 @@
+"""Host stand-in for micropython-lib `umqtt.simple` backed by host/broker.py
+
+Outgoing calls go straight to the broker, but everything the client receives
+(PUBLISH, SUBACK, PINGRESP) is queued on the socket as wire bytes and parsed
+by the same wait_msg as umqtt.simple, so subclasses that read the socket
+themselves behave as they do on the device.
+"""
+
+import struct
+
+import broker
+
+
+class MQTTException(Exception):
+    pass
+
+
+class Socket:
+    """in-memory socket, rx holds the bytes the broker sent to the client
+
+    Of the packets a client writes, SUBSCRIBE and PINGREQ are answered;
+    PUBACK is accepted and ignored. close() detaches the client from the
+    broker without a DISCONNECT.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.rx = bytearray()
+        self.blocking = True
+
+    def setblocking(self, flag):
+        self.blocking = flag
+
+    def close(self):
+        # the broker drops the connection, as it does when the TCP link goes
+        broker.get(self.client.server).detach(self.client)
+
+    def feed(self, data):
+        self.rx += data
+
+    def write(self, data):
+        data = bytes(data)
+        op = data[0]
+        if op == 0xC0:
+            self.client._broker().pingreq(self.client)
+        elif op == 0x82:
+            self.subscribe(data)
+        elif op != 0x40:
+            raise NotImplementedError("packet type {0:#x}".format(op))
+        return len(data)
+
+    def subscribe(self, data):
+        i = 1
+        while data[i] & 0x80:
+            i += 1
+        i += 1
+        pid = data[i : i + 2]
+        i += 2
+        granted = bytearray()
+        while i < len(data):
+            size = int.from_bytes(data[i : i + 2], "big")
+            topic = data[i + 2 : i + 2 + size]
+            if topic not in self.client.subscriptions:
+                self.client.subscriptions.append(topic)
+            granted.append(min(data[i + 2 + size], 1))
+            i += 3 + size
+        self.feed(bytes((0x90, 2 + len(granted))) + pid + granted)
+
+    def read(self, n):
+        if not self.rx:
+            if not self.blocking:
+                return None
+            # a real socket would block here forever
+            raise OSError(110, "ETIMEDOUT")
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+
+def _bytes(value):
+    return value.encode() if isinstance(value, str) else bytes(value)
+
+
+def publish_packet(topic, msg):
+    """QoS 0 PUBLISH as the broker sends it"""
+    size = 2 + len(topic) + len(msg)
+    packet = bytearray(b"\x30")
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        packet.append(byte | 0x80 if size else byte)
+        if not size:
+            break
+    return packet + struct.pack("!H", len(topic)) + topic + msg
+
+
+class MQTTClient:
+    def __init__(
+        self,
+        client_id,
+        server,
+        port=0,
+        user=None,
+        password=None,
+        keepalive=0,
+        ssl=False,
+        ssl_params={},
+    ):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.user = user
+        self.pswd = password
+        self.keepalive = keepalive
+        self.ssl = ssl
+        self.sock = None
+        self.pid = 0
+        self.cb = None
+        self.lw_topic = None
+        self.subscriptions = []
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        self.lw_topic = topic
+
+    def _broker(self):
+        if self.sock is None:
+            raise OSError(-1, "not connected")
+        return broker.get(self.server)
+
+    def _recv_len(self):
+        n = 0
+        sh = 0
+        while 1:
+            b = self.sock.read(1)[0]
+            n |= (b & 0x7F) << sh
+            if not b & 0x80:
+                return n
+            sh += 7
+
+    def connect(self, clean_session=True, timeout=None):
+        if clean_session:
+            self.subscriptions = []
+        self.sock = Socket(self)
+        try:
+            return broker.get(self.server).attach(self, clean_session)
+        except OSError:
+            self.sock = None
+            raise
+
+    def deliver(self, topic, msg):
+        """called by the broker for every message the client is subscribed to"""
+        self.sock.feed(publish_packet(topic, msg))
+
+    def disconnect(self):
+        broker.get(self.server).detach(self)
+        self.sock = None
+
+    def ping(self):
+        self._broker()
+        self.sock.write(b"\xc0\0")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self._broker().publish(_bytes(topic), _bytes(msg), retain, qos)
+
+    def subscribe(self, topic, qos=0):
+        self._broker()
+        topic = _bytes(topic)
+        if topic not in self.subscriptions:
+            self.subscriptions.append(topic)
+
+    def wait_msg(self):
+        self._broker()
+        res = self.sock.read(1)
+        self.sock.setblocking(True)
+        if res is None:
+            return None
+        if res == b"\xd0":  # PINGRESP
+            sz = self.sock.read(1)[0]
+            assert sz == 0
+            return None
+        op = res[0]
+        if op & 0xF0 != 0x30:
+            return op
+        sz = self._recv_len()
+        topic_len = self.sock.read(2)
+        topic_len = (topic_len[0] << 8) | topic_len[1]
+        topic = self.sock.read(topic_len)
+        sz -= topic_len + 2
+        msg = self.sock.read(sz)
+        self.cb(topic, msg)
+        return op
+
+    def check_msg(self):
+        self._broker()
+        self.sock.setblocking(False)
+        return self.wait_msg()
@@ -0,0 +1,23 @@
+"""Host stand-in for the MicroPython `usocket` module
+
+Everything but getaddrinfo is CPython's socket module. Names resolve to the
+made up addresses in broker.addresses, so a device can connect to a broker by
+its address, and `lookups` counts the name lookups a real resolver would make.
+"""
+
+from socket import *  # noqa: F401,F403
+from socket import AF_INET, SOCK_STREAM
+
+import broker
+
+lookups = 0
+
+
+def getaddrinfo(host, port, af=0, type=0, proto=0, flags=0):
+    global lookups
+    if host.replace(".", "").isdigit():
+        address = host
+    else:
+        lookups += 1
+        address = broker.address(host)
+    return [(AF_INET, SOCK_STREAM, 0, "", (address, port))]
@@ -1,933 +0,0 @@
-mothership_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x01,
-        0xC0,
-        0x00,
-        0x00,
-        0x0E,
-        0x10,
-        0x00,
-        0x00,
-        0x08,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x7E,
-        0x7E,
-        0x00,
-        0x03,
-        0xFF,
-        0xFF,
-        0xC0,
-        0x02,
-        0x00,
-        0x00,
-        0x40,
-        0x00,
-        0x40,
-        0x02,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0xC7,
-        0xA0,
-        0x00,
-        0x00,
-        0x07,
-        0x82,
-        0x00,
-        0x00,
-        0x0C,
-        0x32,
-        0x00,
-        0x00,
-        0x0C,
-        0x70,
-        0x40,
-        0x00,
-        0x0D,
-        0xF0,
-        0x40,
-        0x00,
-        0x0F,
-        0xF0,
-        0x00,
-        0x00,
-        0x1C,
-        0x18,
-        0x00,
-        0x00,
-        0x1C,
-        0x38,
-        0x00,
-        0x00,
-        0x1D,
-        0xF8,
-        0x00,
-        0x00,
-        0x1D,
-        0xF8,
-        0x00,
-        0x00,
-        0x1F,
-        0xFC,
-        0x00,
-        0x00,
-        0x78,
-        0x1E,
-        0x00,
-        0x00,
-        0x0F,
-        0xF0,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
-
-black_lotus_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-        0x00,
-        0x01,
-        0xC0,
-        0x00,
-        0x00,
-        0x23,
-        0xC6,
-        0x00,
-        0x00,
-        0x73,
-        0x6E,
-        0x00,
-        0x00,
-        0x7A,
-        0x1E,
-        0x00,
-        0x00,
-        0x1C,
-        0x98,
-        0x00,
-        0x03,
-        0x81,
-        0xC2,
-        0xE0,
-        0x03,
-        0xB3,
-        0xE4,
-        0xC0,
-        0x03,
-        0xB7,
-        0xE5,
-        0xC0,
-        0x01,
-        0x87,
-        0xF5,
-        0x80,
-        0x00,
-        0xC7,
-        0xF3,
-        0x80,
-        0x00,
-        0x67,
-        0xE3,
-        0x00,
-        0x07,
-        0x33,
-        0xE6,
-        0x70,
-        0x0F,
-        0x99,
-        0x99,
-        0xF0,
-        0x07,
-        0xC0,
-        0x23,
-        0xE0,
-        0x03,
-        0xF8,
-        0x0F,
-        0xC0,
-        0x00,
-        0xF9,
-        0x8F,
-        0x00,
-        0x00,
-        0x03,
-        0xE0,
-        0x00,
-        0x00,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0x03,
-        0xC0,
-        0x00,
-        0x00,
-        0x01,
-        0xC0,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
-
-crown_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x10,
-        0x08,
-        0x00,
-        0x02,
-        0x10,
-        0x08,
-        0x40,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x40,
-        0x02,
-        0x00,
-        0x20,
-        0x00,
-        0x00,
-        0x04,
-        0x18,
-        0x00,
-        0x00,
-        0x18,
-        0x01,
-        0x00,
-        0x00,
-        0x80,
-        0x01,
-        0x01,
-        0x80,
-        0x80,
-        0x41,
-        0x81,
-        0x81,
-        0x82,
-        0x01,
-        0xC3,
-        0xC3,
-        0x80,
-        0x61,
-        0xC7,
-        0xC3,
-        0x86,
-        0x79,
-        0xE7,
-        0xE7,
-        0x9E,
-        0x39,
-        0xF3,
-        0xCF,
-        0x9C,
-        0x1D,
-        0xF3,
-        0xDF,
-        0xB8,
-        0x0D,
-        0xFB,
-        0xDF,
-        0xB0,
-        0x05,
-        0xFB,
-        0xDF,
-        0xA0,
-        0x01,
-        0xF9,
-        0x9F,
-        0x80,
-        0x01,
-        0xF9,
-        0x9F,
-        0x80,
-        0xF8,
-        0xF8,
-        0x1F,
-        0x1F,
-        0x00,
-        0x3C,
-        0x3C,
-        0x00,
-        0x01,
-        0x9E,
-        0x79,
-        0x80,
-        0x1D,
-        0xC6,
-        0x63,
-        0xB8,
-        0x00,
-        0x03,
-        0xC0,
-        0x00,
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-        0x00,
-        0x19,
-        0x98,
-        0x00,
-        0x00,
-        0x0C,
-        0x30,
-        0x00,
-        0x00,
-        0x02,
-        0x40,
-        0x00,
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
-
-d20_bytes = bytearray(
-    [
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-        0x00,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0x1C,
-        0x38,
-        0x00,
-        0x00,
-        0x70,
-        0x0E,
-        0x00,
-        0x01,
-        0xC0,
-        0x03,
-        0x80,
-        0x07,
-        0x00,
-        0x00,
-        0xE0,
-        0x1C,
-        0x00,
-        0x00,
-        0x38,
-        0x70,
-        0x79,
-        0x9E,
-        0x0E,
-        0xF0,
-        0x00,
-        0x00,
-        0x0F,
-        0xC0,
-        0x02,
-        0x40,
-        0x03,
-        0xE0,
-        0x04,
-        0x20,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0x07,
-        0xD0,
-        0x08,
-        0x10,
-        0x0B,
-        0xD0,
-        0x10,
-        0x08,
-        0x0B,
-        0xC0,
-        0x00,
-        0x00,
-        0x03,
-        0xC8,
-        0x20,
-        0x04,
-        0x13,
-        0xC0,
-        0x40,
-        0x02,
-        0x03,
-        0xC4,
-        0x00,
-        0x00,
-        0x23,
-        0xC0,
-        0x80,
-        0x01,
-        0x03,
-        0xC3,
-        0x00,
-        0x00,
-        0xC3,
-        0xC1,
-        0xFF,
-        0xFF,
-        0x83,
-        0xC5,
-        0x00,
-        0x00,
-        0xA3,
-        0xD0,
-        0x80,
-        0x01,
-        0x0B,
-        0xC0,
-        0x40,
-        0x02,
-        0x03,
-        0x70,
-        0x20,
-        0x04,
-        0x0E,
-        0x1C,
-        0x10,
-        0x08,
-        0x38,
-        0x07,
-        0x08,
-        0x10,
-        0xE0,
-        0x01,
-        0xC0,
-        0x03,
-        0x80,
-        0x00,
-        0x70,
-        0x0E,
-        0x00,
-        0x00,
-        0x1C,
-        0x38,
-        0x00,
-        0x00,
-        0x07,
-        0xE0,
-        0x00,
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-    ]
-)
-
-# skull 32x32
-skull_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x03,
-        0xF8,
-        0x00,
-        0x00,
-        0x0F,
-        0xF8,
-        0x00,
-        0x00,
-        0x1F,
-        0xF1,
-        0x00,
-        0x00,
-        0x3F,
-        0xC7,
-        0x00,
-        0x00,
-        0x3F,
-        0x8E,
-        0x00,
-        0x00,
-        0x7F,
-        0x1C,
-        0x40,
-        0x00,
-        0x73,
-        0x78,
-        0xC0,
-        0x00,
-        0x7F,
-        0xE3,
-        0xC0,
-        0x00,
-        0xFF,
-        0xE6,
-        0xC0,
-        0x01,
-        0xFE,
-        0x73,
-        0xC0,
-        0x00,
-        0x9C,
-        0x3B,
-        0xC0,
-        0x00,
-        0x98,
-        0x1B,
-        0xC0,
-        0x00,
-        0x98,
-        0x18,
-        0x40,
-        0x00,
-        0x9C,
-        0x3E,
-        0x00,
-        0x01,
-        0xFE,
-        0x7C,
-        0x80,
-        0x00,
-        0xE7,
-        0xF1,
-        0x00,
-        0x00,
-        0x26,
-        0x02,
-        0x00,
-        0x00,
-        0x3F,
-        0x84,
-        0x00,
-        0x00,
-        0x3F,
-        0xC0,
-        0x00,
-        0x00,
-        0x2B,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
-
-# side profile of wings 32x32
-wing_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x40,
-        0x00,
-        0x00,
-        0x00,
-        0xC0,
-        0x00,
-        0x00,
-        0x01,
-        0xC0,
-        0x00,
-        0x00,
-        0x07,
-        0xC0,
-        0x00,
-        0x00,
-        0x1F,
-        0x80,
-        0x00,
-        0x00,
-        0x7F,
-        0x00,
-        0x00,
-        0x00,
-        0xFE,
-        0x00,
-        0x00,
-        0x03,
-        0xBC,
-        0x00,
-        0x00,
-        0x0F,
-        0x70,
-        0x80,
-        0x00,
-        0x1F,
-        0x43,
-        0x00,
-        0x00,
-        0x36,
-        0xBF,
-        0x00,
-        0x00,
-        0x3C,
-        0xFE,
-        0x00,
-        0x00,
-        0x69,
-        0xE0,
-        0x00,
-        0x00,
-        0xE3,
-        0xFC,
-        0x00,
-        0x00,
-        0xF7,
-        0xF8,
-        0x00,
-        0x00,
-        0x8F,
-        0x00,
-        0x00,
-        0x00,
-        0x9F,
-        0xE0,
-        0x00,
-        0x00,
-        0x3B,
-        0x00,
-        0x00,
-        0x00,
-        0x76,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
-
-# heart 32x32
-heart_bytes = bytearray(
-    [
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x1E,
-        0x78,
-        0x00,
-        0x00,
-        0x3F,
-        0xFC,
-        0x00,
-        0x00,
-        0x61,
-        0x86,
-        0x00,
-        0x00,
-        0x61,
-        0x86,
-        0x00,
-        0x00,
-        0x60,
-        0x06,
-        0x00,
-        0x00,
-        0x60,
-        0x06,
-        0x00,
-        0x00,
-        0x30,
-        0x0C,
-        0x00,
-        0x00,
-        0x18,
-        0x18,
-        0x00,
-        0x00,
-        0x0C,
-        0x30,
-        0x00,
-        0x00,
-        0x06,
-        0x60,
-        0x00,
-        0x00,
-        0x03,
-        0xC0,
-        0x00,
-        0x00,
-        0x01,
-        0x80,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-        0x00,
-    ]
-)
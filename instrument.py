@@ -0,0 +1,172 @@
+"""Hot path timers, counters and GC stats for the controller
+
+Probes time code paths with time.ticks_us into a log2 histogram held in a
+preallocated array, and note how much heap each call allocated. Everything
+is off unless enable() runs before mothership is imported: disabled, timed()
+hands back the undecorated function and count() returns straight away, so
+the instrumented code runs as it did without it.
+
+The heap is sampled with every timed call. MicroPython has no collection
+counter, so a collection is counted whenever the allocated heap shrinks
+between samples.
+"""
+
+import array
+import gc
+import time
+
+enabled = False
+
+# bucket i counts calls under 16 << i us, the last one everything slower
+BUCKETS = 16
+BUCKET_MIN_US = 16
+
+probes = {}
+counters = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+class Heap:
+    """GC figures sampled alongside the probes"""
+
+    def __init__(self):
+        self.last_alloc = 0
+        self.collections = 0
+        self.min_free = None
+
+    def sample(self):
+        """allocated heap bytes, None where the port does not report it"""
+        if not hasattr(gc, "mem_alloc"):
+            return None
+        alloc = gc.mem_alloc()
+        if alloc < self.last_alloc:
+            self.collections += 1
+        self.last_alloc = alloc
+        free = gc.mem_free()
+        if self.min_free is None or free < self.min_free:
+            self.min_free = free
+        return alloc
+
+    def stats(self):
+        self.sample()
+        if not hasattr(gc, "mem_free"):
+            return {}
+        return {
+            "free": gc.mem_free(),
+            "alloc": gc.mem_alloc(),
+            "minFree": self.min_free,
+            "collections": self.collections,
+        }
+
+
+heap = Heap()
+
+
+class Probe:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.alloc = 0
+        self.hist = array.array("I", [0] * BUCKETS)
+
+    def record(self, us, alloc=0):
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+        self.alloc += alloc
+        bucket = 0
+        us //= BUCKET_MIN_US
+        while us and bucket < BUCKETS - 1:
+            us >>= 1
+            bucket += 1
+        self.hist[bucket] += 1
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "avgUs": self.total_us // max(self.count, 1),
+            "maxUs": self.max_us,
+            "allocBytes": self.alloc,
+            "hist": list(self.hist),
+        }
+
+
+def probe(name):
+    p = probes.get(name)
+    if p is None:
+        p = probes[name] = Probe(name)
+    return p
+
+
+def timed(name):
+    """decorator timing every call of a function under name"""
+
+    def decorate(fn):
+        if not enabled:
+            return fn
+        p = probe(name)
+
+        def wrapper(*args, **kwargs):
+            alloc = heap.sample()
+            start = time.ticks_us()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                us = time.ticks_diff(time.ticks_us(), start)
+                after = heap.sample()
+                # a collection inside the call hides what it allocated
+                grown = after - alloc if alloc is not None and after > alloc else 0
+                p.record(us, grown)
+
+        return wrapper
+
+    return decorate
+
+
+def count(name, n=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def reset():
+    probes.clear()
+    counters.clear()
+    heap.collections = 0
+    heap.min_free = None
+
+
+def snapshot():
+    """everything recorded so far, ready for json.dumps"""
+    return {
+        "enabled": enabled,
+        "bucketMinUs": BUCKET_MIN_US,
+        "probes": {name: p.stats() for name, p in probes.items()},
+        "counters": dict(counters),
+        "gc": heap.stats(),
+    }
+
+
+def dump():
+    """print the snapshot to the console, one line per probe"""
+    print("instrument: {0}".format("on" if enabled else "off"))
+    for name, p in probes.items():
+        print(
+            "  {0}: n={1} avg={2}us max={3}us alloc={4}B hist={5}".format(
+                name,
+                p.count,
+                p.total_us // max(p.count, 1),
+                p.max_us,
+                p.alloc,
+                list(p.hist),
+            )
+        )
+    for name, value in counters.items():
+        print("  {0}: {1}".format(name, value))
+    print("  gc: {0}".format(heap.stats()))
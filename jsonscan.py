@@ -0,0 +1,141 @@
+"""Partial JSON decoding straight from a bytes payload
+
+Values are located by scanning the raw bytes, and only the wanted ones are
+handed to json.loads, so a large message never becomes a str copy or a full
+object tree. Unwanted values are skipped without allocating. The scan is
+slower than a full json.loads; the win is the much smaller heap footprint.
+"""
+
+import json
+import micropython
+
+QUOTE = 34
+BACKSLASH = 92
+COMMA = 44
+COLON = 58
+OPEN_OBJECT = 123
+CLOSE_OBJECT = 125
+OPEN_ARRAY = 91
+CLOSE_ARRAY = 93
+
+
+@micropython.native
+def skip_ws(buf, i):
+    n = len(buf)
+    while i < n and buf[i] in (32, 9, 10, 13):
+        i += 1
+    return i
+
+
+@micropython.native
+def string_end(buf, i):
+    """index just past the closing quote of the string starting at i"""
+    j = i + 1
+    while True:
+        j = buf.find(b'"', j)
+        if j < 0:
+            raise ValueError("unterminated string")
+        # the quote is escaped when preceded by an odd number of backslashes
+        k = j - 1
+        while buf[k] == BACKSLASH:
+            k -= 1
+        if (j - 1 - k) % 2 == 0:
+            return j + 1
+        j += 1
+
+
+@micropython.native
+def value_end(buf, i):
+    """index just past the JSON value starting at i"""
+    c = buf[i]
+    if c == QUOTE:
+        return string_end(buf, i)
+    n = len(buf)
+    if c == OPEN_OBJECT or c == OPEN_ARRAY:
+        depth = 0
+        while i < n:
+            c = buf[i]
+            if c == QUOTE:
+                i = string_end(buf, i)
+                continue
+            if c == OPEN_OBJECT or c == OPEN_ARRAY:
+                depth += 1
+            elif c == CLOSE_OBJECT or c == CLOSE_ARRAY:
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        raise ValueError("unterminated container")
+    # number, true, false or null
+    while i < n and buf[i] not in (COMMA, CLOSE_OBJECT, CLOSE_ARRAY, 32, 9, 10, 13):
+        i += 1
+    return i
+
+
+def items(buf, start, end):
+    """(start, end) spans of the elements of the array at buf[start:end]"""
+    i = skip_ws(buf, start + 1)
+    while i < end:
+        c = buf[i]
+        if c == CLOSE_ARRAY:
+            return
+        if c == COMMA:
+            i = skip_ws(buf, i + 1)
+            continue
+        item_end = value_end(buf, i)
+        yield i, item_end
+        i = skip_ws(buf, item_end)
+
+
+class Fields:
+    """a fixed set of object keys to pull out of JSON payloads"""
+
+    def __init__(self, *names):
+        self.names = names
+        self.keys = tuple(name.encode() for name in names)
+
+    def spans(self, buf, start=0):
+        """(start, end) of each wanted value in the object at start, None if absent"""
+        found = [None] * len(self.keys)
+        remaining = len(self.keys)
+        try:
+            i = skip_ws(buf, start)
+            if buf[i] != OPEN_OBJECT:
+                raise ValueError("expected an object")
+            i += 1
+            while remaining:
+                i = skip_ws(buf, i)
+                c = buf[i]
+                if c == CLOSE_OBJECT:
+                    break
+                if c == COMMA:
+                    i += 1
+                    continue
+                key_start = i + 1
+                key_end = string_end(buf, i) - 1
+                i = skip_ws(buf, key_end + 1)
+                if buf[i] != COLON:
+                    raise ValueError("expected ':'")
+                i = skip_ws(buf, i + 1)
+                end = value_end(buf, i)
+                for index, key in enumerate(self.keys):
+                    if (
+                        found[index] is None
+                        and len(key) == key_end - key_start
+                        and buf.startswith(key, key_start)
+                    ):
+                        found[index] = (i, end)
+                        remaining -= 1
+                        break
+                i = end
+        except IndexError:
+            raise ValueError("truncated JSON")
+        return found
+
+    def pick(self, buf, start=0):
+        """dict of the wanted keys present in the object at start"""
+        picked = {}
+        for name, span in zip(self.names, self.spans(buf, start)):
+            if span is not None:
+                picked[name] = json.loads(buf[span[0] : span[1]])
+        return picked
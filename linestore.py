@@ -0,0 +1,284 @@
+"""Line files with a sidecar offset index
+
+A store is a text file with one record per line, such as msg.txt, and an
+index file next to it. The index starts with a header: a magic number, the
+number of data bytes it covers, their CRC-32 and the data file's mtime when
+the header was written. After that it holds the offset of every record as a
+little-endian 32-bit value. The top bit of an offset marks a deleted record. Records are
+read by seeking through the index, so fetching, sampling and iterating never
+load the whole file. Appends go to the end of both files.
+
+Records are numbered by their position among the live ones, as in a list.
+Deleting a record only sets its mark, and the records after it move up a
+position. Once enough records are marked, the store is compacted: live records are copied to new files that replace the
+old ones. When the data file's size or mtime differ from the header, the
+covered bytes are checksummed again. If they still match, records appended
+without the index (a plain line store edited by hand, or a crash between
+the two writes) are indexed. Otherwise the file was edited in place and the
+index, deletion marks included, is rebuilt from scratch.
+"""
+
+import binascii
+import os
+import random
+import struct
+
+DELETED = 0x80000000
+OFFSET_MASK = 0x7FFFFFFF
+MAGIC = b"LSI1"
+HEADER_FORMAT = "<4sIII"
+HEADER = 16
+ENTRY = 4
+# compact once this many records are deleted and they are a quarter of all
+COMPACT_MIN = 16
+# index entries read at once while iterating
+CHUNK = 32
+
+stores = {}
+
+
+def open_store(path):
+    """the store for path, shared by everything that opens it"""
+    store = stores.get(path)
+    if store is None:
+        store = stores[path] = LineStore(path)
+    return store
+
+
+def _size(path):
+    try:
+        return os.stat(path)[6]
+    except OSError:
+        return -1
+
+
+def _mtime(path):
+    return os.stat(path)[8] & 0xFFFFFFFF
+
+
+class LineStore:
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + ".idx"
+        # records including deleted ones, and how many are deleted
+        self.count = 0
+        self.deleted = 0
+        self.end = 0
+        self.crc = 0
+        self.data = None
+        self.index = None
+        self.entry = bytearray(ENTRY)
+        self.chunk = bytearray(ENTRY * CHUNK)
+        self.open()
+
+    def open(self):
+        if _size(self.path) < 0:
+            open(self.path, "wb").close()
+        self.data = open(self.path, "r+b")
+        data_size = _size(self.path)
+        stamp = None
+        size = _size(self.index_path)
+        if size >= HEADER and (size - HEADER) % ENTRY == 0:
+            self.index = open(self.index_path, "r+b")
+            magic, self.end, self.crc, stamp = struct.unpack(
+                HEADER_FORMAT, self.index.read(HEADER)
+            )
+            self.count = (size - HEADER) // ENTRY
+            if magic != MAGIC or self.end > data_size or not self.ends_line():
+                stamp = None
+            elif (self.end, stamp) != (data_size, _mtime(self.path)):
+                # touched since the header was written, appended to or edited
+                if self.checksum(self.end) != self.crc:
+                    stamp = None
+            if stamp is None:
+                self.index.close()
+        if stamp is None:
+            self.index = open(self.index_path, "w+b")
+            self.index.write(bytes(HEADER))
+            self.end = 0
+            self.crc = 0
+            self.count = 0
+        if stamp is None or (self.end, stamp) != (data_size, _mtime(self.path)):
+            self.catch_up()
+        self.deleted = 0
+        for i in range(self.count):
+            if self.read_entry(i) & DELETED:
+                self.deleted += 1
+
+    def ends_line(self):
+        """whether the covered bytes end on a line break"""
+        if not self.end:
+            return True
+        self.data.seek(self.end - 1)
+        return self.data.read(1) == b"\n"
+
+    def checksum(self, end):
+        """CRC-32 of the first end data bytes, read a block at a time"""
+        crc = 0
+        block = bytearray(256)
+        view = memoryview(block)
+        self.data.seek(0)
+        while end > 0:
+            n = self.data.readinto(block)
+            if not n:
+                break
+            n = min(n, end)
+            crc = binascii.crc32(view[:n], crc)
+            end -= n
+        return crc
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.index.close()
+            self.data = None
+            self.index = None
+
+    def catch_up(self):
+        """index the records past the end the index covers"""
+        self.data.seek(self.end)
+        self.index.seek(HEADER + self.count * ENTRY)
+        offset = self.end
+        while True:
+            line = self.data.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                # an unterminated last line is a whole record too
+                self.data.write(b"\n")
+                line += b"\n"
+            if line.strip():
+                self.index.write(struct.pack("<I", offset))
+                self.count += 1
+            self.crc = binascii.crc32(line, self.crc)
+            offset += len(line)
+        self.set_end(offset)
+
+    def set_end(self, end):
+        self.end = end
+        self.data.flush()
+        header = struct.pack(HEADER_FORMAT, MAGIC, end, self.crc, _mtime(self.path))
+        self.index.seek(0)
+        self.index.write(header)
+        self.index.flush()
+
+    def read_entry(self, i):
+        self.index.seek(HEADER + i * ENTRY)
+        self.index.readinto(self.entry)
+        return struct.unpack("<I", self.entry)[0]
+
+    def read(self, offset):
+        self.data.seek(offset & OFFSET_MASK)
+        return self.data.readline().rstrip(b"\r\n").decode()
+
+    def __len__(self):
+        """number of live records"""
+        return self.count - self.deleted
+
+    def slot(self, i):
+        """index slot of live record i"""
+        if not 0 <= i < self.count - self.deleted:
+            raise IndexError("record {0} of {1}".format(i, len(self)))
+        if not self.deleted:
+            return i
+        chunk = self.chunk
+        for first in range(0, self.count, CHUNK):
+            self.index.seek(HEADER + first * ENTRY)
+            self.index.readinto(chunk)
+            for k in range(min(CHUNK, self.count - first)):
+                if not struct.unpack_from("<I", chunk, k * ENTRY)[0] & DELETED:
+                    if not i:
+                        return first + k
+                    i -= 1
+
+    def __getitem__(self, i):
+        """live record i"""
+        return self.read(self.read_entry(self.slot(i)))
+
+    def __iter__(self):
+        """live records in order, one line in memory at a time"""
+        chunk = bytearray(ENTRY * CHUNK)
+        for first in range(0, self.count, CHUNK):
+            # the index is read a chunk at a time, calls between yields may move it
+            self.index.seek(HEADER + first * ENTRY)
+            self.index.readinto(chunk)
+            for k in range(min(CHUNK, self.count - first)):
+                offset = struct.unpack_from("<I", chunk, k * ENTRY)[0]
+                if not offset & DELETED:
+                    yield self.read(offset)
+
+    def append(self, text):
+        """add a record, line breaks inside it become spaces"""
+        text = text.replace("\r", " ").replace("\n", " ")
+        if not text.strip():
+            return None
+        line = text.encode() + b"\n"
+        self.data.seek(self.end)
+        self.data.write(line)
+        self.crc = binascii.crc32(line, self.crc)
+        self.index.seek(HEADER + self.count * ENTRY)
+        self.index.write(struct.pack("<I", self.end))
+        self.count += 1
+        self.set_end(self.data.tell())
+        return self.count - self.deleted - 1
+
+    def find(self, text):
+        """position of the first live record equal to text, -1 if absent"""
+        position = 0
+        for record in self:
+            if record == text:
+                return position
+            position += 1
+        return -1
+
+    def delete(self, i):
+        """mark live record i deleted, compacting once enough are"""
+        slot = self.slot(i)
+        offset = self.read_entry(slot)
+        self.index.seek(HEADER + slot * ENTRY)
+        self.index.write(struct.pack("<I", offset | DELETED))
+        self.index.flush()
+        self.deleted += 1
+        if self.deleted >= COMPACT_MIN and self.deleted * 4 >= self.count:
+            self.compact()
+
+    def sample(self):
+        """a random live record, None when there is none"""
+        if not len(self):
+            return None
+        # with at most a quarter deleted a few draws nearly always hit
+        for _ in range(8):
+            offset = self.read_entry(random.randrange(self.count))
+            if not offset & DELETED:
+                return self.read(offset)
+        for record in self:
+            return record
+
+    def compact(self):
+        """rewrite both files with only the live records"""
+        data_tmp = self.path + ".tmp"
+        index_tmp = self.index_path + ".tmp"
+        count = 0
+        end = 0
+        crc = 0
+        with open(data_tmp, "wb") as data, open(index_tmp, "wb") as index:
+            index.write(bytes(HEADER))
+            for i in range(self.count):
+                offset = self.read_entry(i)
+                if offset & DELETED:
+                    continue
+                self.data.seek(offset)
+                line = self.data.readline()
+                data.write(line)
+                index.write(struct.pack("<I", end))
+                crc = binascii.crc32(line, crc)
+                end += len(line)
+                count += 1
+            # no mtime yet, the first open checksums the new file and stamps it
+            index.seek(0)
+            index.write(struct.pack(HEADER_FORMAT, MAGIC, end, crc, 0))
+        self.close()
+        # the index goes last, a stale one is rebuilt on open either way
+        os.rename(data_tmp, self.path)
+        os.rename(index_tmp, self.index_path)
+        self.open()
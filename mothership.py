@@ -1,27 +1,40 @@
+import array
+import instrument
 import json
+import jsonscan
+import linestore
 import micropython
 import network
+import os
 import random
+import struct
 import time
 import ubinascii
 import usocket
 import framebuf
-from image_bytes import (
-    skull_bytes,
-    heart_bytes,
-    wing_bytes,
-    d20_bytes,
-    mothership_bytes,
-    crown_bytes,
-    black_lotus_bytes,
-)
 
 from machine import Pin, Timer, unique_id, I2C
 
 # micropython-ssd1306
 from ssd1306 import SSD1306_I2C
-from time import sleep
-from umqtt.simple import MQTTClient
+from umqtt.simple import MQTTClient, MQTTException
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+# boot times are counted from when this module started running
+BOOT_TICKS = time.ticks_ms()
+boot_times = {}
+
+
+def mark_boot(event):
+    """remember how long after boot event first happened"""
+    if event not in boot_times:
+        boot_times[event] = time.ticks_diff(time.ticks_ms(), BOOT_TICKS)
+        print("boot: {0} after {1} ms".format(event, boot_times[event]))
+
 
 # MQTT client settings
 client_id: str = "scotty_{0}".format(ubinascii.hexlify(unique_id()).decode())
@@ -35,12 +48,15 @@ topic_pub_list = [
     "response",
     "api/users/r/getAllUsers",
     "api/game/mtg/r/join",
-]
-topic_sub: list = [
-    b"api/game/mtg/p/update",
-    b"test",
-    b"question",
-    b"api/users/p/getAllUsers",
+    "api/game/mtg/r/meNext",
+    "api/game/mtg/r/start",
+    "api/game/mtg/r/nextTurn",
+    "api/game/mtg/r/pausePlayCurrentPlayer",
+    "api/game/mtg/r/clearGame",
+    "api/game/mtg/r/modifyCommanderDmg",
+    "api/game/mtg/r/modifyPlayerHealth",
+    "api/game/mtg/r/snapshot",
+    "diagnostics",
 ]
 
 # mothership pinout
@@ -48,30 +64,287 @@ left_button = Pin(22, Pin.IN, Pin.PULL_UP)
 right_button = Pin(20, Pin.IN, Pin.PULL_UP)
 select_button = Pin(21, Pin.IN, Pin.PULL_UP)
 
+# button ids stored in the input event buffer
+BUTTON_LEFT = 0
+BUTTON_RIGHT = 1
+BUTTON_SELECT = 2
+NO_BUTTON = -1
+
 # encoder pinout
 pin_clk = 15
 pin_dt = 14
-encoder_value = 0
-last_clk_state = 0
+encoder = None
+
+# quadrature step for each (previous << 2 | current) CLK/DT state, 0 for no
+# movement or an impossible double transition
+QUADRATURE_TABLE = (0, -1, 1, 0, 1, 0, 0, -1, -1, 0, 0, 1, 0, 1, -1, 0)
+# state transitions per detent
+FULL_STEP = 4
+HALF_STEP = 2
+# encoder counts wrap so the IRQ never allocates a big int
+ENCODER_MASK = 0xFFFF
 
 # SSD1306 OLED screen configuration
 i2c = I2C(0, sda=Pin(0), scl=Pin(1), freq=400000)
+# SSD1306 addressing commands used for partial refreshes
+SET_COL_ADDR = 0x21
+SET_PAGE_ADDR = 0x22
+SET_DISP_START_LINE = 0x40
+# the controller has 8 pages of display RAM, a 32 row panel shows 4 of them
+RAM_PAGES = 8
 
 # User selectable characters
 characters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.!@#$%^&*()_-+=[]{};:,<>/? "
 
-mothershipUsers = None
 selectedUser = None
 
 tim = Timer()
 
 
+# packed icon asset, rebuild with tools/pack_sprites.py after editing sprites/
+SPRITE_FILE = "sprites.bin"
+
+
+class SpriteRegistry:
+    """index the packed sprite asset and build each icon FrameBuffer on first use"""
+
+    def __init__(self, path=SPRITE_FILE):
+        self.path = path
+        self.index = {}
+        self.cache = {}
+        try:
+            with open(path, "rb") as f:
+                if f.read(4) != b"SPR1":
+                    raise ValueError
+                for _ in range(f.read(1)[0]):
+                    name = f.read(f.read(1)[0]).decode()
+                    width, height, offset = struct.unpack("<BBH", f.read(4))
+                    self.index[name] = (width, height, offset)
+        except (OSError, ValueError) as e:
+            print("Could not load sprite pack {0} {1}".format(path, e))
+
+    def size(self, name):
+        width, height, _ = self.index[name]
+        return width, height
+
+    def get(self, name):
+        fb = self.cache.get(name)
+        if fb is None and name in self.index:
+            width, height, offset = self.index[name]
+            # read only this sprite into its own buffer, the FrameBuffer keeps it alive
+            buf = bytearray((width + 7) // 8 * height)
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                f.readinto(buf)
+            fb = framebuf.FrameBuffer(buf, width, height, framebuf.MONO_HLSB)
+            self.cache[name] = fb
+        return fb
+
+
+# one character strings for every byte, drawing from them allocates nothing
+GLYPHS = tuple(chr(c) if 32 <= c < 127 else " " if c < 32 else "?" for c in range(256))
+NEWLINE = 10
+SPACE = 32
+
+
+class TextLayout:
+    """word wrapped lines of a text, kept until the text changes
+
+    Lines are (start, end) offsets into the encoded text held in preallocated
+    arrays, and painting goes glyph by glyph through GLYPHS, so redrawing a
+    cached text, any page of it, allocates nothing.
+    """
+
+    def __init__(self, columns, max_lines=64):
+        self.columns = columns
+        self.max_lines = max_lines
+        self.starts = array.array("H", [0] * max_lines)
+        self.ends = array.array("H", [0] * max_lines)
+        self.lines = 0
+        self.parts = None
+        self.mv = memoryview(b"")
+
+    def set(self, *parts):
+        """lay out the concatenated parts unless they are the ones already laid out"""
+        if parts == self.parts:
+            return self.lines
+        self.parts = parts
+        # a sender's name or message may be a number or null in the JSON
+        text = "".join(str(part) for part in parts)
+        data = text.encode()
+        if len(data) != len(text):
+            # one column per character, anything the font lacks shows as ?
+            data = bytes(ord(c) if ord(c) < 128 else 63 for c in text)
+        self.mv = memoryview(data)
+        self.wrap()
+        return self.lines
+
+    def wrap(self):
+        mv = self.mv
+        n = len(mv)
+        columns = self.columns
+        lines = 0
+        i = 0
+        while i < n:
+            # a line never starts with the space it was broken at
+            while i < n and mv[i] == SPACE:
+                i += 1
+            if i >= n:
+                break
+            if lines == self.max_lines:
+                # the rest of the text is not shown
+                break
+            end = min(i + columns, n)
+            j = i
+            while j < end and mv[j] != NEWLINE:
+                j += 1
+            if j < end:
+                # explicit line break
+                next_start = j + 1
+                end = j
+            elif end < n and mv[end] != SPACE and mv[end] != NEWLINE:
+                # break after the last space that fits, a longer word is split
+                j = end
+                while j > i and mv[j - 1] != SPACE:
+                    j -= 1
+                if j > i:
+                    end = j
+                next_start = end
+            else:
+                next_start = end
+            while end > i and mv[end - 1] == SPACE:
+                end -= 1
+            self.starts[lines] = i
+            self.ends[lines] = end
+            lines += 1
+            i = next_start
+        self.lines = lines
+
+    def draw_line(self, fb, line, y):
+        """paint one line at y on any frame buffer, returns its width in pixels"""
+        mv = self.mv
+        x = 0
+        for k in range(self.starts[line], self.ends[line]):
+            fb.text(GLYPHS[mv[k]], x, y)
+            x += 8
+        return x
+
+    def draw(self, oled, first_line=0, rows=3, line_height=10):
+        """paint rows lines starting at first_line, one per line_height pixels"""
+        last = min(first_line + rows, self.lines)
+        for line in range(first_line, last):
+            y = (line - first_line) * line_height
+            oled.mark_dirty(0, y, self.draw_line(oled.oled, line, y), 8)
+
+
+class Marquee:
+    """scroll the OLED's laid out text upwards with the display start line
+
+    The panel shows a 32 row window of the controller's 64 rows of RAM from
+    the display start line, so moving the text costs one command per frame.
+    The text is rendered a page at a time into one reused page buffer and
+    written to the RAM page that has just scrolled out of view, 128 bytes
+    every 8 frames. The text repeats after a blank line, holding still for
+    hold_frames at the top of every pass.
+    """
+
+    def __init__(self, oled, speed=1, hold_frames=30, line_height=10):
+        self.oled = oled
+        self.speed = speed
+        self.hold_frames = hold_frames
+        self.line_height = line_height
+        self.page = bytearray(oled.width)
+        self.page_fb = framebuf.FrameBuffer(self.page, oled.width, 8, framebuf.MONO_VLSB)
+        # queued by display_marquee, started by the next show()
+        self.queued = False
+        self.active = False
+        # pixels scrolled since start, the text repeats every period pages
+        self.offset = 0
+        self.period = 0
+        # text pages written to RAM since start
+        self.loaded = 0
+        self.hold = 0
+        self.frames = 0
+
+    def start(self):
+        layout = self.oled.layout
+        self.queued = False
+        self.active = True
+        self.period = ((layout.lines + 1) * self.line_height + 7) // 8
+        self.offset = 0
+        self.loaded = 0
+        self.hold = self.hold_frames
+        while self.loaded < RAM_PAGES:
+            self.load()
+        self.oled.oled.write_cmd(SET_DISP_START_LINE)
+        self.oled.total_bytes += 2
+
+    def load(self):
+        """render the next text page into the RAM page it scrolls in from"""
+        layout = self.oled.layout
+        top = (self.loaded % self.period) * 8
+        self.page_fb.fill(0)
+        line = top // self.line_height
+        while line < layout.lines and line * self.line_height < top + 8:
+            layout.draw_line(self.page_fb, line, line * self.line_height - top)
+            line += 1
+        self.oled.write_page(self.loaded % RAM_PAGES, self.page)
+        self.loaded += 1
+
+    def step(self):
+        """advance one frame"""
+        if self.hold:
+            self.hold -= 1
+            return
+        self.offset += self.speed
+        # RAM holds the visible pages and the ones below them
+        while self.loaded < self.offset // 8 + RAM_PAGES:
+            self.load()
+        start_line = self.offset % (RAM_PAGES * 8)
+        self.oled.oled.write_cmd(SET_DISP_START_LINE | start_line)
+        self.oled.total_bytes += 2
+        self.frames += 1
+        if self.offset % (self.period * 8) == 0:
+            self.hold = self.hold_frames
+
+    def stop(self):
+        """put the panel back to showing RAM from the top"""
+        self.queued = False
+        if not self.active:
+            return
+        self.active = False
+        self.oled.oled.write_cmd(SET_DISP_START_LINE)
+        self.oled.total_bytes += 2
+        # the first pages of RAM hold text, not what the frame buffer last pushed
+        self.oled.forget()
+
+
 class OLED:
     def __init__(self, width, height, i2c, rows=3):
         self.oled = SSD1306_I2C(width, height, i2c)
+        self.width = width
+        self.height = height
+        self.pages = height // 8
         self.rows = rows
+        self.layout = TextLayout(width // 8)
+        self.marquee = Marquee(self)
+        self.sprites = SpriteRegistry()
         self.sleep_timer = time.time()
         self.awake = True
+        # narrow panels are mapped to the centre columns of the controller RAM
+        self.col_offset = (128 - width) // 2 if width != 128 else 0
+        # per page dirty column window, x0 > x1 means the page is clean
+        self.dirty_x0 = bytearray([0xFF] * self.pages)
+        self.dirty_x1 = bytearray(self.pages)
+        # copy of what the panel currently shows, used to trim dirty windows
+        self.shadow = bytearray(len(self.oled.buffer))
+        self.buffer_mv = memoryview(self.oled.buffer)
+        self.shadow_mv = memoryview(self.shadow)
+        # bytes sent over I2C by the last show() and since boot
+        self.frame_bytes = 0
+        self.total_bytes = 0
+        # False once the panel RAM stopped matching shadow
+        self.shadow_valid = True
 
     def wake_up(self):
         self.sleep_timer = time.time()
@@ -82,304 +355,930 @@ class OLED:
         self.show()
         self.awake = False
 
+    def mark_dirty(self, x, y, width, height):
+        """flag a pixel rectangle as changed since the last show()"""
+        x0 = max(x, 0)
+        x1 = min(x + width, self.width) - 1
+        y0 = max(y, 0)
+        y1 = min(y + height, self.height) - 1
+        if x0 > x1 or y0 > y1:
+            return
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            if x0 < self.dirty_x0[page]:
+                self.dirty_x0[page] = x0
+            if x1 > self.dirty_x1[page]:
+                self.dirty_x1[page] = x1
+
     def clear(self):
         self.oled.fill(0)
+        self.mark_dirty(0, 0, self.width, self.height)
+        self.marquee.queued = False
+
+    def forget(self):
+        """push the whole frame buffer with the next show()"""
+        self.shadow_valid = False
+        self.mark_dirty(0, 0, self.width, self.height)
+
+    def write_page(self, page, data):
+        """write one full page of display RAM, visible or not"""
+        self.oled.write_cmd(SET_COL_ADDR)
+        self.oled.write_cmd(self.col_offset)
+        self.oled.write_cmd(self.col_offset + self.width - 1)
+        self.oled.write_cmd(SET_PAGE_ADDR)
+        self.oled.write_cmd(page)
+        self.oled.write_cmd(page)
+        self.oled.write_data(data)
+        self.total_bytes += 6 + len(data)
 
     def display_text(self, text, y):
         self.oled.text(text, 0, y)
+        self.mark_dirty(0, y, len(text) * 8, 8)
 
-    def blink(self, duration=0.08, repetitions=2):
+    async def blink(self, duration=0.08, repetitions=2):
         for _ in range(repetitions):
             self.oled.invert(1)  # Invert the display
             self.show()
-            time.sleep(duration)  # Wait for the specified duration
+            await asyncio.sleep(duration)  # Wait for the specified duration
             self.oled.invert(0)  # Revert back to normal
             self.show()
-            time.sleep(duration)  # Wait for the specified duration
+            await asyncio.sleep(duration)  # Wait for the specified duration
 
-    def display_long_text(self, text):
+    def display_long_text(self, text, flush=True, first_line=0):
+        """word wrap text and show rows lines of it from first_line, returns the
+        number of lines so callers can page through the rest
+        """
         self.clear()
-        max_chars_per_line = (
-            self.oled.width // 8
-        )  # Assuming each character is 8 pixels wide
-        lines = [
-            text[i : i + max_chars_per_line]
-            for i in range(0, len(text), max_chars_per_line)
-        ]
-        num_lines = min(
-            len(lines), self.rows
-        )  # Limit the number of lines displayed to the available rows
-
-        # Display the lines of text on the OLED screen
-        for i in range(num_lines):
-            self.display_text(lines[i], i * 10)
-
-        # Display the content on the OLED screen
-        self.oled.show()
+        lines = self.layout.set(text)
+        self.layout.draw(self, first_line, self.rows)
+        if flush:
+            self.show()
+        return lines
+
+    def display_marquee(self, text, flush=True):
+        """show text like display_long_text, scrolling it when it does not fit
+
+        The first rows are drawn into the frame buffer as usual and the
+        scrolling starts with the next show(), the render scheduler then
+        moves it every frame until the screen is cleared or redrawn.
+        """
+        lines = self.display_long_text(text, flush=False)
+        if lines > self.rows:
+            self.marquee.queued = True
+        if flush:
+            self.show()
+        return lines
+
+    def blit(self, fb, xPx, yPx, width=32, height=32):
+        self.oled.blit(fb, xPx, yPx)
+        self.mark_dirty(xPx, yPx, width, height)
+
+    def draw_sprite(self, name, x=0, y=0, flush=False):
+        """blit a cached icon so several can be composed before one show()"""
+        fb = self.sprites.get(name)
+        if fb is None:
+            print("Unknown sprite '{0}'".format(name))
+            return
+        width, height = self.sprites.size(name)
+        self.blit(fb, x, y, width, height)
+        if flush:
+            self.show()
 
     def display_skull(self, xPx: int = 0):
-        skull_fb = framebuf.FrameBuffer(skull_bytes, 32, 32, framebuf.MONO_HLSB)
-        self.oled.blit(skull_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("skull", xPx, 0, flush=True)
 
     def display_heart(self, xPx: int = 0):
-        heart_fb = framebuf.FrameBuffer(heart_bytes, 32, 32, framebuf.MONO_HLSB)
-        self.oled.blit(heart_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("heart", xPx, 0, flush=True)
 
     def display_wing(self, xPx: int = 0):
-        wing_fb = framebuf.FrameBuffer(wing_bytes, 32, 32, framebuf.MONO_HLSB)
-        self.oled.blit(wing_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("wing", xPx, 0, flush=True)
 
     def display_mothership(self, xPx: int = 0):
-        mothership_fb = framebuf.FrameBuffer(
-            mothership_bytes, 32, 32, framebuf.MONO_HLSB
-        )
-        self.oled.blit(mothership_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("mothership", xPx, 0, flush=True)
 
     def display_d20(self, xPx: int = 0):
-        d20_fb = framebuf.FrameBuffer(d20_bytes, 32, 32, framebuf.MONO_HLSB)
-        self.oled.blit(d20_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("d20", xPx, 0, flush=True)
 
     def display_crown(self, xPx: int = 0):
-        crown_fb = framebuf.FrameBuffer(crown_bytes, 32, 32, framebuf.MONO_HLSB)
-        self.oled.blit(crown_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("crown", xPx, 0, flush=True)
 
     def display_black_lotus(self, xPx: int = 0):
-        black_lotus_fb = framebuf.FrameBuffer(
-            black_lotus_bytes, 32, 32, framebuf.MONO_HLSB
-        )
-        self.oled.blit(black_lotus_fb, xPx, 0)
-        self.oled.show()
+        self.draw_sprite("black_lotus", xPx, 0, flush=True)
 
     def paint_black_custom(self, x, y, width=32, height=32):
         # Paint a black rectangle starting from the specified x and y coordinates used to 'clear' images
         self.oled.fill_rect(x, y, width, height, 0)
+        self.mark_dirty(x, y, width, height)
 
+    @instrument.timed("oled.show")
     def show(self):
-        self.oled.show()
-
-    def display_msg(self, username, message):
+        """push only the changed column window of each dirty page to the panel"""
+        if self.marquee.queued:
+            self.marquee.start()
+            return
+        # anything drawn over a scrolling text replaces it
+        self.marquee.stop()
+        buf = self.oled.buffer
+        shadow = self.shadow
+        pushed = 0
+        trim = self.shadow_valid
+        self.shadow_valid = True
+        for page in range(self.pages):
+            x0 = self.dirty_x0[page]
+            x1 = self.dirty_x1[page]
+            self.dirty_x0[page] = 0xFF
+            self.dirty_x1[page] = 0
+            # trim columns that already match what the panel is showing
+            base = page * self.width
+            while trim and x0 <= x1 and buf[base + x0] == shadow[base + x0]:
+                x0 += 1
+            while trim and x1 >= x0 and buf[base + x1] == shadow[base + x1]:
+                x1 -= 1
+            if x0 > x1:
+                continue
+            self.oled.write_cmd(SET_COL_ADDR)
+            self.oled.write_cmd(x0 + self.col_offset)
+            self.oled.write_cmd(x1 + self.col_offset)
+            self.oled.write_cmd(SET_PAGE_ADDR)
+            self.oled.write_cmd(page)
+            self.oled.write_cmd(page)
+            start = base + x0
+            end = base + x1 + 1
+            self.oled.write_data(self.buffer_mv[start:end])
+            self.shadow_mv[start:end] = self.buffer_mv[start:end]
+            pushed += 6 + end - start
+        self.frame_bytes = pushed
+        self.total_bytes += pushed
+
+    def display_msg(self, username, message, flush=True, first_line=0):
+        """show "username: message" like display_long_text"""
         self.clear()
+        lines = self.layout.set(username, ": ", message)
+        self.layout.draw(self, first_line, self.rows)
+        if flush:
+            self.show()
+        return lines
 
-        # Format the message with username, and line breaks
-        formatted_msg = "{}: {}".format(username, message)
-        max_chars_per_line = (
-            self.oled.width // 8
-        )  # Assuming each character is 8 pixels wide
 
-        # Split the message into lines based on the maximum characters per line
-        lines = [
-            formatted_msg[i : i + max_chars_per_line]
-            for i in range(0, len(formatted_msg), max_chars_per_line)
-        ]
-        num_lines = min(
-            len(lines), self.rows
-        )  # Limit the number of lines displayed to the available rows
+class Messages:
+    __slots__ = ("user_from", "message", "received", "seq")
 
-        # Display the lines of text on the OLED screen
-        for i in range(num_lines):
-            self.display_text(lines[i], i * 10)
+    def __init__(self, user_from=None, message=None):
+        self.user_from = user_from
+        self.message = message
+        self.received = 0
+        self.seq = 0
 
-        # Display the content on the OLED screen
-        self.oled.show()
 
+# inbox records kept, and how often a persisted inbox may be rewritten
+INBOX_SIZE = 16
+INBOX_SYNC_MS = 5000
+
+# characters that would split an inbox line, and what they are written as
+INBOX_ESCAPES = (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r"))
 
-class Messages:
-    def __init__(self, user_from, message):
-        self.user_from = user_from
-        self.message = message
+
+def inbox_field(value):
+    """one inbox file field, None is left empty"""
+    if value is None:
+        return ""
+    # senders do not always send strings
+    field = "{0}".format(value)
+    for char, escaped in INBOX_ESCAPES:
+        field = field.replace(char, escaped)
+    return field
+
+
+def inbox_value(field):
+    """the value inbox_field wrote, an empty field reads back as None"""
+    if not field:
+        return None
+    if "\\" not in field:
+        return field
+    chars = []
+    escaped = False
+    for char in field:
+        if escaped:
+            chars.append({"t": "\t", "n": "\n", "r": "\r"}.get(char, char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+class Inbox:
+    """unread messages in a fixed ring of reused Messages records
+
+    When the ring is full a new message overwrites the oldest and counts as a
+    drop, so a burst of chat traffic never grows the heap. push() returns a
+    handle, the record's sequence number, that remove() takes to drop that
+    very record later, wherever it has moved in the ring. With a path the
+    inbox is written there, at most every INBOX_SYNC_MS, and read back on
+    boot; one "user_from<TAB>message" line per record, oldest first, with
+    tabs and line breaks inside a field escaped and None left empty.
+    """
+
+    def __init__(self, size=INBOX_SIZE, path=None):
+        self.records = [Messages() for _ in range(size)]
+        self.size = size
+        # index of the oldest record and number of unread ones
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+        # sequence number of the last record pushed
+        self.seq = 0
+        self.path = path
+        self.dirty = False
+        self.last_sync = time.ticks_ms()
+        if path is not None:
+            self.load()
+
+    def __len__(self):
+        return self.count
+
+    def push(self, user_from, message):
+        if self.count == self.size:
+            # overwrite the oldest
+            self.head = (self.head + 1) % self.size
+            self.count -= 1
+            self.dropped += 1
+        record = self.records[(self.head + self.count) % self.size]
+        record.user_from = user_from
+        record.message = message
+        record.received = time.time()
+        self.seq += 1
+        record.seq = self.seq
+        self.count += 1
+        self.dirty = True
+        return self.seq
+
+    def oldest(self):
+        return self.records[self.head] if self.count else None
+
+    def get(self, handle):
+        """the record push() returned handle for, None once it is gone"""
+        for i in range(self.count):
+            record = self.records[(self.head + i) % self.size]
+            if record.seq == handle:
+                return record
+        return None
+
+    def _release(self, record):
+        # let the strings go, the record itself is reused
+        record.user_from = None
+        record.message = None
+        self.dirty = True
+
+    def pop_oldest(self):
+        if not self.count:
+            return False
+        self._release(self.records[self.head])
+        self.head = (self.head + 1) % self.size
+        self.count -= 1
+        return True
+
+    def remove(self, handle):
+        """drop the record push() returned handle for, False if it is gone"""
+        for i in range(self.count):
+            slot = (self.head + i) % self.size
+            record = self.records[slot]
+            if record.seq != handle:
+                continue
+            # close the gap by moving the newer records down a slot
+            for j in range(i, self.count - 1):
+                following = (slot + 1) % self.size
+                self.records[slot] = self.records[following]
+                slot = following
+            self.records[slot] = record
+            self.count -= 1
+            self._release(record)
+            return True
+        return False
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    user_from, _, message = line.rstrip("\n").partition("\t")
+                    self.push(inbox_value(user_from), inbox_value(message))
+        except OSError:
+            pass
+        self.dirty = False
+
+    def sync(self):
+        """write a persisted inbox that changed, rate limited to spare the flash"""
+        if not self.dirty or self.path is None:
+            return
+        if time.ticks_diff(time.ticks_ms(), self.last_sync) < INBOX_SYNC_MS:
+            return
+        self.dirty = False
+        self.last_sync = time.ticks_ms()
+        try:
+            with open(self.path, "w") as f:
+                for i in range(self.count):
+                    record = self.records[(self.head + i) % self.size]
+                    f.write(
+                        "{0}\t{1}\n".format(
+                            inbox_field(record.user_from), inbox_field(record.message)
+                        )
+                    )
+        except OSError as e:
+            print("Could not save the inbox: {0}".format(e))
+
+    def stats(self):
+        return {"unread": self.count, "dropped": self.dropped}
 
 
 class Mothership:
-    def __init__(self, oled):
+    def __init__(self, oled, inbox_path=None):
         self.sleep_timer = time.time()
+        self.oled = oled
+        self.unread_messages = Inbox(path=inbox_path)
 
+    def add_unread_message(self, user_from, message):
+        return self.unread_messages.push(user_from, message)
 
-class CharacterSelector:
-    def __init__(self, oled, characters):
+    def unread_count(self):
+        return len(self.unread_messages)
+
+    def display_oldest_message(self):
+        """show the oldest unread message, False when there is none"""
+        record = self.unread_messages.oldest()
+        if record is None:
+            self.oled.clear()
+            self.oled.display_text("No messages", 0)
+            return False
+        self.oled.display_msg(record.user_from, record.message, flush=False)
+        return True
+
+    def remove_oldest_message(self):
+        return self.unread_messages.pop_oldest()
+
+
+class RenderScheduler:
+    """coalesce redraw requests and flush the OLED at most fps times a second"""
+
+    def __init__(self, oled: OLED, fps=20):
         self.oled: OLED = oled
+        self.frame_ms = 1000 // fps
+        self.pending = False
+        self.last_flush = time.ticks_ms()
+        self.frames = 0
+        self.skipped = 0
+        # set by invalidate(), the render task sleeps on it while nothing is due
+        self.wake = asyncio.Event()
+
+    def invalidate(self):
+        self.pending = True
+        self.wake.set()
+
+    def busy(self):
+        """a redraw is pending or a text is scrolling"""
+        return self.pending or self.oled.marquee.active
+
+    def poll(self):
+        """flush a pending redraw once the frame interval has passed, a scrolling
+        text moves on every frame
+        """
+        if not self.busy():
+            self.skipped += 1
+            return False
+        marquee = self.oled.marquee
+        if time.ticks_diff(time.ticks_ms(), self.last_flush) < self.frame_ms:
+            return False
+        if self.pending:
+            self.flush()
+        else:
+            self.last_flush = time.ticks_ms()
+            marquee.step()
+        return True
+
+    def flush(self):
+        self.pending = False
+        self.last_flush = time.ticks_ms()
+        self.oled.show()
+        self.frames += 1
+
+    async def idle(self):
+        """sleep until the next frame slot, a whole frame when none is due"""
+        wait = self.frame_ms
+        if self.busy():
+            wait -= time.ticks_diff(time.ticks_ms(), self.last_flush)
+        await asyncio.sleep(min(max(wait, 1), self.frame_ms) / 1000)
+
+    async def run(self):
+        """render task, flushes pending redraws for the lifetime of the device"""
+        while True:
+            self.poll()
+            self.wake.clear()
+            if self.busy():
+                await self.idle()
+            else:
+                # nothing to draw until the next invalidate()
+                await self.wake.wait()
+
+
+class ButtonEvents:
+    """debounced button presses pushed from pin IRQs into a fixed size ring buffer
+
+    The IRQ handlers are the only writers of head and the consumer is the only
+    writer of tail, so no locking is needed between them.
+
+    A press is not told from the level read on its first edge, the contact
+    bounces for the first ms. Every edge records the level instead, and the
+    one recorded last before debounce_ms of quiet is the settled level. The
+    first edge after the quiet starts a press when that level was up, and
+    the press is queued with the edge's time. pop() also takes the state of
+    quiet buttons from their level.
+    """
+
+    def __init__(self, pins, size=16, debounce_ms=30):
+        self.pins = pins
+        self.size = size
+        self.debounce_ms = debounce_ms
+        self.buttons = bytearray(size)
+        self.times = array.array("i", [0] * size)
+        self.last_edge = array.array("i", [0] * len(pins))
+        # 1 while a button is down, and the level read on its latest edge
+        self.down = bytearray(len(pins))
+        self.level = bytearray(len(pins))
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.event_time = 0
+        for button, pin in enumerate(pins):
+            self.level[button] = pin.value()
+            self.down[button] = 1 - self.level[button]
+            pin.irq(
+                trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING,
+                handler=lambda pin, button=button: self.edge(button, pin),
+            )
+
+    def edge(self, button, pin):
+        """IRQ handler, the first edge after a quiet line starts a press or release"""
+        now = time.ticks_ms()
+        quiet = time.ticks_diff(now, self.last_edge[button]) >= self.debounce_ms
+        self.last_edge[button] = now
+        settled = self.level[button]
+        self.level[button] = pin.value()
+        if not quiet:
+            return
+        # up before this burst means it is a press, whatever was seen since
+        down = settled
+        self.down[button] = down
+        if not down:
+            return
+        head = self.head
+        next_head = (head + 1) % self.size
+        if next_head == self.tail:
+            self.dropped += 1
+            return
+        self.buttons[head] = button
+        self.times[head] = now
+        self.head = next_head
+
+    def settle(self):
+        """take the state of every quiet button from its level"""
+        now = time.ticks_ms()
+        for button, pin in enumerate(self.pins):
+            last = self.last_edge[button]
+            if time.ticks_diff(now, last) < self.debounce_ms:
+                continue
+            level = pin.value()
+            # an edge in between started a new burst, the IRQ has it
+            if self.last_edge[button] == last:
+                self.down[button] = 0 if level else 1
+
+    def pop(self):
+        """oldest pending press or NO_BUTTON, event_time holds its timestamp"""
+        self.settle()
+        tail = self.tail
+        if tail == self.head:
+            return NO_BUTTON
+        self.event_time = self.times[tail]
+        self.tail = (tail + 1) % self.size
+        return self.buttons[tail]
+
+    def clear(self):
+        self.tail = self.head
+
+    def is_down(self, button):
+        return not self.pins[button].value()
+
+    async def held(self, button, hold_ms):
+        """wait for the last popped press to end, True if it lasted hold_ms"""
+        while self.is_down(button):
+            if time.ticks_diff(time.ticks_ms(), self.event_time) >= hold_ms:
+                return True
+            await asyncio.sleep(0.01)
+        return False
+
+
+class CharacterSelector:
+    def __init__(self, scheduler: RenderScheduler, characters, buttons: ButtonEvents):
+        self.scheduler: RenderScheduler = scheduler
+        self.oled: OLED = scheduler.oled
         self.characters = characters
         self.y_n = "YN"
         self.selected_index = 0
         self.full_string = ""
-        self.left_button = Pin(20, Pin.IN, Pin.PULL_UP)
-        self.right_button = Pin(22, Pin.IN, Pin.PULL_UP)
-        self.select_button = Pin(21, Pin.IN, Pin.PULL_UP)
+        self.buttons: ButtonEvents = buttons
+        # only one prompt may own the screen and buttons at a time
+        self.lock = asyncio.Lock()
+
+    async def custom_choice(self, question: str, options):
+        async with self.lock:
+            return await self._custom_choice(question, options)
 
-    def custom_choice(self, question: str, options):
+    async def _custom_choice(self, question: str, options):
         selected_index = 0
         show_question = True
+        # a long question scrolls by itself until the encoder pages through it,
+        # first_line is then the question line at the top of the screen
+        first_line = None
+        question_lines = 0
         character_count = len(options)
+        redraw = True
 
         last_encoder_value = get_encoder_value()
 
         while True:
-            self.oled.clear()
-            if show_question:
-                self.oled.display_long_text(question)
-            if not show_question:
-                selected_character = options[selected_index]
-                self.oled.display_text("Selection:", 0)
-                self.oled.display_text(selected_character, 10)
-
-            self.oled.show()
+            if redraw:
+                self.oled.clear()
+                if show_question and first_line is None:
+                    question_lines = self.oled.display_marquee(question, flush=False)
+                elif show_question:
+                    question_lines = self.oled.display_long_text(
+                        question, flush=False, first_line=first_line
+                    )
+                if not show_question:
+                    selected_character = options[selected_index]
+                    self.oled.display_text("Selection:", 0)
+                    self.oled.display_text(selected_character, 10)
+                self.scheduler.invalidate()
+                instrument.count("selector.redraw")
+                redraw = False
 
             current_encoder_value = get_encoder_value()
             if current_encoder_value != last_encoder_value:
-                if current_encoder_value > last_encoder_value:
+                step = encoder_diff(current_encoder_value, last_encoder_value)
+                if show_question:
+                    last_line = max(question_lines - self.oled.rows, 0)
+                    first_line = min(max((first_line or 0) + step, 0), last_line)
+                elif step > 0:
                     selected_index = (selected_index + 1) % character_count
                 else:
                     selected_index = (selected_index - 1) % character_count
                 last_encoder_value = current_encoder_value
+                redraw = True
 
-            if not self.left_button.value():
+            button = self.buttons.pop()
+            if button != NO_BUTTON:
+                redraw = True
+                # the first press of any button dismisses the question
                 if show_question:
-                    time.sleep(0.2)
                     show_question = False
-                else:
+                elif button == BUTTON_LEFT:
                     selected_index = (selected_index - 1) % character_count
-                    time.sleep(0.2)  # Debounce delay
-
-            if not self.right_button.value():
-                if show_question:
-                    time.sleep(0.2)
-                    show_question = False
-                else:
+                elif button == BUTTON_RIGHT:
                     selected_index = (selected_index + 1) % character_count
-                    time.sleep(0.2)  # Debounce delay
-
-            if not self.select_button.value():
-                if show_question:
-                    time.sleep(0.2)
-                    show_question = False
-                else:
-                    time.sleep(0.2)
+                elif button == BUTTON_SELECT:
                     self.oled.clear()
-                    self.oled.show()
+                    self.scheduler.flush()
                     return options[selected_index]
 
-    def yes(self, title: str):
+            if not redraw:
+                await self.scheduler.idle()
+
+    async def yes(self, title: str, timeout_ms=None):
+        async with self.lock:
+            return await self._yes(title, timeout_ms)
+
+    async def _yes(self, title: str, timeout_ms=None):
+        """ask a yes/no question, answering no after timeout_ms without input"""
         self.selected_index = 1
         character_count = len(self.y_n)
+        redraw = True
+        started = time.ticks_ms()
+        seconds_left = None
 
         last_encoder_value = get_encoder_value()
 
         while True:
-            self.oled.clear()
-            self.oled.display_text(title, 0)
-
-            selected_character = self.y_n[self.selected_index]
-            self.oled.display_text(f"Selected: {selected_character}", 10)
-
-            self.oled.show()
-
+            # input first, a press made while the loop was held up still counts
             current_encoder_value = get_encoder_value()
             if current_encoder_value != last_encoder_value:
-                if current_encoder_value > last_encoder_value:
+                # any input means someone is there to answer
+                timeout_ms = None
+                if encoder_diff(current_encoder_value, last_encoder_value) > 0:
                     self.selected_index = (self.selected_index + 1) % character_count
                 else:
                     self.selected_index = (self.selected_index - 1) % character_count
                 last_encoder_value = current_encoder_value
+                redraw = True
 
-            if not self.left_button.value():
+            button = self.buttons.pop()
+            if button != NO_BUTTON:
+                timeout_ms = None
+            if button == BUTTON_LEFT:
                 self.selected_index = (self.selected_index - 1) % character_count
-                time.sleep(0.2)  # Debounce delay
-
-            if not self.right_button.value():
+                redraw = True
+            elif button == BUTTON_RIGHT:
                 self.selected_index = (self.selected_index + 1) % character_count
-                time.sleep(0.2)  # Debounce delay
-
-            if not self.select_button.value():
-                selection = False
-                if selected_character == "Y":
-                    selection = True
-                while True:
-                    if not self.select_button.value():
-                        time.sleep(0.2)
-                        self.oled.clear()
-                        self.oled.show()
-                        return selection
-
-    def cycle_characters(self, title: str):
+                redraw = True
+            elif button == BUTTON_SELECT:
+                self.oled.clear()
+                self.scheduler.flush()
+                return self.y_n[self.selected_index] == "Y"
+
+            if timeout_ms is not None:
+                left_ms = timeout_ms - time.ticks_diff(time.ticks_ms(), started)
+                if left_ms <= 0:
+                    # a late press must not reach the menu behind the prompt
+                    self.buttons.clear()
+                    self.oled.clear()
+                    self.scheduler.flush()
+                    return False
+                if (left_ms + 999) // 1000 != seconds_left:
+                    seconds_left = (left_ms + 999) // 1000
+                    redraw = True
+            if redraw:
+                self.oled.clear()
+                self.oled.display_text(title, 0)
+                selected_character = self.y_n[self.selected_index]
+                self.oled.display_text(f"Selected: {selected_character}", 10)
+                if timeout_ms is not None:
+                    self.oled.display_text("N in {0}s".format(seconds_left), 20)
+                self.scheduler.invalidate()
+                instrument.count("selector.redraw")
+                redraw = False
+
+            await self.scheduler.idle()
+
+    async def cycle_characters(self, title: str):
+        async with self.lock:
+            return await self._cycle_characters(title)
+
+    async def _cycle_characters(self, title: str):
         self.full_string = ""
         self.selected_index = 0
         character_count = len(self.characters)
+        redraw = True
 
-        while True:
-            self.oled.clear()
-            self.oled.display_text(title, 0)
+        last_encoder_value = get_encoder_accel_value()
 
+        while True:
             selected_character = self.characters[self.selected_index]
-            self.oled.display_text(f"Selected: {selected_character}", 10)
-            self.oled.display_text(self.full_string, 20)
-
-            self.oled.show()
+            if redraw:
+                self.oled.clear()
+                self.oled.display_text(title, 0)
+                self.oled.display_text(f"Selected: {selected_character}", 10)
+                self.oled.display_text(self.full_string, 20)
+                self.scheduler.invalidate()
+                instrument.count("selector.redraw")
+                redraw = False
+
+            # fast spins skip several characters per detent
+            current_encoder_value = get_encoder_accel_value()
+            if current_encoder_value != last_encoder_value:
+                delta = encoder_diff(current_encoder_value, last_encoder_value)
+                self.selected_index = (self.selected_index + delta) % character_count
+                last_encoder_value = current_encoder_value
+                redraw = True
 
-            if not self.left_button.value():
+            button = self.buttons.pop()
+            if button == BUTTON_LEFT:
                 self.selected_index = (self.selected_index - 1) % character_count
-                time.sleep(0.2)  # Debounce delay
-
-            if not self.right_button.value():
+                redraw = True
+            elif button == BUTTON_RIGHT:
                 self.selected_index = (self.selected_index + 1) % character_count
-                time.sleep(0.2)  # Debounce delay
-
-            if not self.select_button.value():
-                start_time = time.ticks_ms()
-                while self.select_button.value():
-                    if time.ticks_diff(time.ticks_ms(), start_time) >= 1000:
-                        while True:
-                            if not self.select_button.value():
-                                self.oled.clear()
-                                self.oled.display_text("Saved!", 0)
-                                self.oled.display_text("Let go.", 10)
-                                self.oled.show()
-                                time.sleep(1)
-                                return self.full_string
-
+                redraw = True
+            elif button == BUTTON_SELECT:
+                # a short press adds the character, holding for a second saves
+                if await self.buttons.held(BUTTON_SELECT, 1000):
+                    self.oled.clear()
+                    self.oled.display_text("Saved!", 0)
+                    self.oled.display_text("Let go.", 10)
+                    self.scheduler.flush()
+                    await asyncio.sleep(1)
+                    self.buttons.clear()
+                    return self.full_string
                 self.full_string += selected_character
+                redraw = True
+
+            if not redraw:
+                await self.scheduler.idle()
+
+
+# heartbeat timer rate, the ping and config intervals below count its ticks
+HEARTBEAT_HZ = 4
+# seconds between PINGREQs while a game is on and while idle, divided by hzMulti
+PING_ACTIVE_S = 5
+PING_IDLE_S = 60
+# a ping without PINGRESP after this long is missed, this many in a row is a dead link
+PING_TIMEOUT_MS = 3000
+PING_MISSED_LIMIT = 2
+# seconds between config heartbeats, divided by hzMulti
+CONFIG_S = 10
+# the broker drops a session silent for 1.5 keepalives, leave room for idle pings
+MQTT_KEEPALIVE_S = 2 * PING_IDLE_S
+RTT_SAMPLES = 64
 
 
 class Heartbeat(object):
-    def __init__(self, client, mothership: Mothership, freq=1):
+    """timer paced MQTT pings and config heartbeats
+
+    The timer IRQ only counts ticks. poll() runs in the heartbeat task, sends
+    a PINGREQ every PING_ACTIVE_S while a game is on and every PING_IDLE_S
+    otherwise, and times the PINGRESP. The last RTT_SAMPLES round trips feed
+    the min/avg/p99 RTT in the config heartbeat.
+    """
+
+    def __init__(self, client, mothership: Mothership, connection=None, game=None):
         self.tick = 0
-        self.client = client
-        self.tim = Timer()
-        self.freq = freq
-        self.tim.init(freq=self.freq, mode=Timer.PERIODIC, callback=self.heartbeat_cb)
         self.mothership = mothership
+        self.connection = connection
+        self.game = game
+        # hzMulti from the time topic, speeds up pings and config heartbeats
+        self.multiplier = 1
+        self.last_ping_tick = 0
+        self.last_config_tick = 0
+        self.ping_sent_at = None
+        self.pings = 0
+        self.missed = 0
+        self.missed_in_row = 0
+        self.rtts = array.array("H", [0] * RTT_SAMPLES)
+        self.rtt_count = 0
+        self.set_client(client)
+        self.tim = Timer()
+        self.tim.init(
+            freq=HEARTBEAT_HZ, mode=Timer.PERIODIC, callback=self.heartbeat_cb
+        )
+
+    def set_client(self, client):
+        """start pinging a new session, an outstanding ping is abandoned"""
+        self.client = client
+        client.on_pingresp = self.pong
+        self.ping_sent_at = None
+        self.missed_in_row = 0
+        self.last_ping_tick = self.tick
 
     def publish_config(self):
         publish_message(
-            self.client,
             topic="config",
-            payload=json.dumps({"test": "testpayload"}),
+            payload=self.config_payload(),
+            priority=PRIORITY_LOW,
+            key="",
         )
 
+    def config_payload(self):
+        payload = {
+            "test": "testpayload",
+            "outbox": outbox.stats(),
+            "ping": self.ping_stats(),
+            "inbox": self.mothership.unread_messages.stats(),
+            "boot": boot_times,
+        }
+        if self.connection is not None:
+            payload["link"] = self.connection.stats()
+        return payload
+
     def publish_user_request(self):
         publish_message(
-            self.client,
             topic="api/users/r/getAllUsers",
-            payload={},
+            payload=user_directory.request(),
+            priority=PRIORITY_LOW,
+            key="",
         )
 
-    def reset_heartbeat(self, frequency=1):
-        self.freq = frequency
-        print("reset hb with freq of {0}".format(frequency))
-        self.tim.deinit()
-        self.tim = Timer()
-        self.tim.init(freq=frequency, mode=Timer.PERIODIC, callback=self.heartbeat_cb)
+    def set_multiplier(self, multiplier=1):
+        self.multiplier = multiplier
+        print("heartbeat rate x{0}".format(multiplier))
+
+    def ping_interval(self):
+        """ticks between pings under the current policy"""
+        active = self.game is not None and self.game.active()
+        seconds = PING_ACTIVE_S if active else PING_IDLE_S
+        return max(seconds * HEARTBEAT_HZ // self.multiplier, 1)
+
+    def poll(self):
+        """send the pings and heartbeats that are due, False once the link is dead"""
+        now = time.ticks_ms()
+        sent_at = self.ping_sent_at
+        if sent_at is not None and time.ticks_diff(now, sent_at) >= PING_TIMEOUT_MS:
+            self.ping_sent_at = None
+            self.missed += 1
+            self.missed_in_row += 1
+        tick = self.tick
+        due = tick - self.last_ping_tick >= self.ping_interval()
+        if due and self.ping_sent_at is None:
+            self.last_ping_tick = tick
+            self.ping_sent_at = now
+            self.pings += 1
+            self.client.ping()
+        if tick - self.last_config_tick >= CONFIG_S * HEARTBEAT_HZ // self.multiplier:
+            self.last_config_tick = tick
+            self.publish_config()
+        return self.missed_in_row < PING_MISSED_LIMIT
+
+    def pong(self):
+        sent_at = self.ping_sent_at
+        if sent_at is None:
+            # answer to a ping already counted as missed
+            return
+        rtt = time.ticks_diff(time.ticks_ms(), sent_at)
+        self.ping_sent_at = None
+        self.missed_in_row = 0
+        self.rtts[self.rtt_count % RTT_SAMPLES] = min(rtt, 0xFFFF)
+        self.rtt_count += 1
+
+    def ping_stats(self):
+        count = min(self.rtt_count, RTT_SAMPLES)
+        stats = {"pings": self.pings, "missed": self.missed}
+        if count:
+            samples = sorted(self.rtts[:count])
+            stats["minMs"] = samples[0]
+            stats["avgMs"] = sum(samples) // count
+            stats["p99Ms"] = samples[(count * 99 + 99) // 100 - 1]
+        return stats
 
     def heartbeat_cb(self, tim):
-        self.tick = (self.tick + 1) % 10
-        # print("Heartbeat tick {0}".format(self.tick))
+        self.tick += 1
+
+
+# the parts of an api/game/mtg/p/update payload MTGGame uses, the rest is skipped
+MTG_UPDATE_FIELDS = jsonscan.Fields(
+    "version", "gameOver", "lobby", "players", "currentPlayer", "winner"
+)
+MTG_PLAYER_FIELDS = jsonscan.Fields("uid", "playerName", "playerHealth")
+
+
+# updates up to this size are decoded whole by json.loads, several times faster
+# than the scan; larger ones are scanned so their object tree never builds up
+GAME_UPDATE_SCAN_BYTES = 4096
+
+
+@instrument.timed("decode_game_update")
+def decode_game_update(msg: bytes):
+    """decode only the game state fields, scanning payloads too big to load whole"""
+    if len(msg) > GAME_UPDATE_SCAN_BYTES:
+        return scan_game_update(msg)
+    loaded = json.loads(msg)
+    update = {}
+    for name in MTG_UPDATE_FIELDS.names:
+        if name in loaded:
+            update[name] = loaded[name]
+    if update.get("players"):
+        fields = MTG_PLAYER_FIELDS.names
+        update["players"] = [
+            {name: player[name] for name in fields if name in player}
+            for player in update["players"]
+        ]
+    return update
+
+
+def scan_game_update(msg: bytes):
+    """decode_game_update streaming the players array, for large payloads"""
+    update = {}
+    spans = MTG_UPDATE_FIELDS.spans(msg)
+    for name, span in zip(MTG_UPDATE_FIELDS.names, spans):
+        if span is None:
+            continue
+        if name == "players":
+            update[name] = [
+                MTG_PLAYER_FIELDS.pick(msg, start)
+                for start, _ in jsonscan.items(msg, span[0], span[1])
+            ]
+        else:
+            update[name] = json.loads(msg[span[0] : span[1]])
+    return update
+
+
+# wait this long for a requested snapshot before asking again
+SNAPSHOT_RETRY_MS = 2000
+# publish accumulated health and commander damage changes after this much quiet
+ADJUST_IDLE_MS = 800
+# stop showing published health changes no update has carried after this long
+HEALTH_ACK_MS = 5000
 
 
 class MTGGame:
+    """local copy of the MTG game state
+
+    api/game/mtg/p/update carries a full snapshot, api/game/mtg/p/delta a patch:
+    {"version": n, "players": [{"uid": .., changed fields}], "removed": [uid],
+    plus any of gameOver, lobby, currentPlayer and winner that changed}. A
+    patch only applies on top of version n - 1, otherwise a snapshot is
+    requested on api/game/mtg/r/snapshot.
+
+    Health and commander damage changes from the encoder are summed locally
+    and shown straight away, then published as one net change after
+    ADJUST_IDLE_MS without input or when select is pressed. A published
+    change stays on screen until a game update reports the own health it
+    leads to, or for HEALTH_ACK_MS if none does.
+    """
+
     def __init__(self, mqtt_handler):
         global selectedUser
         self.uid = selectedUser
@@ -389,82 +1288,267 @@ class MTGGame:
         self.lobby = []
         self.players = []
         self.winner = None
+        self.version = None
+        self.snapshot_requested_at = None
+        self.pending_health = 0
+        self.pending_cmdr_dmg = {}
+        self.adjusted_at = None
+        # published health changes no game update has carried yet, oldest
+        # first, and own health as the updates last reported it
+        self.unacked = []
+        self.unacked_at = None
+        self.acked_health = None
+        # play() holds the selector lock, so the game owns the screen
+        self.playing = False
 
     def join_game(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/join",
             payload=self.uid,
+            priority=PRIORITY_HIGH,
         )
 
     def me_next(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/meNext",
             payload=self.uid,
+            priority=PRIORITY_HIGH,
         )
 
     def start_game(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/start",
             payload="",
+            priority=PRIORITY_HIGH,
         )
 
     def next_turn(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/nextTurn",
             payload="",
+            priority=PRIORITY_HIGH,
         )
 
     def pause_play(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/pausePlayCurrentPlayer",
             payload="",
+            priority=PRIORITY_HIGH,
         )
 
     def clear_game(self):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/clearGame",
             payload="",
+            priority=PRIORITY_HIGH,
         )
 
     def modify_cmdr_dmg(self, dmgFrom: str, dmg: int):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/modifyCommanderDmg",
-            payload={"playerHit": self.uid, "dmgFrom": dmgFrom, "dmg": dmg},
+            payload=[self.uid, dmgFrom, dmg],
+            priority=PRIORITY_HIGH,
+            key=dmgFrom,
+            merge="dmg",
         )
 
     def modify_player_health(self, amount: int):
         publish_message(
-            client=self.mqtt_handler.heart_beat.client,
             topic="api/game/mtg/r/modifyPlayerHealth",
-            payload={"uid": self.uid, "amount": amount},
+            payload=[self.uid, amount],
+            priority=PRIORITY_HIGH,
+            key=self.uid,
+            merge="amount",
+        )
+
+    def active(self):
+        """a game is on, the heartbeat pings more often"""
+        return bool(self.players) and not self.game_over
+
+    def adjust_health(self, amount: int):
+        """add to the pending health change, published by flush_adjustments"""
+        self.pending_health += amount
+        self.adjusted_at = time.ticks_ms()
+        self.update_display(self.own_row())
+
+    def adjust_cmdr_dmg(self, dmgFrom: str, dmg: int):
+        self.pending_cmdr_dmg[dmgFrom] = self.pending_cmdr_dmg.get(dmgFrom, 0) + dmg
+        self.adjusted_at = time.ticks_ms()
+
+    def flush_adjustments(self):
+        """publish the net pending changes, nothing for changes that cancelled out"""
+        if self.pending_health:
+            self.modify_player_health(self.pending_health)
+            self.unacked.append(self.pending_health)
+            self.unacked_at = time.ticks_ms()
+            self.pending_health = 0
+        for dmgFrom, dmg in self.pending_cmdr_dmg.items():
+            if dmg:
+                self.modify_cmdr_dmg(dmgFrom, dmg)
+        self.pending_cmdr_dmg = {}
+        self.adjusted_at = None
+
+    def poll_adjustments(self):
+        """flush once the input has been idle for ADJUST_IDLE_MS"""
+        if (
+            self.adjusted_at is not None
+            and time.ticks_diff(time.ticks_ms(), self.adjusted_at) >= ADJUST_IDLE_MS
+        ):
+            self.flush_adjustments()
+
+    async def play(self):
+        """adjust own health until select is held, the encoder accelerates"""
+        selector = self.mqtt_handler.selector
+        buttons = selector.buttons
+        async with selector.lock:
+            self.playing = True
+            try:
+                await self.play_loop(buttons)
+            finally:
+                self.playing = False
+
+    async def play_loop(self, buttons):
+        self.update_display()
+        last_encoder_value = get_encoder_accel_value()
+        while True:
+            current_encoder_value = get_encoder_accel_value()
+            if current_encoder_value != last_encoder_value:
+                self.adjust_health(
+                    encoder_diff(current_encoder_value, last_encoder_value)
+                )
+                last_encoder_value = current_encoder_value
+
+            button = buttons.pop()
+            if button == BUTTON_LEFT:
+                self.adjust_health(-1)
+            elif button == BUTTON_RIGHT:
+                self.adjust_health(1)
+            elif button == BUTTON_SELECT:
+                # a press sends right away, holding for a second leaves
+                self.flush_adjustments()
+                if await buttons.held(BUTTON_SELECT, 1000):
+                    buttons.clear()
+                    return
+
+            self.poll_adjustments()
+            await self.mqtt_handler.scheduler.idle()
+
+    def own_row(self):
+        for index, player in enumerate(self.players):
+            if player["uid"] == self.uid:
+                return (index,)
+        return ()
+
+    def request_snapshot(self):
+        now = time.ticks_ms()
+        if (
+            self.snapshot_requested_at is not None
+            and time.ticks_diff(now, self.snapshot_requested_at) < SNAPSHOT_RETRY_MS
+        ):
+            return
+        self.snapshot_requested_at = now
+        publish_message(
+            topic="api/game/mtg/r/snapshot",
+            payload=[self.uid, self.version],
+            priority=PRIORITY_HIGH,
+            key=self.uid,
         )
 
+    def ack_health(self, health):
+        """drop the published health changes a game update now carries"""
+        if self.unacked:
+            carried = 0
+            if self.acked_health is not None:
+                expected = self.acked_health
+                # the outbox may have merged several changes into one request
+                for k, amount in enumerate(self.unacked):
+                    expected += amount
+                    if expected == health:
+                        carried = k + 1
+                        break
+            if carried:
+                self.unacked = self.unacked[carried:]
+            elif time.ticks_diff(time.ticks_ms(), self.unacked_at) >= HEALTH_ACK_MS:
+                # changed some other way or the request was lost, trust the backend
+                self.unacked = []
+        self.acked_health = health
+
     def update_game_state(self, update):
+        self.version = update.get("version", None)
+        self.snapshot_requested_at = None
         self.game_over = update.get("gameOver", False)
         self.lobby = update.get("lobby", [])
         self.players = update.get("players", [])
         self.current_player = update.get("currentPlayer", None)
         self.winner = update.get("winner", None)
+        for player in self.players:
+            if player["uid"] == self.uid:
+                self.ack_health(player["playerHealth"])
+                break
 
         # Update the OLED screen with the current game state
         self.update_display()
 
-    def update_display(self):
-        # Example: Display the current players on the OLED screen
-        player_info = "\n".join(
-            [
-                f"{player['playerName']}: {player['playerHealth']}"
-                for player in self.players
-            ]
-        )
-        self.mqtt_handler.oled.display_long_text(player_info)
+    @instrument.timed("mtg.apply_delta")
+    def apply_delta(self, delta):
+        version = delta["version"]
+        if self.version is not None and version <= self.version:
+            # duplicate or already covered by a snapshot
+            return
+        if self.version is None or version != self.version + 1:
+            print("Missed game update {0} -> {1}".format(self.version, version))
+            self.request_snapshot()
+            return
+        self.version = version
+
+        changed = []
+        for patch in delta.get("players", ()):
+            if patch["uid"] == self.uid and "playerHealth" in patch:
+                self.ack_health(patch["playerHealth"])
+            for index, player in enumerate(self.players):
+                if player["uid"] == patch["uid"]:
+                    player.update(patch)
+                    break
+            else:
+                index = len(self.players)
+                self.players.append(patch)
+            changed.append(index)
+        if delta.get("removed"):
+            removed = delta["removed"]
+            self.players = [p for p in self.players if p["uid"] not in removed]
+            changed = None
+
+        if "gameOver" in delta:
+            self.game_over = delta["gameOver"]
+        if "lobby" in delta:
+            self.lobby = delta["lobby"]
+        if "currentPlayer" in delta:
+            self.current_player = delta["currentPlayer"]
+        if "winner" in delta:
+            self.winner = delta["winner"]
+
+        self.update_display(changed)
+
+    @instrument.timed("mtg.update_display")
+    def update_display(self, changed=None):
+        """one player per row, only the changed rows are redrawn for a patch"""
+        if self.mqtt_handler.selector.lock.locked() and not self.playing:
+            # another prompt owns the screen, the state is drawn by play()
+            return
+        oled = self.mqtt_handler.oled
+        if changed is None:
+            oled.clear()
+            changed = range(len(self.players))
+        for index in changed:
+            if index >= oled.rows:
+                continue
+            player = self.players[index]
+            health = player["playerHealth"]
+            if player["uid"] == self.uid:
+                health += sum(self.unacked) + self.pending_health
+            oled.paint_black_custom(0, index * 10, oled.width, 8)
+            oled.display_text(f"{player['playerName']}: {health}", index * 10)
+        self.mqtt_handler.scheduler.invalidate()
 
     def handle_command(self, command):
         if (
@@ -481,94 +1565,240 @@ class MTGGame:
             self.me_next()
         elif command == "pausePlayCurrentPlayer":
             self.pause_play()
-        if self.current_player.get("uid") == self.uid:
+        if self.current_player and self.current_player.get("uid") == self.uid:
             if command == "passTurn":
                 self.next_turn()
 
 
+class TopicRouter:
+    """map MQTT topics to handlers, exact topics by dict and wildcards by trie
+
+    Trie nodes are [children, handlers] with children keyed by topic level,
+    where the + and # levels hold wildcard patterns. Matching walks one node
+    per topic level, however many handlers are registered. Handlers are stored
+    as (handler, raw) where raw handlers get the undecoded payload bytes.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.trie = [{}, []]
+        self.patterns = []
+
+    def add(self, pattern, handler, raw=False):
+        handler = (handler, raw)
+        if isinstance(pattern, str):
+            pattern = pattern.encode()
+        if b"+" in pattern or b"#" in pattern:
+            node = self.trie
+            for level in pattern.split(b"/"):
+                child = node[0].get(level)
+                if child is None:
+                    child = node[0][level] = [{}, []]
+                node = child
+            node[1].append(handler)
+        else:
+            self.exact.setdefault(pattern, []).append(handler)
+        if pattern not in self.patterns:
+            self.patterns.append(pattern)
+
+    def route(self, pattern, raw=False):
+        """decorator registering the function for a topic or topic filter"""
+
+        def register(handler):
+            self.add(pattern, handler, raw)
+            return handler
+
+        return register
+
+    def match(self, topic: bytes):
+        handlers = self.exact.get(topic, ())
+        if not self.trie[0]:
+            return handlers
+        matched = list(handlers)
+        self.walk(self.trie, topic.split(b"/"), 0, matched)
+        return matched
+
+    def walk(self, node, levels, depth, matched):
+        children = node[0]
+        # '#' also matches the parent level, so check it before running out
+        multi = children.get(b"#")
+        if multi is not None:
+            matched.extend(multi[1])
+        if depth == len(levels):
+            matched.extend(node[1])
+            return
+        child = children.get(levels[depth])
+        if child is not None:
+            self.walk(child, levels, depth + 1, matched)
+        single = children.get(b"+")
+        if single is not None:
+            self.walk(single, levels, depth + 1, matched)
+
+    def topics(self):
+        """subscription list covering every registered handler"""
+        return list(self.patterns)
+
+
 class MqttHandler(object):
     """handle the heart beat check message callback, execute led commands and contain the led configuration"""
 
+    # topic handlers register themselves below with @router.route(topic)
+    router = TopicRouter()
+
     def __init__(
         self,
-        oled: OLED,
+        scheduler: RenderScheduler,
         mothership: Mothership,
         selector: CharacterSelector,
         heart_beat: Heartbeat = None,
     ):
         self.heart_beat = heart_beat
         self.mothership = mothership
-        self.oled = oled
+        self.scheduler = scheduler
+        self.oled = scheduler.oled
         self.selector = selector
         self.mtg_game = None
+        # (question, inbox handle) waiting for a prompt, oldest first
+        self.questions = []
+        self.answering = False
 
     def set_mtg_game(self, mtg_game: MTGGame):
         self.mtg_game = mtg_game
 
+    async def answer_question(self, question: dict, handle=None):
+        """prompt the user for a reply to a question and publish the response
+
+        handle is the question's unread message, dropped once it is answered
+        """
+        try:
+            question_response = await self.selector.custom_choice(
+                question=question["question"], options=question["options"]
+            )
+            publish_message(
+                topic="response",
+                payload={
+                    "client_id": question["user_from"],
+                    "user_from": username,
+                    "question": question["question"],
+                    "response": question_response,
+                },
+                priority=PRIORITY_HIGH,
+            )
+            if handle is not None:
+                self.mothership.unread_messages.remove(handle)
+            self.oled.clear()
+            self.oled.display_text("Response Sent!", 0)
+            self.scheduler.invalidate()
+        except KeyError as e:
+            print("Key value was not found in question {0}".format(e))
+
+    async def answer_questions(self):
+        """prompt for the waiting questions one at a time, in arrival order"""
+        try:
+            while self.questions:
+                question, handle = self.questions.pop(0)
+                if self.mothership.unread_messages.get(handle) is None:
+                    # pushed out of the inbox by newer messages or already read
+                    continue
+                await self.answer_question(question, handle)
+        finally:
+            self.answering = False
+
+    @router.route("time")
+    def on_time(self, topic, loadedJson):
+        if loadedJson["hzMulti"] > 0 and loadedJson["hzMulti"] <= 4:
+            if self.heart_beat is not None:
+                self.heart_beat.set_multiplier(loadedJson["hzMulti"])
+
+    @router.route("getConfig")
+    def on_get_config(self, topic, loadedJson):
+        # publish the config on the config topic
+        if to_me(loadedJson["client_id"]):
+            self.heart_beat.publish_config()
+
+    @router.route("getDiagnostics")
+    def on_get_diagnostics(self, topic, loadedJson):
+        # instrumentation snapshot on the diagnostics topic
+        if to_me(loadedJson["client_id"]):
+            snapshot = instrument.snapshot()
+            snapshot["client_id"] = client_id
+            publish_message(
+                topic="diagnostics",
+                payload=snapshot,
+                priority=PRIORITY_LOW,
+                key="",
+            )
+
+    @router.route("api/game/mtg/p/update", raw=True)
+    def on_game_update(self, topic, msg):
+        self.mtg_game.update_game_state(decode_game_update(msg))
+
+    @router.route("api/game/mtg/p/delta")
+    def on_game_delta(self, topic, loadedJson):
+        self.mtg_game.apply_delta(loadedJson)
+
+    @router.route("question")
+    def on_question(self, topic, loadedJson):
+        if to_me(loadedJson["client_id"]) and loadedJson["user_from"] != username:
+            handle = self.mothership.add_unread_message(
+                user_from=loadedJson["user_from"],
+                message=loadedJson["question"],
+            )
+            self.questions.append((loadedJson, handle))
+            if len(self.questions) > INBOX_SIZE:
+                # the inbox has dropped the oldest by now as well
+                self.questions.pop(0)
+            if not self.answering:
+                # prompt in a task of its own so messages keep flowing meanwhile
+                self.answering = True
+                asyncio.create_task(self.answer_questions())
+
+    @router.route("response")
+    def on_response(self, topic, loadedJson):
+        if to_me(loadedJson["client_id"]):
+            self.mothership.add_unread_message(
+                user_from=loadedJson["user_from"],
+                message=loadedJson["response"],
+            )
+            # a prompt owns the screen, the response waits in the inbox
+            if not self.selector.lock.locked():
+                msg = "Q:{0} R:{1}".format(
+                    loadedJson["question"], loadedJson["response"]
+                )
+                self.oled.display_marquee(msg, flush=False)
+                self.scheduler.invalidate()
+        else:
+            print("not to me")
+
+    @router.route("api/users/p/getAllUsers")
+    def on_users(self, topic, loadedJson):
+        if user_directory.apply(loadedJson):
+            user_directory.save()
+        print(
+            "{0} users, version {1}".format(len(user_directory), user_directory.version)
+        )
+
+    @router.route("test")
+    def on_test(self, topic, loadedJson):
+        print("test received")
+
+    @instrument.timed("check_msg")
     def check_msg(self, topic, msg):
         """Callback trigger from subscription response"""
-        global mothershipUsers
         try:
-            loadedTopic: str = topic.decode()
-            loadedJson: dict = json.loads(msg.decode())
-
-            # topic checks
-            if loadedTopic == "time":
-                if loadedJson["hzMulti"] > 0 and loadedJson["hzMulti"] <= 4:
-                    if self.heart_beat is not None:
-                        self.heart_beat.reset_heartbeat(frequency=loadedJson["hzMulti"])
-            elif loadedTopic == "getConfig":
-                # publish the config on the config topic
-                if to_me(loadedJson["client_id"]):
-                    self.heart_beat.publish_config()
-            elif loadedTopic == "api/game/mtg/p/update":
-                self.mtg_game.update_game_state(loadedJson)
-            elif loadedTopic == "question":
-                if (
-                    to_me(loadedJson["client_id"])
-                    and loadedJson["user_from"] != username
-                ):
-                    self.mothership.add_unread_message(
-                        user_from=loadedJson["user_from"],
-                        message=loadedJson["question"],
-                    )
-                    question_response = self.selector.custom_choice(
-                        question=loadedJson["question"], options=loadedJson["options"]
-                    )
-                    publish_message(
-                        client=self.heart_beat.client,
-                        topic="response",
-                        payload={
-                            "client_id": loadedJson["user_from"],
-                            "user_from": username,
-                            "question": loadedJson["question"],
-                            "response": question_response,
-                        },
-                    )
-                    self.mothership.unread_messages.pop()
-                    self.oled.clear()
-                    self.oled.display_text("Response Sent!", 0)
-                    self.oled.show()
-            elif loadedTopic == "response":
-                if to_me(loadedJson["client_id"]):
-                    self.mothership.add_unread_message(
-                        user_from=loadedJson["user_from"],
-                        message=loadedJson["response"],
-                    )
-                    msg = "Q:{0} R:{1}".format(
-                        loadedJson["question"], loadedJson["response"]
-                    )
-                    self.oled.display_long_text(text=msg)
-                    self.oled.show()
-                else:
-                    print("not to me")
-            elif loadedTopic == "api/users/p/getAllUsers":
-                mothershipUsers = loadedJson
-                print(mothershipUsers)
-            elif loadedTopic == "test":
-                print("test received")
-            else:
-                print("No defined action for topic '{0}'".format(loadedTopic))
+            handlers = self.router.match(topic)
+            if not handlers:
+                print("No defined action for topic '{0}'".format(topic.decode()))
+                return
+            loadedJson = None
+            for handler, raw in handlers:
+                if raw:
+                    handler(self, topic, msg)
+                    continue
+                if loadedJson is None:
+                    # json parses the bytes payload directly, no decode() copy
+                    loadedJson = json.loads(msg)
+                handler(self, topic, loadedJson)
         except KeyError as e:
             print("Key value was not found in response {0}".format(msg.decode()))
         except ValueError as e:
@@ -577,11 +1807,238 @@ class MqttHandler(object):
             print("Unexpected keyword argument {0} {1}".format(msg.decode(), e))
 
 
-def publish_message(client, topic, payload):
-    if topic in topic_pub_list:
-        if isinstance(payload, dict):
-            payload = json.dumps(payload)
-        client.publish(topic, payload)
+# subscribe to every topic a handler is registered for
+topic_sub: list = MqttHandler.router.topics()
+
+
+# outbound priority classes, drained in this order
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class PublishQueue:
+    """bounded outbound queue, drained by the publish task while MQTT is up
+
+    Messages wait here across disconnects and are sent highest priority first,
+    oldest first within a class. A message with a key replaces the queued one
+    with the same topic and key, or adds its merge field into it, so bursts of
+    relative changes go out as one net change. When full, the oldest message
+    of the lowest class at or below the new one's is dropped to make room.
+    """
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.queues = ([], [], [])
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def depth(self):
+        return len(self.queues[0]) + len(self.queues[1]) + len(self.queues[2])
+
+    def put(self, topic, payload, priority=PRIORITY_NORMAL, key=None, merge=None):
+        """queue a message, False if it was dropped"""
+        queue = self.queues[priority]
+        if key is not None:
+            for index, entry in enumerate(queue):
+                if entry[0] != topic or entry[2] != key:
+                    continue
+                self.coalesced += 1
+                if merge is None:
+                    entry[1] = payload
+                else:
+                    entry[1][merge] += payload[merge]
+                    # changes that cancel out need not be sent at all
+                    if not entry[1][merge]:
+                        queue.pop(index)
+                return True
+        if self.depth() >= self.capacity and not self.evict(priority):
+            self.dropped += 1
+            return False
+        queue.append([topic, payload, key])
+        self.max_depth = max(self.max_depth, self.depth())
+        return True
+
+    def evict(self, priority):
+        for lower in range(len(self.queues) - 1, priority - 1, -1):
+            if self.queues[lower]:
+                self.queues[lower].pop(0)
+                self.dropped += 1
+                return True
+        return False
+
+    @instrument.timed("outbox.flush")
+    def flush(self, client, budget=8):
+        """publish up to budget messages, an OSError leaves the failed one queued
+
+        Any other error is the message's own fault, it is dropped so the rest
+        still go out.
+        """
+        for queue in self.queues:
+            while queue and budget:
+                topic, payload, _ = queue[0]
+                try:
+                    client.publish(topic, publish_topics.payload(topic, payload))
+                except OSError:
+                    raise
+                except Exception as e:
+                    print("Dropped message for '{0}': {1}".format(topic.decode(), e))
+                    queue.pop(0)
+                    self.dropped += 1
+                    continue
+                queue.pop(0)
+                self.sent += 1
+                budget -= 1
+        return budget
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "maxDepth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+outbox = PublishQueue()
+
+
+class PublishRegistry:
+    """publishable topics interned as bytes, payloads rendered from byte templates
+
+    A template is a tuple alternating literal bytes and slot names. The
+    payload queued for a templated topic is a list of slot values in template
+    order, rendered into one reusable buffer when it is published, so hot
+    paths build neither a dict nor a JSON string per message. Slot values are
+    written as JSON, strings with their quotes, so templates hold none around
+    slots. Other topics
+    take a str, bytes or dict payload as before.
+    """
+
+    def __init__(self, topics, size=128):
+        self.topics = {}
+        self.templates = {}
+        self.slots = {}
+        # escaped bytes of recently rendered strings, mostly uids
+        self.encoded = {}
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        for topic in topics:
+            self.add(topic)
+
+    def add(self, topic, template=None):
+        interned = self.topics.get(topic)
+        if interned is None:
+            interned = self.topics[topic] = topic.encode()
+        if template is not None:
+            self.templates[interned] = template
+            self.slots[interned] = tuple(template[1::2])
+        return interned
+
+    def get(self, topic):
+        """interned topic, None if it is not on the publish list"""
+        return self.topics.get(topic)
+
+    def slot(self, topic, name):
+        """index of a named slot in the values of a templated topic"""
+        return self.slots[topic].index(name)
+
+    def payload(self, topic, values):
+        template = self.templates.get(topic)
+        if template is None:
+            return json.dumps(values) if isinstance(values, dict) else values
+        i = 0
+        for index in range(len(template)):
+            if index % 2:
+                i = self.write_value(i, values[index // 2])
+            else:
+                i = self.write(i, template[index])
+        return self.mv[:i]
+
+    def write(self, i, data):
+        end = i + len(data)
+        if end > len(self.buf):
+            raise ValueError("payload too large")
+        self.buf[i:end] = data
+        return end
+
+    def write_value(self, i, value):
+        if value is None:
+            return self.write(i, b"null")
+        if value is True or value is False:
+            return self.write(i, b"true" if value else b"false")
+        if isinstance(value, int):
+            return self.write_int(i, value)
+        if not isinstance(value, str):
+            # floats and anything else rarely show up, no need to cache them
+            return self.write(i, json.dumps(value).encode())
+        encoded = self.encoded.get(value)
+        if encoded is None:
+            encoded = json.dumps(value).encode()
+            if len(self.encoded) >= 16:
+                self.encoded.clear()
+            self.encoded[value] = encoded
+        return self.write(i, encoded)
+
+    def write_int(self, i, value):
+        buf = self.buf
+        if value < 0:
+            i = self.write(i, b"-")
+            value = -value
+        end = i + 1
+        rest = value // 10
+        while rest:
+            end += 1
+            rest //= 10
+        if end > len(buf):
+            raise ValueError("payload too large")
+        j = end
+        while True:
+            j -= 1
+            buf[j] = 48 + value % 10
+            value //= 10
+            if not value:
+                return end
+
+
+publish_topics = PublishRegistry(topic_pub_list)
+publish_topics.add(
+    "api/game/mtg/r/modifyPlayerHealth",
+    (b'{"uid": ', "uid", b', "amount": ', "amount", b"}"),
+)
+publish_topics.add(
+    "api/game/mtg/r/modifyCommanderDmg",
+    (
+        b'{"playerHit": ',
+        "playerHit",
+        b', "dmgFrom": ',
+        "dmgFrom",
+        b', "dmg": ',
+        "dmg",
+        b"}",
+    ),
+)
+publish_topics.add(
+    "api/game/mtg/r/snapshot",
+    (b'{"uid": ', "uid", b', "version": ', "version", b"}"),
+)
+
+
+def publish_message(topic, payload, priority=PRIORITY_NORMAL, key=None, merge=None):
+    """queue a message for the publish task, see PublishQueue for key and merge
+
+    Templated topics take a list of slot values as payload and merge names
+    the slot to sum.
+    """
+    interned = publish_topics.get(topic)
+    if interned is not None:
+        if merge is not None and interned in publish_topics.slots:
+            merge = publish_topics.slot(interned, merge)
+        if not outbox.put(interned, payload, priority, key, merge):
+            print("Outbox full, dropped message for '{0}'".format(topic))
     else:
         print(
             "Attempted to publish to an unlisted topic. Add '{0}' to publish list.".format(
@@ -590,28 +2047,80 @@ def publish_message(client, topic, payload):
         )
 
 
-def setupEncoder():
-    global clk_pin, dt_pin
-    clk_pin = Pin(pin_clk, Pin.IN)
-    dt_pin = Pin(pin_dt, Pin.IN)
-    clk_pin.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=rotary_callback)
-
-
-def rotary_callback(pin):
-    global last_clk_state, encoder_value
-    clk_state = clk_pin.value()
-    if clk_state != last_clk_state:
-        dt_state = dt_pin.value()
-        if dt_state != clk_state:
-            encoder_value += 1  # Increment value for clockwise rotation
+class RotaryEncoder:
+    """table driven quadrature decoder fed by IRQs on both encoder pins
+
+    value counts detents. accel_value also counts detents but multiplies
+    quick successive detents by the accel (gap_ms, multiplier) steps so long
+    lists can be spun through.
+    """
+
+    def __init__(self, clk, dt, mode=FULL_STEP, accel=((25, 5), (60, 2))):
+        self.clk = clk
+        self.dt = dt
+        self.mode = mode
+        self.accel = accel
+        self.state = (clk.value() << 1) | dt.value()
+        self.substeps = 0
+        self.direction = 1
+        self.value = 0
+        self.accel_value = 0
+        self.last_detent = time.ticks_ms()
+        self.errors = 0
+        clk.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self.edge)
+        dt.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self.edge)
+
+    def edge(self, pin):
+        state = (self.clk.value() << 1) | self.dt.value()
+        previous = self.state
+        if state == previous:
+            return
+        self.state = state
+        step = QUADRATURE_TABLE[(previous << 2) | state]
+        if step == 0:
+            # both lines changed between two IRQs, a state was skipped so
+            # assume the knob kept turning the same way
+            self.errors += 1
+            step = 2 * self.direction
         else:
-            encoder_value -= 1  # Decrement value for counter-clockwise rotation
-    last_clk_state = clk_state
+            self.direction = step
+        self.substeps += step
+        if self.substeps >= self.mode:
+            self.substeps = 0
+            self.detent(1)
+        elif self.substeps <= -self.mode:
+            self.substeps = 0
+            self.detent(-1)
+
+    def detent(self, direction):
+        now = time.ticks_ms()
+        gap = time.ticks_diff(now, self.last_detent)
+        self.last_detent = now
+        multiplier = 1
+        for gap_ms, step in self.accel:
+            if gap < gap_ms:
+                multiplier = step
+                break
+        self.value = (self.value + direction) & ENCODER_MASK
+        self.accel_value = (self.accel_value + direction * multiplier) & ENCODER_MASK
+
+
+def setupEncoder(mode=FULL_STEP):
+    global encoder
+    encoder = RotaryEncoder(Pin(pin_clk, Pin.IN), Pin(pin_dt, Pin.IN), mode=mode)
 
 
 def get_encoder_value():
-    global encoder_value
-    return encoder_value
+    return encoder.value
+
+
+def get_encoder_accel_value():
+    return encoder.accel_value
+
+
+def encoder_diff(current, last):
+    """signed difference between two wrapped encoder counts"""
+    return ((current - last + 0x8000) & ENCODER_MASK) - 0x8000
 
 
 def to_me(client_id_to_check):
@@ -623,9 +2132,83 @@ def to_me(client_id_to_check):
     )
 
 
-def mqtt_connect(check_handler, mqtt_server, username, pw):
-    """Connect to MQTT Broker"""
-    client = MQTTClient(
+class SessionClient(MQTTClient):
+    """umqtt client that subscribes to many topics with one SUBSCRIBE packet
+    and reports PINGRESPs, which umqtt.simple swallows, to on_pingresp
+    """
+
+    on_pingresp = None
+
+    def wait_msg(self):
+        """umqtt.simple's wait_msg with the PINGRESP passed on"""
+        res = self.sock.read(1)
+        self.sock.setblocking(True)
+        if res is None:
+            return None
+        if res == b"":
+            raise OSError(-1)
+        if res == b"\xd0":  # PINGRESP
+            if self.sock.read(1)[0] != 0:
+                raise MQTTException("bad PINGRESP")
+            if self.on_pingresp is not None:
+                self.on_pingresp()
+            return None
+        op = res[0]
+        if op & 0xF0 != 0x30:
+            return op
+        sz = self._recv_len()
+        topic_len = self.sock.read(2)
+        topic_len = (topic_len[0] << 8) | topic_len[1]
+        topic = self.sock.read(topic_len)
+        sz -= topic_len + 2
+        if op & 6:
+            pid = self.sock.read(2)
+            pid = pid[0] << 8 | pid[1]
+            sz -= 2
+        msg = self.sock.read(sz)
+        self.cb(topic, msg)
+        if op & 6 == 2:
+            pkt = bytearray(b"\x40\x02\0\0")
+            struct.pack_into("!H", pkt, 2, pid)
+            self.sock.write(pkt)
+        elif op & 6 == 4:
+            raise MQTTException("QoS 2 is not supported")
+        return op
+
+    def subscribe_many(self, topics, qos=1):
+        """subscribe and wait for the SUBACK, returns the granted QoS per topic"""
+        self.pid += 1
+        pid = self.pid
+        body = bytearray(struct.pack("!H", pid))
+        for topic in topics:
+            body += struct.pack("!H", len(topic))
+            body += topic
+            body.append(qos)
+        # fixed header with the variable length remaining length
+        packet = bytearray(b"\x82")
+        size = len(body)
+        while True:
+            byte = size & 0x7F
+            size >>= 7
+            packet.append(byte | 0x80 if size else byte)
+            if not size:
+                break
+        self.sock.write(packet + body)
+        while True:
+            op = self.wait_msg()
+            if op == 0x90:
+                resp = self.sock.read(self.sock.read(1)[0])
+                if struct.unpack("!H", resp[:2])[0] != pid:
+                    raise MQTTException("SUBACK for another packet")
+                granted = resp[2:]
+                if 0x80 in granted:
+                    raise MQTTException("subscription refused")
+                return granted
+
+
+def mqtt_connect(check_handler, mqtt_server, username, pw, clean_session=True):
+    """Connect to MQTT Broker, session_present is set on the returned client"""
+    client = SessionClient(
         client_id=client_id,
         server=mqtt_server,
         port=1883,
@@ -633,36 +2216,462 @@ def mqtt_connect(check_handler, mqtt_server, username, pw):
         # user=username,
         # password=pw,
         ssl=False,
-        keepalive=3600,
+        keepalive=MQTT_KEEPALIVE_S,
     )
     print("Connecting to MQTT Broker")
     try:
         client.set_callback(check_handler.check_msg)
-        client.connect()
+        try:
+            session_present = client.connect(
+                clean_session=clean_session, timeout=MQTT_CONNECT_TIMEOUT_S
+            )
+        except TypeError:
+            # umqtt.simple before 1.4 takes no timeout and blocks until it gives up,
+            # drop any socket the first attempt opened before the second opens one
+            close_client(client)
+            session_present = client.connect(clean_session=clean_session)
+        client.session_present = session_present
         print("MQTT Broker Connected to {0}".format(mqtt_server))
         return client
     except Exception as e:
         print("MQTT Broker Connection Failed {0} {1}".format(mqtt_server, e))
-        sleep(1)
+        # a refused CONNACK leaves the socket open
+        close_client(client)
         return None
 
 
-def connect_to_wlan(ssid, password):
-    """Connect to WLAN"""
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    wlan.connect(ssid, password)
-    while wlan.isconnected() == False:
-        print("Waiting for connection...")
-        sleep(1)
-    print(wlan.ifconfig())
-    return wlan
+def close_client(client):
+    """close a client's socket without a DISCONNECT, the link may be dead"""
+    try:
+        client.sock.close()
+    except (OSError, AttributeError):
+        pass
+
+
+# give up waiting for the access point after this long and back off
+WLAN_TIMEOUT_MS = 10000
+# a join with cached parameters that takes longer than this drops the cache
+WLAN_CACHED_TIMEOUT_MS = 4000
+# last good access point, lease and broker address, to skip the scan, DHCP
+# and DNS on the next boot
+NET_CACHE_FILE = "netcache.json"
+MQTT_PORT = 1883
+# longest wait on each socket call of an MQTT connect: the TCP handshake,
+# the CONNECT and its CONNACK. A DNS lookup is only bounded by lwIP's retries
+MQTT_CONNECT_TIMEOUT_S = 3
+
+
+class ConnectionManager:
+    """keeps WLAN and the MQTT session up, retrying with jittered exponential backoff
+
+    The MQTT session is persistent (clean_session=False), so the broker keeps
+    the queued QoS 1 messages across short drops. The subscriptions are sent
+    again on every connect, a resumed session may not hold all of them, and
+    they all go out in one SUBSCRIBE packet. The time from losing the
+    connection to having it back is recorded for each reconnect.
+
+    The BSSID, IP configuration and broker address of the last good
+    connection are kept in NET_CACHE_FILE. A later join to the same SSID asks
+    for that BSSID and reuses the lease as a static configuration, and the
+    broker is reached at its cached address. A cached entry that fails once
+    is dropped, and the next attempt does the full scan, DHCP and lookup. A
+    cached lease that joins but cannot reach the broker is dropped as well,
+    and the WLAN rejoins with DHCP.
+    """
+
+    def __init__(
+        self, config: dict, mqtt_handler, status=None, base_ms=500, max_ms=30000
+    ):
+        self.config = config
+        self.mqtt_handler = mqtt_handler
+        self.status = status
+        self.on_connect = None
+        self.base_ms = base_ms
+        self.max_ms = max_ms
+        self.wlan = None
+        # the WLAN is up on a lease taken from the cache instead of DHCP
+        self.cached_lease = False
+        self.client = None
+        # consecutive failed attempts, sets the backoff
+        self.attempts = 0
+        self.lost_at = None
+        self.connects = 0
+        self.resumed = 0
+        self.last_reconnect_ms = 0
+        self.max_reconnect_ms = 0
+        self.total_reconnect_ms = 0
+        self.net_cache = self.load_net_cache()
+        self.net_cache_dirty = False
+        # bumped by restart() so an attempt under the old config gives up
+        self.generation = 0
+        self.wake = asyncio.Event()
+
+    def load_net_cache(self):
+        try:
+            with open(NET_CACHE_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_net_cache(self):
+        if not self.net_cache_dirty:
+            return
+        self.net_cache_dirty = False
+        try:
+            with open(NET_CACHE_FILE, "w") as f:
+                json.dump(self.net_cache, f)
+        except OSError as e:
+            print("Could not save the network cache: {0}".format(e))
+
+    def cache(self, key, value):
+        if self.net_cache.get(key) != value:
+            self.net_cache[key] = value
+            self.net_cache_dirty = True
+
+    def forget(self, *keys):
+        for key in keys:
+            if self.net_cache.pop(key, None) is not None:
+                self.net_cache_dirty = True
+
+    def restart(self):
+        """reconnect from scratch after the configuration changed"""
+        self.generation += 1
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+            except OSError:
+                pass
+        self.lost("configuration changed")
+        if self.wlan is not None:
+            self.wlan.disconnect()
+        self.attempts = 0
+        self.wake.set()
+
+    async def pause(self, seconds):
+        """sleep, unless restart() wakes the connection task first"""
+        try:
+            await asyncio.wait_for(self.wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        self.wake.clear()
+
+    def show_status(self, *lines):
+        if self.status is not None:
+            self.status(*lines)
+
+    def backoff_ms(self):
+        """wait before the next attempt, between half and all of the doubled delay"""
+        ceiling = min(self.max_ms, self.base_ms << min(self.attempts, 16))
+        half = ceiling // 2
+        return half + random.getrandbits(16) % (half + 1)
+
+    def lost(self, reason):
+        if self.client is None:
+            return
+        print("Lost connection to {0} {1}".format(self.config["mqtt_server"], reason))
+        close_client(self.client)
+        self.client = None
+        self.lost_at = time.ticks_ms()
+
+    async def connect_wlan(self):
+        ssid = self.config["ssid"]
+        # show connecting to ssid on oled
+        self.show_status("Connecting to:", ssid)
+        if self.wlan is None:
+            self.wlan = network.WLAN(network.STA_IF)
+            self.wlan.active(True)
+        cached = self.net_cache.get("ssid") == ssid
+        bssid = self.net_cache.get("bssid") if cached else None
+        lease = self.net_cache.get("ifconfig") if cached else None
+        self.cached_lease = bool(lease)
+        if lease:
+            # the last lease as a static configuration skips DHCP
+            self.wlan.ifconfig(tuple(lease))
+        try:
+            if bssid:
+                self.wlan.connect(
+                    ssid, self.config["password"], bssid=ubinascii.unhexlify(bssid)
+                )
+            else:
+                self.wlan.connect(ssid, self.config["password"])
+        except TypeError:
+            # this port cannot join by BSSID
+            self.forget("bssid")
+            self.wlan.connect(ssid, self.config["password"])
+        timeout_ms = WLAN_CACHED_TIMEOUT_MS if cached else WLAN_TIMEOUT_MS
+        started = time.ticks_ms()
+        while not self.wlan.isconnected():
+            if time.ticks_diff(time.ticks_ms(), started) >= timeout_ms:
+                print("WLAN connection to {0} timed out".format(ssid))
+                if cached:
+                    self.forget("ssid", "bssid", "ifconfig")
+                    self.save_net_cache()
+                    if lease:
+                        self.wlan.ifconfig("dhcp")
+                        self.cached_lease = False
+                return False
+            await asyncio.sleep(0.05)
+        mark_boot("wlan")
+        self.cache("ssid", ssid)
+        self.cache("ifconfig", list(self.wlan.ifconfig()))
+        try:
+            joined = self.wlan.config("bssid")
+        except (ValueError, OSError):
+            joined = None
+        if joined:
+            self.cache("bssid", ubinascii.hexlify(joined).decode())
+        print(self.wlan.ifconfig())
+        return True
+
+    def drop_lease(self):
+        """go back to DHCP when the cached lease joined but reached nothing"""
+        if not self.cached_lease:
+            return
+        print("Dropping the cached lease")
+        self.cached_lease = False
+        self.forget("ifconfig")
+        self.save_net_cache()
+        self.wlan.ifconfig("dhcp")
+        # rejoin, so the next attempt takes a lease
+        self.wlan.disconnect()
+
+    def broker_address(self):
+        """the broker's address, looked up only when it is not cached"""
+        server = self.config["mqtt_server"]
+        if self.net_cache.get("server") == server and self.net_cache.get("address"):
+            return self.net_cache["address"]
+        try:
+            address = usocket.getaddrinfo(server, MQTT_PORT)[0][-1]
+        except OSError as e:
+            print("Could not resolve {0} {1}".format(server, e))
+            return server
+        if not isinstance(address, tuple):
+            # older ports return a packed sockaddr, let the client resolve it
+            return server
+        self.cache("server", server)
+        self.cache("address", address[0])
+        return address[0]
+
+    async def connect(self):
+        """one attempt at bringing up WLAN and the MQTT session"""
+        if self.lost_at is None:
+            self.lost_at = time.ticks_ms()
+        generation = self.generation
+        if self.wlan is None or not self.wlan.isconnected():
+            if not await self.connect_wlan():
+                return False
+        if generation != self.generation:
+            return False
+        mqtt_server = self.config["mqtt_server"]
+        # show connecting to MQTT server on oled
+        self.show_status("Connecting to", "MQTT Server:", mqtt_server)
+        # client = mqtt_connect(
+        #     check_handler=self.mqtt_handler,
+        #     mqtt_server=mqtt_server,
+        #     username=self.config["username"],
+        #     pw=self.config["mqtt_pass"],
+        # )
+        client = mqtt_connect(
+            check_handler=self.mqtt_handler,
+            mqtt_server=self.broker_address(),
+            username="",
+            pw="",
+            clean_session=False,
+        )
+        if client is None:
+            # the cached address or lease may be stale, renew both next time
+            self.forget("address")
+            self.drop_lease()
+            return False
+        if client.session_present:
+            self.resumed += 1
+        # a stored session can predate topics added since, subscribing is idempotent
+        try:
+            client.subscribe_many(topic_sub)
+        except (OSError, MQTTException) as e:
+            print("Subscribe failed {0}".format(e))
+            close_client(client)
+            return False
+        elapsed = time.ticks_diff(time.ticks_ms(), self.lost_at)
+        self.lost_at = None
+        mark_boot("mqtt")
+        self.save_net_cache()
+        self.connects += 1
+        self.last_reconnect_ms = elapsed
+        self.max_reconnect_ms = max(self.max_reconnect_ms, elapsed)
+        self.total_reconnect_ms += elapsed
+        print(
+            "Connected in {0} ms, session {1}".format(
+                elapsed, "resumed" if client.session_present else "new"
+            )
+        )
+        self.client = client
+        if self.on_connect is not None:
+            self.on_connect(client)
+        return True
+
+    async def run(self):
+        """connection task, reconnects for the lifetime of the device"""
+        while True:
+            if self.client is not None and not self.wlan.isconnected():
+                self.lost("WLAN connection lost")
+            if self.client is None:
+                if await self.connect():
+                    self.attempts = 0
+                else:
+                    wait = self.backoff_ms()
+                    self.attempts += 1
+                    print("Retrying connection in {0} ms".format(wait))
+                    await self.pause(wait / 1000)
+                    continue
+            await self.pause(1)
+
+    def stats(self):
+        return {
+            "connects": self.connects,
+            "resumed": self.resumed,
+            "lastMs": self.last_reconnect_ms,
+            "maxMs": self.max_reconnect_ms,
+            "avgMs": self.total_reconnect_ms // max(self.connects, 1),
+        }
+
+
+# users known to the backend, kept across boots
+USER_CACHE_FILE = "userdir.txt"
+
+
+class UserDirectory:
+    """backend users indexed by uid and by name, cached on flash
+
+    The cache is the version line followed by one "uid<TAB>name" line per
+    user. getAllUsers requests carry the cached version and the backend may
+    answer with any of:
+
+        [{"uid": ..., "name": ...}, ...]                 full list, unversioned
+        {"version": v, "users": [...]}                   full list
+        {"version": v, "added": [...], "removed": [uid]} changes since ours
+
+    A versioned reply carrying the version already held changes nothing.
+    """
+
+    def __init__(self, path=USER_CACHE_FILE):
+        self.path = path
+        self.version = None
+        # login options in the order the backend listed the users
+        self.names = []
+        self.by_uid = {}
+        self.by_name = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def uid(self, name):
+        return self.by_name.get(name)
+
+    def name(self, uid):
+        return self.by_uid.get(uid)
+
+    def clear(self):
+        self.names = []
+        self.by_uid = {}
+        self.by_name = {}
+
+    def add(self, uid, name):
+        if uid is None or name is None:
+            return False
+        if uid in self.by_uid:
+            if self.by_uid[uid] == name:
+                return False
+            self.remove(uid)
+        self.by_uid[uid] = name
+        # the first user listed under a name wins, as index() did
+        if name not in self.by_name:
+            self.by_name[name] = uid
+        self.names.append(name)
+        return True
+
+    def remove(self, uid):
+        name = self.by_uid.pop(uid, None)
+        if name is None:
+            return False
+        self.names.remove(name)
+        if self.by_name.get(name) == uid:
+            del self.by_name[name]
+            # another user with the same name takes over the entry
+            for other, other_name in self.by_uid.items():
+                if other_name == name:
+                    self.by_name[name] = other
+                    break
+        return True
+
+    def apply(self, payload):
+        """merge a getAllUsers reply, returns True when the directory changed"""
+        if isinstance(payload, list):
+            version = None
+            users = payload
+        else:
+            version = payload.get("version")
+            if version is not None and version == self.version:
+                return False
+            users = payload.get("users")
+        changed = False
+        if users is not None:
+            self.clear()
+            for user in users:
+                self.add(user.get("uid"), user.get("name"))
+            changed = True
+        else:
+            # a login prompt may still be showing the old list
+            self.names = list(self.names)
+            for uid in payload.get("removed", ()):
+                changed = self.remove(uid) or changed
+            for user in payload.get("added", ()):
+                changed = self.add(user.get("uid"), user.get("name")) or changed
+        if version != self.version:
+            self.version = version
+            changed = True
+        return changed
+
+    def request(self):
+        """getAllUsers payload, asking only for changes when a version is cached"""
+        if self.version is None:
+            return {}
+        return {"version": self.version}
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                version = f.readline().strip()
+                self.clear()
+                for line in f:
+                    uid, _, name = line.rstrip("\n").partition("\t")
+                    self.add(uid, name)
+        except OSError:
+            return False
+        self.version = version or None
+        return True
+
+    def save(self):
+        """rewrite the cache, replacing the old one only once fully written"""
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write("{0}\n".format(self.version or ""))
+                for uid, name in self.by_uid.items():
+                    f.write("{0}\t{1}\n".format(uid, name.replace("\n", " ")))
+            os.rename(tmp, self.path)
+        except OSError as e:
+            print("Could not save the user cache: {0}".format(e))
+
+
+user_directory = UserDirectory()
 
 
 class MainMenu:
-    def __init__(self, oled: OLED, mqtt_handler: MqttHandler):
-        self.oled: OLED = oled
-        self.menu_options = ["Login", "MTG", "Info"]
+    def __init__(self, scheduler: RenderScheduler, mqtt_handler: MqttHandler):
+        self.scheduler = scheduler
+        self.oled: OLED = scheduler.oled
+        self.menu_options = ["Login", "MTG", "Messages", "Info"]
         self.selected_index = 0
         self.mqtt_handler = mqtt_handler
         self.mtg_game = MTGGame(mqtt_handler)
@@ -679,49 +2688,49 @@ class MainMenu:
         self.display_menu()
 
     def display_menu(self):
+        mark_boot("menu")
         self.oled.clear()
         self.oled.display_text("Mothership", 0)
+        unread = self.mqtt_handler.mothership.unread_count()
+        if unread:
+            # unread count right aligned on the title row
+            label = str(unread) if unread < 100 else "99+"
+            self.oled.oled.text(label, self.oled.width - len(label) * 8, 0)
         self.oled.display_text("----------------", 10)
         selected_option = self.menu_options[self.selected_index]
         self.oled.display_text(selected_option, 20)
-        self.oled.show()
+        self.scheduler.invalidate()
 
-    def login(self):
+    async def login(self):
         global selectedUser
         # Display login screen and allow user selection
-        users = mothershipUsers  # Access global variable
-        if users:
-            user_names = [
-                user["name"] for user in users if user.get("name") is not None
-            ]
-            print(user_names)
-            selectedUser = self.mqtt_handler.selector.custom_choice(
-                question="Select User:", options=user_names
+        if len(user_directory):
+            selectedUser = await self.mqtt_handler.selector.custom_choice(
+                question="Select User:", options=user_directory.names
             )
             if selectedUser:
-                return users[user_names.index(selectedUser)]["uid"]
+                return user_directory.uid(selectedUser)
             else:
                 return None
         else:
             print("No users available.")
             return None
 
-    def select_menu_option(self, mqtt_handler: MqttHandler):
+    async def select_menu_option(self, mqtt_handler: MqttHandler):
         global selectedUser
         if self.menu_options[self.selected_index] == "Send":
-            time.sleep(0.2)
-            new_msg = mqtt_handler.selector.yes("New Message?")
+            new_msg = await mqtt_handler.selector.yes("New Message?")
+            users = get_users()
             if new_msg:
-                users = get_users()
-                message = mqtt_handler.selector.cycle_characters("Message:")
+                message = await mqtt_handler.selector.cycle_characters("Message:")
                 sel_user = ""
                 if len(users) > 0:
-                    sel_user = mqtt_handler.selector.custom_choice("User:", users)
+                    sel_user = await mqtt_handler.selector.custom_choice("User:", users)
                 else:
-                    sel_user = mqtt_handler.selector.cycle_characters("User:")
+                    sel_user = await mqtt_handler.selector.cycle_characters("User:")
+                    save_user(sel_user)
 
                 publish_message(
-                    client=mqtt_handler.heart_beat.client,
                     topic="msg",
                     payload={
                         "client_id": sel_user,
@@ -735,18 +2744,20 @@ class MainMenu:
                 sel_message = ""
 
                 if len(messages) > 0:
-                    sel_message = mqtt_handler.selector.custom_choice(
+                    sel_message = await mqtt_handler.selector.custom_choice(
                         "Message:", messages
                     )
                 else:
-                    sel_message = mqtt_handler.selector.cycle_characters("Message:")
+                    sel_message = await mqtt_handler.selector.cycle_characters(
+                        "Message:"
+                    )
                 if len(users) > 0:
-                    sel_user = mqtt_handler.selector.custom_choice("User:", users)
+                    sel_user = await mqtt_handler.selector.custom_choice("User:", users)
                 else:
-                    sel_user = mqtt_handler.selector.cycle_characters("User:")
+                    sel_user = await mqtt_handler.selector.cycle_characters("User:")
+                    save_user(sel_user)
 
                 publish_message(
-                    client=mqtt_handler.heart_beat.client,
                     topic="msg",
                     payload={
                         "client_id": sel_user,
@@ -758,13 +2769,11 @@ class MainMenu:
             self.oled.clear()
             self.oled.display_text("Message", 0)
             self.oled.display_text("Published!", 10)
-            self.oled.show()
+            self.scheduler.invalidate()
 
         elif self.menu_options[self.selected_index] == "Login":
-            selectedUser = self.login()
+            selectedUser = await self.login()
             if selectedUser:
-                global selectedUser
-                selectedUser = selectedUser
                 print("Selected user:", selectedUser)
 
         elif self.menu_options[self.selected_index] == "MTG":
@@ -772,64 +2781,46 @@ class MainMenu:
                 # Handle "MTG" menu option
                 self.oled.clear()
                 self.oled.display_text("Starting MTG Game...", 0)
-                self.oled.show()
+                self.scheduler.invalidate()
+                self.mtg_game.uid = selectedUser
                 self.mtg_game.handle_command("joinGame")
+                await self.mtg_game.play()
+                self.display_menu()
             else:
-                selectedUser = self.login()
+                selectedUser = await self.login()
 
         elif self.menu_options[self.selected_index] == "Messages":
             mqtt_handler.mothership.display_oldest_message()
             mqtt_handler.mothership.remove_oldest_message()
+            self.scheduler.invalidate()
 
         elif self.menu_options[self.selected_index] == "Info":
             self.oled.clear()
             self.oled.display_text(username, 0)
             self.oled.display_text(mqtt_handler.heart_beat.client.server, 10)
             self.oled.display_text(ubinascii.hexlify(unique_id()).decode(), 20)
-            self.oled.show()
-
-
-def rotary_callback(pin):
-    global last_clk_state, encoder_value
-    clk_state = clk_pin.value()
-    if clk_state != last_clk_state:
-        dt_state = dt_pin.value()
-        if dt_state != clk_state:
-            encoder_value += 1  # Increment value for clockwise rotation
-        else:
-            encoder_value -= 1  # Decrement value for counter-clockwise rotation
-    last_clk_state = clk_state
+            self.scheduler.invalidate()
+            instrument.dump()
 
 
 def read_random_line(filename):
-    with open(filename, "r") as f:
-        lines = f.readlines()
-
-    if lines:
-        random_line = random.choice(lines).strip()
-        return random_line
-    else:
-        return None
+    return linestore.open_store(filename).sample()
 
 
 def save_user(usr_to_add):
-    with open("users.txt", "a") as f:
-        f.write("{0}\n".format(usr_to_add))
+    users = get_users()
+    if users.find(usr_to_add) < 0:
+        users.append(usr_to_add)
 
 
-def get_messages():
-    # Open and read the messages file
-    messages = []
-    try:
-        # Open and read the configuration file
-        with open("msg.txt", "r") as f:
-            msg_data = f.read()
+def get_users():
+    """users messages were sent to, indexable like a list without being loaded"""
+    return linestore.open_store("users.txt")
 
-        # split line the messages
-        messages = msg_data.splitlines()
-    except Exception as e:
-        open("msg.txt", "w").close()
-    return messages
+
+def get_messages():
+    """canned messages, indexable like a list without being loaded"""
+    return linestore.open_store("msg.txt")
 
 
 def get_config():
@@ -853,172 +2844,224 @@ def get_config():
             "password": "pass",
             "mqtt_server": "mothership.local",
             "mqtt_pass": "pass",
+            "fps": "20",
         }
     return config
 
 
-def main():
-    config = get_config()
-    print(config)
-    username = config["username"]
-    ssid = config["ssid"]
-    password = config["password"]
-    mqtt_server = config["mqtt_server"]
-    mqtt_pass = config["mqtt_pass"]
-
-    # sensor reading variables
-    previous_readings = []
-    num_previous_readings = 50
-    last_interaction_time = 0
-    debounce_delay = 1000
-
-    # instantiate the screen and clear it
-    oled = OLED(128, 32, i2c)
-    oled.clear()
-    oled.show()
-
-    # encoder setup and value
-    setupEncoder()
-    last_encoder_value = get_encoder_value()
-    last_direction = None
+async def configure(selector: CharacterSelector, config: dict, timeout_ms=None):
+    """let the user change the stored configuration, True if they did
 
-    # Set SSID and password if none entered
-    selector = CharacterSelector(oled, characters)
-    change_config = selector.yes(title="Change Config?")
+    The first prompt answers itself with no after timeout_ms without input.
+    """
+    change_config = await selector.yes(title="Change Config?", timeout_ms=timeout_ms)
     if change_config:
-        select_ssid = selector.yes(title="Enter New Wifi?")
+        select_ssid = await selector.yes(title="Enter New Wifi?")
         if select_ssid:
-            ssid = selector.cycle_characters(title="WiFi SSID:")
+            ssid = await selector.cycle_characters(title="WiFi SSID:")
             config["ssid"] = ssid
             print(ssid)
-        select_pass = selector.yes(title="Enter New Pass?")
+        select_pass = await selector.yes(title="Enter New Pass?")
         if select_pass:
-            password = selector.cycle_characters(title="WiFi Pass:")
+            password = await selector.cycle_characters(title="WiFi Pass:")
             config["password"] = password
             print(password)
-        select_ip = selector.yes(title="New Server IP?")
+        select_ip = await selector.yes(title="New Server IP?")
         if select_ip:
-            mqtt_server = selector.cycle_characters(title="Server IP:")
+            mqtt_server = await selector.cycle_characters(title="Server IP:")
             config["mqtt_server"] = mqtt_server
             print(mqtt_server)
-        select_mqtt_pass = selector.yes(title="New Server Pass?")
+        select_mqtt_pass = await selector.yes(title="New Server Pass?")
         if select_mqtt_pass:
-            mqtt_pass = selector.cycle_characters(title="MQTT Pass:")
+            mqtt_pass = await selector.cycle_characters(title="MQTT Pass:")
             config["mqtt_pass"] = mqtt_pass
             print(mqtt_pass)
-        reset_config = selector.yes(title="Reset Config?")
+        reset_config = await selector.yes(title="Reset Config?")
         if reset_config:
             open("config.txt", "w").close()
-            username = "X AE A-12"
-            ssid = "ssid"
-            password = "err"
-            mqtt_server = "carrot.garden"
-            mqtt_pass = "err"
+            config["username"] = "X AE A-12"
+            config["ssid"] = "ssid"
+            config["password"] = "err"
+            config["mqtt_server"] = "carrot.garden"
+            config["mqtt_pass"] = "err"
         # Write updated configuration to file
         with open("config.txt", "w") as f:
             for key, value in config.items():
                 f.write(f"{key}={value}\n")
+    return change_config
 
-    mothership = Mothership(oled)
-    mqtt_handler = MqttHandler(oled=oled, mothership=mothership, selector=selector)
-    client = None
-    wlan = connect_to_wlan(ssid, password)
-
-    # instance of the main menu
-    main_menu = MainMenu(oled=oled, mqtt_handler=mqtt_handler)
-
-    # show connecting to ssid on oled
-    oled.clear()
-    oled.display_text("Connecting to:", 0)
-    oled.display_text(ssid, 10)
-    oled.show()
-    time.sleep(0.2)
-    while wlan.isconnected():
-        while client is None:
-            # show connecting to MQTT server on oled
-            oled.clear()
-            oled.display_text("Connecting to", 0)
-            oled.display_text("MQTT Server:", 10)
-            oled.display_text(mqtt_server, 20)
-            oled.show()
-            time.sleep(0.2)
-            # client = mqtt_connect(
-            #     check_handler=mqtt_handler,
-            #     mqtt_server=mqtt_server,
-            #     username=username,
-            #     pw=mqtt_pass,
-            # )
-            client = mqtt_connect(
-                check_handler=mqtt_handler, mqtt_server=mqtt_server, username="", pw=""
+
+# seconds the boot config prompt waits for an answer, 0 waits for ever
+CONFIG_PROMPT_S = 3
+
+
+class Runtime:
+    """cooperative tasks for MQTT receive, input, heartbeat publishing and rendering"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        # logins can be offered from the cache before the backend answers
+        user_directory.load()
+
+        # instantiate the screen and clear it
+        self.oled = OLED(128, 32, i2c)
+        self.scheduler = RenderScheduler(self.oled, fps=int(config.get("fps", 20)))
+        self.oled.clear()
+        self.scheduler.flush()
+
+        self.buttons = ButtonEvents((left_button, right_button, select_button))
+        self.selector = CharacterSelector(self.scheduler, characters, self.buttons)
+        # "inbox=1" in config.txt keeps unread messages across reboots
+        self.mothership = Mothership(
+            self.oled,
+            inbox_path="inbox.txt" if config.get("inbox") == "1" else None,
+        )
+        self.mqtt_handler = MqttHandler(
+            scheduler=self.scheduler, mothership=self.mothership, selector=self.selector
+        )
+        # instance of the main menu
+        self.main_menu = MainMenu(
+            scheduler=self.scheduler, mqtt_handler=self.mqtt_handler
+        )
+        self.connection = ConnectionManager(
+            config, self.mqtt_handler, status=self.show_status
+        )
+        self.connection.on_connect = self.on_connect
+        self.status = None
+
+    def show_status(self, line0, line1="", line2=""):
+        self.status = (line0, line1, line2)
+        # a prompt owns the screen, the status shows once it is answered
+        if self.selector.lock.locked():
+            return
+        self.oled.clear()
+        self.oled.display_text(line0, 0)
+        self.oled.display_text(line1, 10)
+        self.oled.display_text(line2, 20)
+        self.scheduler.invalidate()
+
+    def on_connect(self, client):
+        if hasattr(client, "sock") and isinstance(client.sock, usocket.socket):
+            print("Connection is encrypted with SSL/TLS.")
+        else:
+            print("Connection is not encrypted.")
+        # one heartbeat for the device, it keeps its stats across sessions
+        if self.mqtt_handler.heart_beat is None:
+            self.mqtt_handler.heart_beat = Heartbeat(
+                client=client,
+                mothership=self.mothership,
+                connection=self.connection,
+                game=self.main_menu.mtg_game,
             )
-            if hasattr(client, "sock") and isinstance(client.sock, usocket.socket):
-                print("Connection is encrypted with SSL/TLS.")
-            else:
-                print("Connection is not encrypted.")
-            if client:
-                # show connected on oled
-                oled.clear()
-                oled.display_text("Connected!", 0)
-                oled.display_text("Mothership Butt", 10)
-                oled.display_text("Synced!", 20)
-                oled.show()
-                time.sleep(1)
-                for sub in topic_sub:
-                    client.subscribe(sub)
-                micropython.alloc_emergency_exception_buf(100)
-                # create heartbeat for message queue
-                mqtt_handler.heart_beat = Heartbeat(
-                    client=client,
-                    mothership=mqtt_handler.mothership,
-                )
-                mqtt_handler.heart_beat.publish_config()
-                mqtt_handler.heart_beat.publish_user_request()
-                main_menu.display_menu()
         else:
-            try:
-                # oled sleep after seconds have passed without button push
-                # elapsed_time = time.time() - oled.sleep_timer
-                # if elapsed_time >= 20:
-                #     oled.sleep()
-                # check incoming published messages
-                client.check_msg()
+            self.mqtt_handler.heart_beat.set_client(client)
+        self.mqtt_handler.heart_beat.publish_config()
+        self.mqtt_handler.heart_beat.publish_user_request()
+        if not self.selector.lock.locked():
+            self.main_menu.display_menu()
 
+    async def mqtt_task(self):
+        while True:
+            client = self.connection.client
+            if client is not None:
+                try:
+                    # check incoming published messages
+                    client.check_msg()
+                except (OSError, MQTTException) as e:
+                    # broker stopped, or sent something umqtt cannot follow
+                    self.connection.lost(e)
+                except Exception as e:
+                    print("Something unexpected went wrong: {0}".format(e))
+            await asyncio.sleep(0.02)
+
+    async def input_task(self):
+        last_encoder_value = get_encoder_value()
+        while True:
+            await asyncio.sleep(0.02)
+            # prompts poll the inputs themselves while they own the screen
+            if self.connection.client is None or self.selector.lock.locked():
+                last_encoder_value = get_encoder_value()
+                continue
+            try:
                 current_encoder_value = get_encoder_value()
                 if current_encoder_value != last_encoder_value:
-                    direction = (
-                        "clockwise"
-                        if current_encoder_value > last_encoder_value
-                        else "counter-clockwise"
-                    )
-                    if current_encoder_value > last_encoder_value:
-                        main_menu.right()
+                    if encoder_diff(current_encoder_value, last_encoder_value) > 0:
+                        self.main_menu.right()
                     else:
-                        main_menu.left()
+                        self.main_menu.left()
                     last_encoder_value = current_encoder_value
 
-                if not left_button.value():
-                    main_menu.left(mqtt_handler)
-                    time.sleep(0.2)  # Debounce delay
-
-                if not right_button.value():
-                    main_menu.right(mqtt_handler)
-                    time.sleep(0.2)  # Debounce delay
-
-                if not select_button.value():
-                    main_menu.select_menu_option(mqtt_handler)
-                    time.sleep(0.2)  # Debounce delay
-
+                button = self.buttons.pop()
+                if button == BUTTON_LEFT:
+                    self.main_menu.left()
+                elif button == BUTTON_RIGHT:
+                    self.main_menu.right()
+                elif button == BUTTON_SELECT:
+                    await self.main_menu.select_menu_option(self.mqtt_handler)
             except OSError as e:
-                # broker stopped
-                print("Lost connection to {0} {1}".format(mqtt_server, e))
-                client = None
+                self.connection.lost(e)
             except Exception as e:
                 print("Something unexpected went wrong: {0}".format(e))
-    else:
-        # set password and SSID to empty string to let user enter again without restarting device
-        ssid = ""
-        password = ""
-        main()
+
+    async def publish_task(self):
+        while True:
+            client = self.connection.client
+            if client is not None and outbox.depth():
+                try:
+                    outbox.flush(client)
+                except OSError as e:
+                    # the message stays queued until the session is back
+                    self.connection.lost(e)
+                except Exception as e:
+                    print("Something unexpected went wrong: {0}".format(e))
+            await asyncio.sleep(0.02)
+
+    async def heartbeat_task(self):
+        while True:
+            await asyncio.sleep(1 / HEARTBEAT_HZ)
+            try:
+                self.mothership.unread_messages.sync()
+            except Exception as e:
+                # a bad record must not stop the pings
+                print("Could not save the inbox: {0}".format(e))
+            heart_beat = self.mqtt_handler.heart_beat
+            if heart_beat is None or self.connection.client is None:
+                continue
+            try:
+                if not heart_beat.poll():
+                    self.connection.lost("no PINGRESP")
+            except OSError as e:
+                self.connection.lost(e)
+
+    async def run(self):
+        asyncio.create_task(self.scheduler.run())
+        micropython.alloc_emergency_exception_buf(100)
+        # WLAN and MQTT come up in the background while the config prompt shows
+        connection_task = asyncio.create_task(self.connection.run())
+        asyncio.create_task(self.mqtt_task())
+        asyncio.create_task(self.input_task())
+        asyncio.create_task(self.publish_task())
+        asyncio.create_task(self.heartbeat_task())
+        prompt_s = int(self.config.get("prompt_s", CONFIG_PROMPT_S))
+        timeout_ms = prompt_s * 1000 if prompt_s > 0 else None
+        if await configure(self.selector, self.config, timeout_ms):
+            self.connection.restart()
+        mark_boot("prompt")
+        if self.connection.client is not None:
+            self.main_menu.display_menu()
+        elif self.status is not None:
+            self.show_status(*self.status)
+        await connection_task
+
+
+def main():
+    config = get_config()
+    print(config)
+
+    # encoder setup and value
+    setupEncoder()
+
+    asyncio.run(Runtime(config).run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""Run the device modules on CPython through the stand-ins in host/"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), ROOT]
@@ -0,0 +1,99 @@
+from mothership import INBOX_SYNC_MS, Inbox, inbox_field, inbox_value
+
+
+def sync_now(inbox):
+    # the rate limit counts from construction
+    inbox.last_sync -= INBOX_SYNC_MS
+    inbox.sync()
+
+
+def messages(inbox):
+    records = [inbox.records[(inbox.head + i) % inbox.size] for i in range(len(inbox))]
+    return [(record.user_from, record.message) for record in records]
+
+
+def test_full_ring_drops_the_oldest():
+    inbox = Inbox(size=3)
+    for i in range(5):
+        inbox.push("user", "message {0}".format(i))
+    assert len(inbox) == 3
+    assert inbox.stats() == {"unread": 3, "dropped": 2}
+    assert inbox.oldest().message == "message 2"
+    assert [message for _, message in messages(inbox)] == [
+        "message 2",
+        "message 3",
+        "message 4",
+    ]
+
+
+def test_pop_oldest_releases_the_record():
+    inbox = Inbox(size=2)
+    inbox.push("a", "one")
+    inbox.push("b", "two")
+    record = inbox.oldest()
+    assert inbox.pop_oldest()
+    assert record.message is None
+    assert inbox.oldest().message == "two"
+    assert inbox.pop_oldest()
+    assert not inbox.pop_oldest()
+
+
+def test_handles_follow_records_through_the_ring():
+    inbox = Inbox(size=3)
+    first = inbox.push("a", "one")
+    second = inbox.push("b", "two")
+    third = inbox.push("c", "three")
+    assert inbox.remove(second)
+    assert inbox.get(second) is None
+    assert not inbox.remove(second)
+    assert inbox.get(third).message == "three"
+    # wraps past the slot the removed record left
+    fourth = inbox.push("d", "four")
+    fifth = inbox.push("e", "five")
+    assert inbox.get(first) is None
+    assert inbox.get(fourth).message == "four"
+    assert inbox.remove(fifth)
+    assert messages(inbox) == [("c", "three"), ("d", "four")]
+
+
+def test_sync_is_rate_limited(tmp_path):
+    path = str(tmp_path / "inbox.txt")
+    inbox = Inbox(path=path)
+    inbox.push("a", "one")
+    inbox.sync()
+    assert not (tmp_path / "inbox.txt").exists()
+    sync_now(inbox)
+    assert (tmp_path / "inbox.txt").read_text() == "a\tone\n"
+    assert not inbox.dirty
+
+
+def test_sync_load_round_trip(tmp_path):
+    path = str(tmp_path / "inbox.txt")
+    inbox = Inbox(path=path)
+    inbox.push("tab\tuser", "two\nlines")
+    inbox.push("back\\slash", "\\t is not a tab")
+    inbox.push("cr", "one\r\ntwo")
+    inbox.push(None, None)
+    inbox.push("number", 42)
+    inbox.push("name", "plain")
+    sync_now(inbox)
+    reloaded = Inbox(path=path)
+    assert messages(reloaded) == [
+        ("tab\tuser", "two\nlines"),
+        ("back\\slash", "\\t is not a tab"),
+        ("cr", "one\r\ntwo"),
+        (None, None),
+        # senders do not always send strings
+        ("number", "42"),
+        ("name", "plain"),
+    ]
+    assert not reloaded.dirty
+
+
+def test_fields_are_one_line_without_tabs():
+    for value in ("a\tb", "a\nb", "a\rb", "a\\b", "\\", "\t\\t"):
+        field = inbox_field(value)
+        assert "\t" not in field and "\n" not in field and "\r" not in field
+        assert inbox_value(field) == value
+    assert inbox_field(None) == ""
+    assert inbox_value("") is None
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import jsonscan
+import mothership
+from mothership import GAME_UPDATE_SCAN_BYTES, decode_game_update, scan_game_update
+
+UPDATE_FIELDS = mothership.MTG_UPDATE_FIELDS.names
+PLAYER_FIELDS = mothership.MTG_PLAYER_FIELDS.names
+
+
+def game_update(players):
+    uids = ["uid-{0:04d}".format(i) for i in range(players)]
+    roster = [
+        {
+            "uid": uid,
+            "playerName": 'Player "{0}"\\ é'.format(i),
+            "playerHealth": 40 - i,
+            "deck": "Deck {0} }} ] , : a rather long commander deck name".format(i),
+            "commanderDamage": {other: i % 7 for other in uids if other != uid},
+            "history": [{"turn": t, "delta": -t} for t in range(8)],
+        }
+        for i, uid in enumerate(uids)
+    ]
+    return json.dumps(
+        {
+            "version": 7,
+            "gameOver": False,
+            "lobby": uids,
+            "players": roster,
+            "currentPlayer": roster[0] if roster else None,
+            "winner": None,
+            "log": ["{0} took 3".format(uid) for uid in uids],
+        },
+        indent=1,
+    ).encode()
+
+
+def expected(msg):
+    """the fields MTGGame reads, taken from a full json.loads"""
+    loaded = json.loads(msg)
+    update = {name: loaded[name] for name in UPDATE_FIELDS if name in loaded}
+    if update.get("players"):
+        update["players"] = [
+            {name: player[name] for name in PLAYER_FIELDS if name in player}
+            for player in update["players"]
+        ]
+    return update
+
+
+@pytest.mark.parametrize("players", [0, 1, 4, 40])
+def test_decode_matches_json_loads(players):
+    msg = game_update(players)
+    assert scan_game_update(msg) == expected(msg)
+    assert decode_game_update(msg) == expected(msg)
+
+
+def test_both_decode_paths_are_covered():
+    assert len(game_update(4)) <= GAME_UPDATE_SCAN_BYTES < len(game_update(40))
+
+
+def test_missing_fields_are_left_out():
+    msg = b'{"players": [{"uid": "a"}, {"playerHealth": 3}], "gameOver": true}'
+    assert scan_game_update(msg) == expected(msg)
+    assert scan_game_update(msg) == {
+        "gameOver": True,
+        "players": [{"uid": "a"}, {"playerHealth": 3}],
+    }
+
+
+def test_spans_index_the_raw_values():
+    msg = b'{ "b" : [1, {"a": "}"}] , "a":"x\\"y" ,"c":null}'
+    fields = jsonscan.Fields("a", "b", "d")
+    a, b, d = fields.spans(msg)
+    assert json.loads(msg[a[0] : a[1]]) == 'x"y'
+    assert json.loads(msg[b[0] : b[1]]) == [1, {"a": "}"}]
+    assert d is None
+    assert fields.pick(msg) == {"a": 'x"y', "b": [1, {"a": "}"}]}
+
+
+def test_items_spans_each_array_element():
+    msg = b'[1, "a,b", {"c": [2, 3]}, [], null]'
+    elements = [json.loads(msg[s:e]) for s, e in jsonscan.items(msg, 0, len(msg))]
+    assert elements == json.loads(msg)
+
+
+@pytest.mark.parametrize("msg", [b'{"a": "open', b'{"a": [1, 2', b'{"a"', b"[]"])
+def test_truncated_or_wrong_payloads_raise_value_error(msg):
+    with pytest.raises(ValueError):
+        jsonscan.Fields("a", "b").pick(msg)
@@ -0,0 +1,114 @@
+import os
+import struct
+
+import pytest
+
+import linestore
+
+
+def make(tmp_path, lines):
+    path = str(tmp_path / "msg.txt")
+    with open(path, "w") as f:
+        f.write("".join(line + "\n" for line in lines))
+    return path
+
+
+def test_reads_records_by_position(tmp_path):
+    store = linestore.LineStore(make(tmp_path, ["a", "", "b", "c"]))
+    assert len(store) == 3
+    assert [store[i] for i in range(3)] == ["a", "b", "c"]
+    assert list(store) == ["a", "b", "c"]
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_delete_numbers_by_live_position(tmp_path):
+    store = linestore.LineStore(make(tmp_path, [str(i) for i in range(100)]))
+    for i in range(50):
+        # every other record, counting the ones deleted before
+        store.delete(i)
+    assert len(store) == 50
+    assert list(store) == [str(i) for i in range(1, 100, 2)]
+    assert [store[i] for i in (0, 1, 49)] == ["1", "3", "99"]
+    assert store.find("99") == 49
+
+
+def test_reads_do_not_compact(tmp_path):
+    store = linestore.LineStore(make(tmp_path, ["a", "b", "c"]))
+    store.delete(0)
+    assert store[0] == "b"
+    assert store.count == 3 and store.deleted == 1
+
+
+def test_delete_out_of_range(tmp_path):
+    path = make(tmp_path, [str(i) for i in range(40)])
+    store = linestore.LineStore(path)
+    with pytest.raises(IndexError):
+        store.delete(500)
+    with pytest.raises(IndexError):
+        store.delete(-1)
+    store.close()
+    store = linestore.LineStore(path)
+    assert store.count == 40
+    assert store[39] == "39"
+
+
+def test_compacts_at_the_threshold(tmp_path):
+    count = linestore.COMPACT_MIN * 4
+    store = linestore.LineStore(make(tmp_path, [str(i) for i in range(count)]))
+    for _ in range(linestore.COMPACT_MIN - 1):
+        store.delete(0)
+    assert store.deleted == linestore.COMPACT_MIN - 1
+    store.delete(0)
+    assert store.deleted == 0
+    assert store.count == count - linestore.COMPACT_MIN
+    assert store[0] == str(linestore.COMPACT_MIN)
+
+
+def test_append_returns_the_position(tmp_path):
+    path = make(tmp_path, ["a", "b"])
+    store = linestore.LineStore(path)
+    store.delete(0)
+    assert store.append("c\nd") == 1
+    assert store[1] == "c d"
+    assert store.append("  ") is None
+
+
+def test_reopen_keeps_records_and_marks(tmp_path):
+    path = make(tmp_path, ["a", "b", "c"])
+    store = linestore.LineStore(path)
+    store.delete(1)
+    store.append("d")
+    store.close()
+    store = linestore.LineStore(path)
+    assert list(store) == ["a", "c", "d"]
+    assert store.deleted == 1
+
+
+def test_lines_appended_by_hand_are_indexed(tmp_path):
+    path = make(tmp_path, ["a", "b"])
+    store = linestore.LineStore(path)
+    store.delete(0)
+    store.close()
+    with open(path, "a") as f:
+        f.write("c")
+    store = linestore.LineStore(path)
+    assert list(store) == ["b", "c"]
+
+
+def test_edit_in_place_rebuilds(tmp_path):
+    path = make(tmp_path, ["hello", "world", "third"])
+    linestore.LineStore(path).close()
+    with open(path, "w") as f:
+        f.write("hello there friend\nworld\nthird\n")
+    store = linestore.LineStore(path)
+    assert list(store) == ["hello there friend", "world", "third"]
+
+
+def test_old_index_format_rebuilds(tmp_path):
+    path = make(tmp_path, ["a", "b"])
+    with open(path + ".idx", "wb") as f:
+        f.write(struct.pack("<IIII", 2, 0, 1, 2))
+    store = linestore.LineStore(path)
+    assert list(store) == ["a", "b"]
+    assert os.path.getsize(path + ".idx") == linestore.HEADER + 2 * linestore.ENTRY
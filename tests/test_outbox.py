@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+import mothership
+from mothership import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PublishQueue
+
+HEALTH = mothership.publish_topics.get("api/game/mtg/r/modifyPlayerHealth")
+AMOUNT = mothership.publish_topics.slot(HEALTH, "amount")
+
+
+class Client:
+    """takes what umqtt.simple can write to its socket: str or bytes-like"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.published = []
+
+    def publish(self, topic, msg):
+        if self.fail:
+            raise OSError(104, "ECONNRESET")
+        if isinstance(msg, str):
+            msg = msg.encode()
+        self.published.append((bytes(topic), bytes(memoryview(msg))))
+
+
+def test_highest_priority_first_then_oldest():
+    outbox = PublishQueue()
+    outbox.put(b"msg", b"low", PRIORITY_LOW)
+    outbox.put(b"msg", b"normal 1", PRIORITY_NORMAL)
+    outbox.put(b"msg", b"high", PRIORITY_HIGH)
+    outbox.put(b"msg", b"normal 2", PRIORITY_NORMAL)
+    client = Client()
+    outbox.flush(client)
+    assert [msg for _, msg in client.published] == [
+        b"high",
+        b"normal 1",
+        b"normal 2",
+        b"low",
+    ]
+    assert outbox.depth() == 0 and outbox.sent == 4
+
+
+def test_key_replaces_the_queued_message():
+    outbox = PublishQueue()
+    outbox.put(b"config", b"old", key="me")
+    outbox.put(b"config", b"other", key="you")
+    outbox.put(b"config", b"new", key="me")
+    client = Client()
+    outbox.flush(client)
+    assert [msg for _, msg in client.published] == [b"new", b"other"]
+    assert outbox.coalesced == 1
+
+
+def test_merge_sums_and_cancels():
+    outbox = PublishQueue()
+    outbox.put(HEALTH, ["me", -3], PRIORITY_HIGH, key="me", merge=AMOUNT)
+    outbox.put(HEALTH, ["me", -2], PRIORITY_HIGH, key="me", merge=AMOUNT)
+    client = Client()
+    outbox.flush(client)
+    assert json.loads(client.published[0][1]) == {"uid": "me", "amount": -5}
+    outbox.put(HEALTH, ["me", 4], PRIORITY_HIGH, key="me", merge=AMOUNT)
+    outbox.put(HEALTH, ["me", -4], PRIORITY_HIGH, key="me", merge=AMOUNT)
+    assert outbox.depth() == 0
+
+
+def test_full_queue_evicts_lower_priority():
+    outbox = PublishQueue(capacity=2)
+    assert outbox.put(b"msg", b"low", PRIORITY_LOW)
+    assert outbox.put(b"msg", b"high 1", PRIORITY_HIGH)
+    assert outbox.put(b"msg", b"high 2", PRIORITY_HIGH)
+    assert not outbox.put(b"msg", b"low 2", PRIORITY_LOW)
+    assert outbox.depth() == 2 and outbox.dropped == 2
+
+
+def test_os_error_keeps_the_message():
+    outbox = PublishQueue()
+    outbox.put(b"msg", b"hello")
+    with pytest.raises(OSError):
+        outbox.flush(Client(fail=True))
+    assert outbox.depth() == 1
+    client = Client()
+    outbox.flush(client)
+    assert client.published == [(b"msg", b"hello")]
+
+
+def test_bad_payload_is_dropped_and_the_rest_sent():
+    outbox = PublishQueue()
+    outbox.put(b"msg", None)
+    outbox.put(b"msg", [1, 2])
+    outbox.put(b"msg", {"a": 1})
+    client = Client()
+    outbox.flush(client)
+    assert client.published == [(b"msg", b'{"a": 1}')]
+    assert outbox.dropped == 2 and outbox.depth() == 0
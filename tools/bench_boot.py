@@ -0,0 +1,120 @@
+"""Boot timings of a simulated controller, with and without the network cache
+
+The device boots in the host simulator. The stand-in WLAN takes time to
+join: a scan for the access point unless its BSSID is given, the
+association itself, and a DHCP lease unless a static configuration was set.
+A cold boot has no network cache. A warm boot reuses the cache the cold boot
+left behind, as a power-cycled controller does. Each boot runs with nobody
+at the config prompt, so it times out, and again with select pressed
+shortly after power-on.
+
+Reported per boot: the ms from power-on to WLAN up, to MQTT connected, to
+the config prompt closing and to the first menu, plus the DNS lookups made.
+The WLAN delays are a model, so compare runs with one another rather than
+with a real device.
+
+usage: PYTHONPATH=host:. python tools/bench_boot.py [--scan-ms 1500]
+       [--join-ms 700] [--dhcp-ms 1200] [--prompt-s 3] [--out boot.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), os.path.join(ROOT, "tools"), ROOT]
+
+import broker  # noqa: E402
+import network  # noqa: E402
+import usocket  # noqa: E402
+from bench_fanout import commit  # noqa: E402
+from sim.clock import run  # noqa: E402
+from sim.device import Device  # noqa: E402
+
+SERVER = "boot.local"
+
+
+async def boot(prompt_s, press_ms):
+    broker.reset()
+    # same address every boot, so a cached one stays good
+    broker.address(SERVER)
+    lookups = usocket.lookups
+    device = Device(0, SERVER)
+    device.config["prompt_s"] = str(prompt_s)
+    asyncio.create_task(device.run())
+    if press_ms is not None:
+        await asyncio.sleep(press_ms / 1000)
+        await device.press("select")
+    times = device.mothership.boot_times
+    for _ in range(600):
+        if "menu" in times:
+            break
+        await asyncio.sleep(0.05)
+    return {
+        "wlanMs": times.get("wlan"),
+        "mqttMs": times.get("mqtt"),
+        "promptMs": times.get("prompt"),
+        "menuMs": times.get("menu"),
+        "dnsLookups": usocket.lookups - lookups,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scan-ms", type=int, default=1500)
+    parser.add_argument("--join-ms", type=int, default=700)
+    parser.add_argument("--dhcp-ms", type=int, default=1200)
+    parser.add_argument("--prompt-s", type=int, default=3)
+    parser.add_argument("--press-ms", type=int, default=300)
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    network.WLAN.scan_ms = args.scan_ms
+    network.WLAN.join_ms = args.join_ms
+    network.WLAN.dhcp_ms = args.dhcp_ms
+    # the device keeps its caches in the working directory
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        for press_ms in (None, args.press_ms):
+            for cache in ("cold", "warm"):
+                if cache == "cold" and os.path.exists("netcache.json"):
+                    os.remove("netcache.json")
+                with open(os.devnull, "w") as devnull:
+                    with contextlib.redirect_stdout(devnull):
+                        result = run(boot(args.prompt_s, press_ms))
+                result["cache"] = cache
+                result["pressMs"] = press_ms
+                results.append(result)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "wlanModelMs": {
+            "scan": args.scan_ms,
+            "join": args.join_ms,
+            "dhcp": args.dhcp_ms,
+        },
+        "promptS": args.prompt_s,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
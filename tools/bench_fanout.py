@@ -0,0 +1,161 @@
+"""Load test the MTG update fan-out with a pod of simulated controllers
+
+Each device boots in the host simulator, logs in, joins the game from the
+menu and then plays scripted rounds: a few encoder clicks of damage at a
+random point in the round (sent as one net change after the input goes
+idle), and a turn pass from whoever is the current player. The stand-in
+backend answers every request with a broadcast to all devices, as a full
+snapshot or, with --deltas, as a patch.
+
+Reported per pod size: publish-to-render latency percentiles on the device
+clock and the host clock, broker messages per second of host time, and the
+host CPU time each device spent handling messages and flushing frames. The
+result is JSON so runs can be compared across releases. Each pod runs in a
+fresh temporary directory, so no network or user cache from an earlier run
+or pod changes how it boots.
+
+usage: PYTHONPATH=host:. python tools/bench_fanout.py [--devices 2 4 8]
+       [--rounds 10] [--deltas] [--out results.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), ROOT]
+
+import broker  # noqa: E402
+from sim.backend import MTGBackend  # noqa: E402
+from sim.clock import run  # noqa: E402
+from sim.device import Device, flash_dir  # noqa: E402
+from sim.stats import summary  # noqa: E402
+
+SERVER = "bench.local"
+
+
+async def play(device, backend, rounds, round_ms, rng):
+    device.mothership.selectedUser = device.client_id
+    # Login -> MTG, select joins the game and hands the encoder to MTGGame
+    await device.press("right")
+    await asyncio.sleep(0.1)
+    await device.press("select")
+    loop = asyncio.get_running_loop()
+    start = loop.time() + 1
+    for round_index in range(rounds):
+        round_start = start + round_index * round_ms / 1000
+        await asyncio.sleep(max(round_start - loop.time(), 0))
+        await asyncio.sleep(rng.uniform(0, round_ms / 2) / 1000)
+        await device.turn(-rng.randint(1, 4), period_ms=30)
+        await asyncio.sleep(max(round_start + round_ms / 1000 - loop.time(), 0))
+        current = backend.current_player()
+        if current is not None and current["uid"] == device.client_id:
+            device.runtime.main_menu.mtg_game.next_turn()
+
+
+async def session(count, rounds, round_ms, deltas, seed):
+    broker.reset()
+    rng = random.Random(seed)
+    backend = MTGBackend(SERVER, deltas=deltas)
+    devices = [Device(i, SERVER) for i in range(count)]
+    booted = await asyncio.gather(*(device.boot() for device in devices))
+    if not all(booted):
+        raise SystemExit("{0} devices did not connect".format(booted.count(False)))
+    for device in devices:
+        device.busy_s = 0.0
+    deliveries = backend.broker.deliveries
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(play(device, backend, rounds, round_ms, rng) for device in devices)
+    )
+    # let the last net changes go out and render
+    await asyncio.sleep(2)
+    elapsed = time.perf_counter() - started
+
+    device_ms = []
+    host_ms = []
+    missed = 0
+    for device in devices:
+        device_lat, host_lat, device_missed = device.latencies(backend.published)
+        device_ms += device_lat
+        host_ms += host_lat
+        missed += device_missed
+    busy_ms = [device.busy_s * 1000 for device in devices]
+    delivered = backend.broker.deliveries - deliveries
+    return {
+        "devices": count,
+        "mode": "delta" if deltas else "update",
+        "rounds": rounds,
+        "requests": backend.requests,
+        "broadcasts": len(backend.published),
+        "deliveries": delivered,
+        "hostSeconds": round(elapsed, 3),
+        "messagesPerSec": round(delivered / elapsed, 1),
+        "missedRenders": missed,
+        "latencyMs": {"device": summary(device_ms), "host": summary(host_ms)},
+        "cpuMsPerDevice": dict(
+            summary(busy_ms), mean=round(sum(busy_ms) / len(busy_ms), 2)
+        ),
+    }
+
+
+def commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--round-ms", type=int, default=2000)
+    parser.add_argument("--deltas", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for count in args.devices:
+        # every pod starts without the network and user caches of an earlier one
+        with flash_dir(), open(os.devnull, "w") as devnull:
+            # the controllers are chatty on the console, keep it out of the report
+            with contextlib.redirect_stdout(devnull):
+                results.append(
+                    run(
+                        session(
+                            count, args.rounds, args.round_ms, args.deltas, args.seed
+                        )
+                    )
+                )
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
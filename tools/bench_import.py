@@ -0,0 +1,53 @@
+"""Import time and heap cost of the controller modules, run under MicroPython
+
+Whichever variant is on the import path gets measured: source, .mpy or
+frozen into the firmware. Each module is imported once, after a collection,
+and one JSON line is printed per module. On the device copy the variant
+over (or flash the frozen firmware) and run:
+
+    mpremote run tools/bench_import.py
+
+tools/build_mpy.py --bench runs it under the Unix port for source and .mpy.
+The numbers include the modules each one imports, which are not cached
+yet, so the order below matters. They are measured from leaf modules up.
+"""
+
+import gc
+import json
+import sys
+import time
+
+MODULES = ("instrument", "jsonscan", "linestore", "mothership")
+
+
+def variant(module):
+    path = getattr(module, "__file__", None)
+    if path is None or path.startswith(".frozen"):
+        return "frozen"
+    return "mpy" if path.endswith(".mpy") else "source"
+
+
+def measure(name):
+    gc.collect()
+    free = gc.mem_free()
+    start = time.ticks_us()
+    try:
+        __import__(name)
+    except Exception as e:
+        return {"module": name, "error": repr(e)}
+    elapsed = time.ticks_diff(time.ticks_us(), start)
+    # garbage the compiler left behind, then what the module keeps
+    peak = free - gc.mem_free()
+    gc.collect()
+    return {
+        "module": name,
+        "variant": variant(sys.modules[name]),
+        "importMs": elapsed / 1000,
+        "heapPeak": peak,
+        "heapKept": free - gc.mem_free(),
+        "freeAfter": gc.mem_free(),
+    }
+
+
+for name in MODULES:
+    print(json.dumps(measure(name)))
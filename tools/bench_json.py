@@ -0,0 +1,101 @@
+"""Compare full JSON decoding of game updates against the partial decode path
+
+The old path is json.loads(msg.decode()) on the whole api/game/mtg/p/update
+payload. The partial path is mothership.scan_game_update(msg), which only
+decodes the fields MTGGame reads and streams the players array.
+decode_game_update uses it above GAME_UPDATE_SCAN_BYTES and a plain
+json.loads below, the "used" column shows which. Payloads are generated for
+several pod sizes with the extra per-player detail the backend sends
+(commander damage, counters, deck).
+
+usage: python tools/bench_json.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), ROOT]
+
+import mothership  # noqa: E402
+
+
+def game_update(players):
+    uids = ["uid-{0:04d}".format(i) for i in range(players)]
+    roster = [
+        {
+            "uid": uid,
+            "playerName": "Player {0}".format(i),
+            "playerHealth": 40 - i,
+            "deck": "Deck {0} - a rather long commander deck name".format(i),
+            "commanderDamage": {other: i % 7 for other in uids if other != uid},
+            "counters": {"poison": 0, "energy": i, "experience": 2 * i},
+            "history": [{"turn": t, "delta": -t} for t in range(8)],
+        }
+        for i, uid in enumerate(uids)
+    ]
+    return json.dumps(
+        {
+            "gameOver": False,
+            "lobby": uids,
+            "players": roster,
+            "currentPlayer": roster[0],
+            "winner": None,
+            "turn": 12,
+            "log": ["{0} took 3".format(uid) for uid in uids],
+        }
+    ).encode()
+
+
+def full_decode(msg):
+    return json.loads(msg.decode())
+
+
+def measure(fn, msg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(msg)
+    elapsed_us = (time.perf_counter() - start) / iterations * 1e6
+    tracemalloc.start()
+    result = fn(msg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_us, peak, result
+
+
+def main(argv):
+    iterations = int(argv[1]) if len(argv) > 1 else 200
+    print(
+        "{0:>7} {1:>8} {2:>12} {3:>12} {4:>12} {5:>12} {6:>8}".format(
+            "players",
+            "bytes",
+            "full us",
+            "full peak B",
+            "partial us",
+            "partial B",
+            "used",
+        )
+    )
+    for players in (2, 4, 6, 8, 12):
+        msg = game_update(players)
+        full_us, full_peak, full = measure(full_decode, msg, iterations)
+        part_us, part_peak, part = measure(
+            mothership.scan_game_update, msg, iterations
+        )
+        # all paths must agree on what MTGGame reads
+        assert part["players"][1]["playerHealth"] == full["players"][1]["playerHealth"]
+        assert part["currentPlayer"] == full["currentPlayer"]
+        assert mothership.decode_game_update(msg) == part
+        used = "partial" if len(msg) > mothership.GAME_UPDATE_SCAN_BYTES else "full"
+        print(
+            "{0:>7} {1:>8} {2:>12.1f} {3:>12} {4:>12.1f} {5:>12} {6:>8}".format(
+                players, len(msg), full_us, full_peak, part_us, part_peak, used
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,110 @@
+"""Compare whole-file reads of msg.txt against the indexed line store
+
+The old path is what get_messages and read_random_line did before: read and
+split the whole file for every call. The store fetches one record through
+its offset index, samples one at random, or iterates lazily. For each file
+size the table shows microseconds per call and the peak heap of one call
+(tracemalloc). The store's peak should stay flat as the file grows.
+
+usage: python tools/bench_linestore.py [sizes...]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import linestore  # noqa: E402
+
+
+def old_get(path, i):
+    with open(path, "r") as f:
+        return f.read().splitlines()[i]
+
+
+def old_sample(path):
+    with open(path, "r") as f:
+        lines = f.readlines()
+    return random.choice(lines).strip() if lines else None
+
+
+def old_scan(path):
+    with open(path, "r") as f:
+        return len(f.read().splitlines())
+
+
+def scan(store):
+    n = 0
+    for _ in store:
+        n += 1
+    return n
+
+
+def measure(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    us = (time.perf_counter() - start) * 1e6 / repeat
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return us, peak
+
+
+def main(argv):
+    sizes = [int(a) for a in argv[1:]] or [100, 1000, 10000]
+    tmp = tempfile.mkdtemp()
+    try:
+        print(
+            "{0:>7} {1:<10} {2:>12} {3:>10} {4:>12} {5:>10}".format(
+                "records", "op", "old us", "old B", "store us", "store B"
+            )
+        )
+        for size in sizes:
+            path = os.path.join(tmp, "msg{0}.txt".format(size))
+            with open(path, "w") as f:
+                for i in range(size):
+                    f.write("canned message number {0}, see you there\n".format(i))
+            # the first open indexes the plain file
+            start = time.perf_counter()
+            store = linestore.LineStore(path)
+            index_ms = (time.perf_counter() - start) * 1e3
+            middle = size // 2
+            assert store[middle] == old_get(path, middle)
+            assert scan(store) == old_scan(path) == size
+            repeat = max(10, 20000 // size)
+            rows = (
+                ("get", lambda: old_get(path, middle), lambda: store[middle]),
+                ("sample", lambda: old_sample(path), store.sample),
+                ("iterate", lambda: old_scan(path), lambda: scan(store)),
+            )
+            for op, old, new in rows:
+                old_us, old_peak = measure(old, repeat)
+                new_us, new_peak = measure(new, repeat)
+                print(
+                    "{0:>7} {1:<10} {2:>12.1f} {3:>10} {4:>12.1f} {5:>10}".format(
+                        size, op, old_us, old_peak, new_us, new_peak
+                    )
+                )
+            # from the back, so the records still to go keep their positions
+            for i in reversed(range(0, size, 2)):
+                store.delete(i)
+            print(
+                "{0:>7} indexed in {1:.1f} ms, {2} slots hold the {3} records left"
+                " after deleting half".format(size, index_ms, store.count, len(store))
+            )
+            store.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,87 @@
+"""Compare the old publish path against the publish registry templates
+
+The old path is what publish_message did before: a linear scan of
+topic_pub_list, a payload dict and json.dumps for every message. The
+template path renders the same modifyPlayerHealth payload from slot values
+into the registry's reusable buffer. The queued path adds the outbox
+(publish_message followed by a flush), which is what the device runs.
+The heap a single publish allocates is measured with tracemalloc.
+
+usage: python tools/bench_publish.py [iterations]
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), ROOT]
+
+import mothership  # noqa: E402
+
+TOPIC = "api/game/mtg/r/modifyPlayerHealth"
+UID = "uid-0003"
+
+
+class NullClient:
+    def publish(self, topic, msg):
+        len(msg)
+
+
+def old_publish(client, topic, payload):
+    if topic in mothership.topic_pub_list:
+        if isinstance(payload, dict):
+            payload = json.dumps(payload)
+        client.publish(topic, payload)
+
+
+def old_path(client, amount):
+    old_publish(client, TOPIC, {"uid": UID, "amount": amount})
+
+
+def template_path(client, amount, topic=mothership.publish_topics.get(TOPIC)):
+    client.publish(topic, mothership.publish_topics.payload(topic, [UID, amount]))
+
+
+def queued_path(client, amount):
+    mothership.publish_message(TOPIC, [UID, amount], mothership.PRIORITY_HIGH)
+    mothership.outbox.flush(client)
+
+
+def measure(label, fn, iterations):
+    client = NullClient()
+    fn(client, 1)
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(client, i - 20)
+    rate = iterations / (time.perf_counter() - start)
+    # transient heap used by one publish, everything it builds is garbage after
+    tracemalloc.start()
+    fn(client, -7)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0:<24} {1:>12.0f} {2:>12}".format(label, rate, peak))
+
+
+class CaptureClient:
+    def publish(self, topic, msg):
+        self.msg = msg if isinstance(msg, str) else bytes(msg)
+
+
+def main(argv):
+    iterations = int(argv[1]) if len(argv) > 1 else 100000
+    # all paths must put the same message on the wire
+    for fn in (old_path, template_path, queued_path):
+        client = CaptureClient()
+        fn(client, -7)
+        assert json.loads(client.msg) == {"uid": UID, "amount": -7}, fn
+    print("{0:<24} {1:>12} {2:>12}".format("path", "publishes/s", "peak B"))
+    measure("dict + json.dumps", old_path, iterations)
+    measure("registry template", template_path, iterations)
+    measure("template via outbox", queued_path, iterations)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,87 @@
+"""Compare loading the icons from python literals against the packed sprites.bin
+
+The literal variant regenerates the old image_bytes.py layout (one hex int per
+line) from sprites/*.pbm and compiles + executes it, which is what the device
+did on every boot. The packed variant reads the sprites.bin header and then
+each sprite into its own buffer, the way SpriteRegistry does.
+
+usage: python tools/bench_sprites.py [iterations]
+"""
+
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+from pack_sprites import read_pbm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPRITE_DIR = os.path.join(ROOT, "sprites")
+SPRITE_FILE = os.path.join(ROOT, "sprites.bin")
+
+
+def literal_source():
+    lines = []
+    for filename in sorted(os.listdir(SPRITE_DIR)):
+        if filename.endswith(".pbm"):
+            _, _, data = read_pbm(os.path.join(SPRITE_DIR, filename))
+            lines.append("{0}_bytes = bytearray(".format(filename[:-4]))
+            lines.append("    [")
+            lines.extend("        0x{0:02x},".format(b) for b in data)
+            lines.append("    ]")
+            lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+def load_literals(source):
+    namespace = {}
+    exec(compile(source, "image_bytes.py", "exec"), namespace)
+    return namespace
+
+
+def load_packed(names=None):
+    index = {}
+    with open(SPRITE_FILE, "rb") as f:
+        f.read(4)
+        for _ in range(f.read(1)[0]):
+            name = f.read(f.read(1)[0]).decode()
+            index[name] = struct.unpack("<BBH", f.read(4))
+        sprites = {}
+        for name in names if names is not None else index:
+            width, height, offset = index[name]
+            buf = bytearray((width + 7) // 8 * height)
+            f.seek(offset)
+            f.readinto(buf)
+            sprites[name] = buf
+    return sprites
+
+
+def measure(label, fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed_us = (time.perf_counter() - start) / iterations * 1e6
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{0:<28} {1:>10.1f} us {2:>10} B peak".format(label, elapsed_us, peak))
+
+
+def main(argv):
+    iterations = int(argv[1]) if len(argv) > 1 else 50
+    source = literal_source()
+    print(
+        "literal source {0} bytes, sprites.bin {1} bytes".format(
+            len(source), os.path.getsize(SPRITE_FILE)
+        )
+    )
+    measure("literals (compile + exec)", lambda: load_literals(source), iterations)
+    measure("packed (header only)", lambda: load_packed(names=()), iterations)
+    measure("packed (one sprite)", lambda: load_packed(names=("skull",)), iterations)
+    measure("packed (all sprites)", load_packed, iterations)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
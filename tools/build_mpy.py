@@ -0,0 +1,216 @@
+"""Cross-compile the controller to .mpy files and write a frozen module manifest
+
+Without this, MicroPython compiles mothership.py and the modules it imports
+from source on every boot. That takes seconds and leaves the compiler's
+garbage on the heap. This builds:
+
+    build/mpy/      the modules as .mpy, plus sprites.bin and pico.py as is.
+                    Copy the contents to the pico in place of the .py files:
+                    an import prefers a .py over an .mpy of the same name.
+    build/manifest.py
+                    a manifest that freezes the modules into the firmware,
+                    for `make BOARD=RPI_PICO_W FROZEN_MANIFEST=.../manifest.py`
+                    in ports/rp2 of a MicroPython checkout.
+
+mpy-cross must match the firmware's MicroPython version. It is taken from
+--mpy-cross, then PATH, then the mpy_cross package (pip install mpy-cross).
+jsonscan.py uses @micropython.native, so the code is built for
+-march=armv6m (the RP2040) unless told otherwise.
+
+--verify checks the header of every .mpy. Where a MicroPython Unix port is
+available it also imports each module under it, with host/ on the path for
+the hardware modules. Modules holding native code for another arch, and the
+modules importing them (mothership.py imports jsonscan.py), are skipped.
+--bench runs tools/bench_import.py under the Unix port for the source and
+.mpy variants; build with --march x64 for it, the host cannot run armv6m
+code. On the device, run it with mpremote (see that file).
+
+usage: python tools/build_mpy.py [--march armv6m] [-O 0] [--verify]
+       [--bench] [--mpy-cross PATH] [--micropython PATH]
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD = os.path.join(ROOT, "build")
+MPY_DIR = os.path.join(BUILD, "mpy")
+
+# imported by the controller at boot, compiled and frozen
+MODULES = ("mothership.py", "instrument.py", "jsonscan.py", "linestore.py")
+# copied next to them unchanged
+ASSETS = ("sprites.bin", "pico.py")
+
+# .mpy header: b"M", version, feature flags with the arch in the top bits
+MPY_VERSION = 6
+ARCHES = (
+    None,
+    "x86",
+    "x64",
+    "armv6",
+    "armv6m",
+    "armv7m",
+    "armv7em",
+    "armv7emsp",
+    "armv7emdp",
+    "xtensa",
+    "xtensawin",
+    "rv32imc",
+)
+
+
+def find_mpy_cross(path=None):
+    """command list that runs mpy-cross"""
+    if path:
+        return [path]
+    found = shutil.which("mpy-cross")
+    if found:
+        return [found]
+    try:
+        import mpy_cross  # noqa: F401
+    except ImportError:
+        raise SystemExit(
+            "mpy-cross not found, pass --mpy-cross or pip install mpy-cross"
+        )
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def build(mpy_cross, march, opt):
+    if os.path.isdir(MPY_DIR):
+        shutil.rmtree(MPY_DIR)
+    os.makedirs(MPY_DIR)
+    for module in MODULES:
+        output = os.path.join(MPY_DIR, module[:-3] + ".mpy")
+        command = mpy_cross + ["-O{0}".format(opt), "-o", output, module]
+        if march:
+            command.insert(-1, "-march={0}".format(march))
+        subprocess.check_call(command, cwd=ROOT)
+        source = os.path.getsize(os.path.join(ROOT, module))
+        size = os.path.getsize(output)
+        print("{0:<16} {1:>7} B -> {2:>7} B".format(module, source, size))
+    for asset in ASSETS:
+        shutil.copy(os.path.join(ROOT, asset), MPY_DIR)
+    write_manifest(opt)
+
+
+def write_manifest(opt):
+    lines = [
+        "# generated by tools/build_mpy.py, freezes the controller into the firmware",
+        'include("$(PORT_DIR)/boards/manifest.py")',
+    ]
+    for module in MODULES:
+        lines.append(
+            'module("{0}", base_path="{1}", opt={2})'.format(module, ROOT, opt)
+        )
+    with open(os.path.join(BUILD, "manifest.py"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def read_header(path):
+    """(version, arch) from an .mpy header"""
+    with open(path, "rb") as f:
+        header = f.read(4)
+    if len(header) < 4 or header[0] != ord("M"):
+        raise ValueError("{0} is not an .mpy file".format(path))
+    arch = header[2] >> 2
+    return header[1], ARCHES[arch] if arch < len(ARCHES) else arch
+
+
+def imported(module):
+    """names of the MODULES that module imports"""
+    with open(os.path.join(ROOT, module)) as f:
+        source = f.read()
+    names = re.findall(r"^\s*(?:import|from)\s+(\w+)", source, re.M)
+    return [name + ".py" for name in names if name + ".py" in MODULES]
+
+
+def find_micropython(path=None):
+    return path or shutil.which("micropython")
+
+
+def run_micropython(micropython, args, path):
+    env = dict(os.environ, MICROPYPATH=os.pathsep.join(path))
+    return subprocess.run(
+        [micropython] + args, cwd=ROOT, env=env, capture_output=True, text=True
+    )
+
+
+def verify(march, micropython):
+    ok = True
+    arches = {}
+    for module in MODULES:
+        path = os.path.join(MPY_DIR, module[:-3] + ".mpy")
+        version, arch = read_header(path)
+        # the arch is only recorded for modules holding native code
+        good = version == MPY_VERSION and arch in (None, march or None)
+        ok = ok and good
+        arches[module] = arch
+        print(
+            "{0:<16} mpy v{1} arch {2} {3}".format(
+                module, version, arch, "ok" if good else "UNEXPECTED"
+            )
+        )
+    if micropython is None:
+        print("no MicroPython Unix port found, import check skipped")
+        return ok
+    foreign = [m for m in MODULES if arches[m] not in (None, "x64", "x86")]
+    for module in MODULES:
+        blocked = [m for m in [module] + imported(module) if m in foreign]
+        if blocked:
+            print(
+                "{0:<16} import skipped, {1} holds {2} code the host cannot run, "
+                "build with --march x64 to check it".format(
+                    module, blocked[0], arches[blocked[0]]
+                )
+            )
+            continue
+        result = run_micropython(
+            micropython,
+            ["-c", "import {0}".format(module[:-3])],
+            [MPY_DIR, os.path.join(ROOT, "host")],
+        )
+        good = result.returncode == 0
+        ok = ok and good
+        print("{0:<16} import {1}".format(module, "ok" if good else "FAILED"))
+        if not good:
+            print(result.stderr.strip() or result.stdout.strip())
+    return ok
+
+
+def bench(micropython):
+    if micropython is None:
+        raise SystemExit("--bench needs a MicroPython Unix port, see --micropython")
+    script = os.path.join(ROOT, "tools", "bench_import.py")
+    host = os.path.join(ROOT, "host")
+    # the source tree, then the build, each ahead of the host stand-ins
+    for path in ([ROOT, host], [MPY_DIR, host]):
+        result = run_micropython(micropython, [script], path)
+        sys.stdout.write(result.stdout)
+        if result.returncode:
+            sys.stdout.write(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--march", default="armv6m", help="empty for bytecode only")
+    parser.add_argument("-O", dest="opt", type=int, default=0)
+    parser.add_argument("--mpy-cross")
+    parser.add_argument("--micropython")
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--bench", action="store_true")
+    args = parser.parse_args()
+
+    build(find_mpy_cross(args.mpy_cross), args.march, args.opt)
+    micropython = find_micropython(args.micropython)
+    if args.verify and not verify(args.march, micropython):
+        raise SystemExit(1)
+    if args.bench:
+        bench(micropython)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Replay rotary encoder pin sequences through the decoder and count errors
+
+Each scenario is a list of detents (+1 clockwise, -1 counter-clockwise)
+turned into timestamped CLK/DT edges, optionally with contact bounce and
+dropped IRQs. The edges are replayed through mothership.RotaryEncoder using
+the host pin stand-ins and through the old CLK-only decoder for comparison.
+
+A recorded capture can be replayed with --replay, one "t_ms,clk,dt" sample
+per line, together with --expect giving the true net detent count.
+
+usage: python tools/encoder_harness.py [--replay capture.csv --expect N]
+"""
+
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "host"), ROOT]
+
+from machine import Pin  # noqa: E402
+import mothership  # noqa: E402
+
+CLK = mothership.pin_clk
+DT = mothership.pin_dt
+# CLK/DT states visited after the rest state (both high) for one detent
+CLOCKWISE = (1, 0, 2, 3)
+COUNTER_CLOCKWISE = (2, 0, 1, 3)
+
+
+def detent_edges(detents, period_ms, bounce=0, rng=None):
+    """(t_ms, pin, level) edges for a list of detents"""
+    edges = []
+    t = 0.0
+    state = 3
+    for direction in detents:
+        for next_state in CLOCKWISE if direction > 0 else COUNTER_CLOCKWISE:
+            t += period_ms / 4
+            changed = state ^ next_state
+            pin = CLK if changed & 2 else DT
+            level = 1 if next_state & changed else 0
+            # contact bounce, the line chatters before settling
+            for i in range(bounce if rng is None else rng.randint(0, bounce)):
+                edges.append((t + i * 0.05, pin, level))
+                edges.append((t + i * 0.05 + 0.02, pin, 1 - level))
+            edges.append((t + bounce * 0.05, pin, level))
+            state = next_state
+    return edges
+
+
+def capture_edges(path):
+    """edges from a recorded "t_ms,clk,dt" capture"""
+    edges = []
+    clk = dt = 1
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            t, new_clk, new_dt = (float(v) for v in line.split(","))
+            if int(new_clk) != clk:
+                clk = int(new_clk)
+                edges.append((t, CLK, clk))
+            if int(new_dt) != dt:
+                dt = int(new_dt)
+                edges.append((t, DT, dt))
+    return edges
+
+
+class LegacyDecoder:
+    """the previous CLK-only decoder, kept here as a baseline"""
+
+    def __init__(self, clk, dt):
+        self.clk = clk
+        self.dt = dt
+        self.last_clk_state = 0
+        self.value = 0
+        clk.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self.edge)
+
+    def edge(self, pin):
+        clk_state = self.clk.value()
+        if clk_state != self.last_clk_state:
+            if self.dt.value() != clk_state:
+                self.value += 1
+            else:
+                self.value -= 1
+        self.last_clk_state = clk_state
+
+
+def replay(edges, make_decoder, drop_rate=0.0, rng=None):
+    """drive the edges into a fresh decoder, dropped IRQs still move the line"""
+    Pin.levels.clear()
+    Pin.handlers.clear()
+    clk = Pin(CLK, Pin.IN, value=1)
+    dt = Pin(DT, Pin.IN, value=1)
+    clock = [0]
+    ticks_ms = time.ticks_ms
+    time.ticks_ms = lambda: clock[0]
+    try:
+        decoder = make_decoder(clk, dt)
+        for t, pin, level in edges:
+            clock[0] = int(t)
+            if rng is not None and rng.random() < drop_rate:
+                Pin.levels[pin] = level
+            else:
+                Pin.drive(pin, level)
+    finally:
+        time.ticks_ms = ticks_ms
+    return decoder
+
+
+def run(name, edges, expected, drop_rate=0.0, seed=1):
+    decoder = replay(
+        edges,
+        lambda clk, dt: mothership.RotaryEncoder(clk, dt),
+        drop_rate,
+        random.Random(seed),
+    )
+    legacy = replay(edges, LegacyDecoder, drop_rate, random.Random(seed))
+    decoded = mothership.encoder_diff(decoder.value, 0)
+    accel = mothership.encoder_diff(decoder.accel_value, 0)
+    error = decoded - expected
+    print(
+        "{0:<22} expect {1:>5}  decoded {2:>5}  missed {3:>3}  extra {4:>3}  "
+        "invalid {5:>3}  accel {6:>5}  legacy {7:>5}".format(
+            name,
+            expected,
+            decoded,
+            max(-error, 0) if expected >= 0 else max(error, 0),
+            max(error, 0) if expected >= 0 else max(-error, 0),
+            decoder.errors,
+            accel,
+            legacy.value,
+        )
+    )
+
+
+def main(argv):
+    if "--replay" in argv:
+        path = argv[argv.index("--replay") + 1]
+        expected = int(argv[argv.index("--expect") + 1]) if "--expect" in argv else 0
+        run(os.path.basename(path), capture_edges(path), expected)
+        return
+
+    rng = random.Random(7)
+    forward = [1] * 30
+    there_and_back = [1] * 20 + [-1] * 12
+    run("slow 120ms/detent", detent_edges(forward, 120), 30)
+    run("fast 8ms/detent", detent_edges(forward, 8), 30)
+    run("reversal", detent_edges(there_and_back, 40), 8)
+    run("bounce", detent_edges(there_and_back, 40, bounce=3, rng=rng), 8)
+    run("dropped irq 5%", detent_edges(forward, 8), 30, drop_rate=0.05)
+    run("bounce + dropped 5%", detent_edges(forward, 8, 3, rng), 30, 0.05)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,87 @@
+"""Pack the sprites/*.pbm icons into the sprites.bin asset loaded by mothership.py
+
+Layout (little endian):
+    b"SPR1", u8 sprite count
+    per sprite: u8 name length, name, u8 width, u8 height, u16 data offset
+    sprite data, MONO_HLSB rows (the same bit layout as a binary PBM)
+
+Set bits are lit pixels on the OLED, so the PBM files look inverted in an
+image viewer.
+
+usage: python tools/pack_sprites.py [sprite_dir] [output]
+"""
+
+import os
+import struct
+import sys
+
+MAGIC = b"SPR1"
+
+
+def read_pbm(path):
+    """return (width, height, data) for a binary (P4) PBM file"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    fields = []
+    pos = 0
+    while len(fields) < 3:
+        # skip whitespace and comments between header fields
+        while raw[pos : pos + 1].isspace():
+            pos += 1
+        if raw[pos : pos + 1] == b"#":
+            pos = raw.index(b"\n", pos) + 1
+            continue
+        start = pos
+        while not raw[pos : pos + 1].isspace():
+            pos += 1
+        fields.append(raw[start:pos])
+    if fields[0] != b"P4":
+        raise ValueError("{0} is not a binary PBM file".format(path))
+    width = int(fields[1])
+    height = int(fields[2])
+    # a single whitespace byte separates the header from the raster
+    data = raw[pos + 1 :]
+    size = (width + 7) // 8 * height
+    if len(data) < size:
+        raise ValueError("{0} is truncated".format(path))
+    return width, height, data[:size]
+
+
+def pack(sprite_dir, output):
+    sprites = []
+    for filename in sorted(os.listdir(sprite_dir)):
+        if filename.endswith(".pbm"):
+            name = filename[:-4]
+            width, height, data = read_pbm(os.path.join(sprite_dir, filename))
+            sprites.append((name.encode(), width, height, data))
+
+    header_size = len(MAGIC) + 1
+    for name, _, _, _ in sprites:
+        header_size += 1 + len(name) + 4
+
+    header = bytearray(MAGIC)
+    header.append(len(sprites))
+    offset = header_size
+    for name, width, height, data in sprites:
+        header.append(len(name))
+        header += name
+        header += struct.pack("<BBH", width, height, offset)
+        offset += len(data)
+
+    with open(output, "wb") as f:
+        f.write(header)
+        for _, _, _, data in sprites:
+            f.write(data)
+    return sprites, offset
+
+
+def main(argv):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sprite_dir = argv[1] if len(argv) > 1 else os.path.join(root, "sprites")
+    output = argv[2] if len(argv) > 2 else os.path.join(root, "sprites.bin")
+    sprites, size = pack(sprite_dir, output)
+    print("packed {0} sprites into {1} ({2} bytes)".format(len(sprites), output, size))
+
+
+if __name__ == "__main__":
+    main(sys.argv)